@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+"""
+Times attribute reads and writes of model parts through
+:py:class:`.RedisModel`, against the previous implementation which called
+`dir()` on every access, for a small model class and one with many methods.
+
+Writes use a deferred model so that nothing is sent to Redis, and no Redis
+server is needed::
+
+    python benchmarks/attribute_access.py
+"""
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from redisORM import redis_model
+from redisORM.fields import Integer
+
+
+class Model(redis_model.RedisModel):
+    _deferred = True
+
+
+class BigModel(Model):
+    pass
+
+for i in range(200):
+    setattr(BigModel, "method%d" % i, lambda self: None)
+
+
+class TypedModel(Model):
+    _schema = {"age": Integer()}
+
+
+class DirLookup(object):
+    """
+    The attribute lookups as they were, calling `dir()` every time.
+    """
+    def _get(self, attr):
+        pro_its = object.__getattribute__(self, "_protected_items")
+        if attr[0] == "_" or attr in pro_its:
+            return object.__getattribute__(self, attr)
+
+        elif attr in dir(self):
+            return object.__getattribute__(self, attr)
+
+        else:
+            data = object.__getattribute__(self, "_data")
+            return data[attr]
+
+    def _set(self, attr, val):
+        pro_its = object.__getattribute__(self, "_protected_items")
+        if attr[0] == "_" or attr in pro_its:
+            return object.__setattr__(self, attr, val)
+
+        elif hasattr(val, "__call__") or attr in dir(self):
+            return object.__setattr__(self, attr, val)
+
+        else:
+            data = object.__getattribute__(self, "_data")
+            data[attr] = val
+            return val
+
+
+def build(cls):
+    keys = redis_model.RedisKeys("bench", namespace="bench", load=False, deferred=True,
+                                 schema=cls._schema)
+    model = cls._from_keys(keys)
+    keys._data["name"] = "Fred"
+    keys._data["age"] = 30
+    return model
+
+
+def time_access(model, number):
+    read = min(timeit.repeat(lambda: model.name, number=number, repeat=3)) / number
+    write = min(timeit.repeat(lambda: setattr(model, "name", "Fred"),
+                              number=number, repeat=3)) / number
+    return read, write
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--number", type=int, default=20000)
+    args = parser.parse_args()
+
+    print("%-22s %12s %12s %12s %12s" % ("class", "old read", "new read", "old write",
+                                         "new write"))
+    for cls in (Model, BigModel):
+        old_cls = type("Dir" + cls.__name__, (DirLookup, cls), {})
+        old_read, old_write = time_access(build(old_cls), args.number)
+        new_read, new_write = time_access(build(cls), args.number)
+        print("%-22s %10.2fus %10.2fus %10.2fus %10.2fus   %.0fx / %.0fx faster" % (
+            cls.__name__, old_read * 1e6, new_read * 1e6, old_write * 1e6, new_write * 1e6,
+            old_read / new_read, old_write / new_write))
+
+    model = build(TypedModel)
+    typed = min(timeit.repeat(lambda: model.age, number=args.number, repeat=3)) / args.number
+    print("%-22s %23.2fus   (declared part)" % (TypedModel.__name__, typed * 1e6))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+"""
+Measures how much memory large working sets of loaded models take, with the
+`__slots__` based :py:class:`.RedisModel`, :py:class:`.RedisKeys` and
+:py:class:`.RedisList`, against copies of the same classes which keep a
+per instance `__dict__` instead, the way they used to.
+
+Each model has three scalar parts and a list part of three items, much like
+the models loaded by our batch jobs. No Redis server is needed::
+
+    python benchmarks/memory.py
+    python benchmarks/memory.py --sizes 10000 100000
+"""
+import argparse
+import gc
+import os
+import sys
+import tracemalloc
+import types
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from redisORM import redis_model
+
+
+def without_slots(cls, base=object):
+    """
+    Returns a copy of a slotted class which uses an instance `__dict__`,
+    with class level `None` defaults in place of the slots.
+    """
+    attrs = {}
+    for name, value in vars(cls).items():
+        if name in ("__slots__", "__dict__", "__weakref__"):
+            continue
+        if isinstance(value, types.MemberDescriptorType):
+            value = None
+        attrs[name] = value
+    return type(cls.__name__, (base,), attrs)
+
+
+REPRESENTATIONS = {
+    "slots": (redis_model.RedisModel, redis_model.RedisKeys, redis_model.RedisList),
+    "dict": (without_slots(redis_model.RedisModel), without_slots(redis_model.RedisKeys),
+             without_slots(redis_model.RedisList,
+                           without_slots(redis_model.RedisContainer))),
+}
+
+
+def build(count, model_cls, keys_cls, list_cls):
+    models = []
+    for i in range(count):
+        key = "user%d" % i
+        # Namespaces usually come from parsed input, not one shared literal.
+        namespace = "".join(["us", "ers"])
+        keys = keys_cls(key, namespace=namespace, load=False)
+        keys._data = {
+            "name": "user number %d" % i,
+            "email": "user%d@example.com" % i,
+            "age": "%d" % (i % 90),
+            "groups": list_cls(keys._redis_key("groups"), None, loaded=["a", "b", "c"],
+                               index=(keys.index_key, "groups")),
+        }
+        keys._types = {"name": "string", "email": "string", "age": "string",
+                       "groups": "list"}
+        models.append(model_cls._from_keys(keys))
+    return models
+
+
+def measure(count, representation):
+    gc.collect()
+    tracemalloc.start()
+    models = build(count, *REPRESENTATIONS[representation])
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del models
+    return current
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000])
+    args = parser.parse_args()
+
+    print("%10s %14s %14s %10s" % ("models", "dict (MB)", "slots (MB)", "saved"))
+    for count in args.sizes:
+        old = measure(count, "dict")
+        new = measure(count, "slots")
+        print("%10d %14.1f %14.1f %9.0f%%" % (count, old / 1e6, new / 1e6,
+                                              100.0 * (old - new) / old))
+
+
+if __name__ == "__main__":
+    main()
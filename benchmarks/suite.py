@@ -0,0 +1,324 @@
+#!/usr/bin/env python
+"""
+Benchmarks the common :py:class:`.RedisModel`, :py:class:`.RedisKeys` and
+:py:class:`.RedisList` operations at several data sizes, reporting the
+number of Redis round trips and commands each one takes along with its wall
+time.
+
+Two backends are supported, neither of which touches an existing server:
+
+    #. `fakeredis` - an in process fake server, the default. Needs the
+       `fakeredis` package, and `lupa` for the list scripts.
+    #. `server` - a throwaway `redis-server` spawned on a free local port.
+
+Since both are local, `--rtt` can add a simulated network round trip time to
+every round trip, which shows what the counts cost against a real deployment.
+Results can be written as JSON, and compared against an earlier run to spot
+regressions between commits::
+
+    python benchmarks/suite.py --json before.json
+    git checkout my-branch
+    python benchmarks/suite.py --rtt 0.5 --compare before.json
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import socket
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import redis
+
+from redisORM import redis_model
+
+NAMESPACE = "bench"
+
+SCENARIOS = []
+
+
+def scenario(func):
+    """
+    Registers a scenario. Scenarios take a connection and a size, do any
+    untimed setup, and return the function which is timed.
+    """
+    SCENARIOS.append(func)
+    return func
+
+
+class LazyListModel(redis_model.RedisModel):
+    _lazy_lists = True
+
+
+def make_models(conn, size, parts=4, items=3):
+    keys = ["model%d" % i for i in range(size)]
+    for key in keys:
+        fields = dict(("part%d" % i, "value %d" % i) for i in range(parts))
+        redis_model.RedisModel(namespace=NAMESPACE, key=key, conn=conn,
+                               things=list(range(items)), **fields)
+    return keys
+
+
+@scenario
+def create(conn, size):
+    def run():
+        for i in range(size):
+            redis_model.RedisModel(namespace=NAMESPACE, key="model%d" % i, conn=conn,
+                                   part0="a", part1="b", part2="c", part3="d",
+                                   things=[1, 2, 3])
+    return run
+
+
+@scenario
+def load(conn, size):
+    keys = make_models(conn, size)
+
+    def run():
+        for key in keys:
+            redis_model.RedisModel(namespace=NAMESPACE, key=key, conn=conn)
+    return run
+
+
+@scenario
+def get_many(conn, size):
+    keys = make_models(conn, size)
+
+    def run():
+        redis_model.RedisModel.get_many(NAMESPACE, keys, conn=conn)
+    return run
+
+
+@scenario
+def iter_namespace(conn, size):
+    make_models(conn, size)
+
+    def run():
+        for model in redis_model.RedisModel.iter_namespace(NAMESPACE, conn=conn):
+            pass
+    return run
+
+
+@scenario
+def field_get_set(conn, size):
+    model = redis_model.RedisModel(namespace=NAMESPACE, key="model", conn=conn, count=0)
+
+    def run():
+        for i in range(size):
+            model.count
+            model.count = i
+    return run
+
+
+@scenario
+def batch_set(conn, size):
+    model = redis_model.RedisModel(namespace=NAMESPACE, key="model", conn=conn)
+
+    def run():
+        with model.batch():
+            for i in range(size):
+                model["part%d" % i] = i
+    return run
+
+
+@scenario
+def list_extend(conn, size):
+    model = redis_model.RedisModel(namespace=NAMESPACE, key="model", conn=conn, things=[0])
+    items = list(range(size))
+
+    def run():
+        model.things.extend(items)
+    return run
+
+
+@scenario
+def list_iterate(conn, size):
+    make_models(conn, 1, items=size)
+
+    def run():
+        model = redis_model.RedisModel(namespace=NAMESPACE, key="model0", conn=conn)
+        for item in model.things:
+            pass
+    return run
+
+
+@scenario
+def lazy_list_iterate(conn, size):
+    make_models(conn, 1, items=size)
+
+    def run():
+        model = LazyListModel(namespace=NAMESPACE, key="model0", conn=conn)
+        for item in model.things:
+            pass
+    return run
+
+
+@scenario
+def delete(conn, size):
+    keys = make_models(conn, size)
+    models = redis_model.RedisModel.get_many(NAMESPACE, keys, conn=conn)
+
+    def run():
+        for model in models:
+            model.delete()
+    return run
+
+
+def instrument(conn, rtt=0.0):
+    """
+    Swaps the connection class of a clients pool for one which counts round
+    trips and commands, and sleeps for `rtt` seconds on every round trip to
+    simulate the network. Returns the `dict` of counters.
+    """
+    counters = {"round_trips": 0, "commands": 0}
+    base = conn.connection_pool.connection_class
+
+    class ShimConnection(base):
+        def send_packed_command(self, command, check_health=True):
+            counters["round_trips"] += 1
+            if rtt:
+                time.sleep(rtt)
+            return base.send_packed_command(self, command, check_health)
+
+        def pack_command(self, *args):
+            counters["commands"] += 1
+            return base.pack_command(self, *args)
+
+        def pack_commands(self, commands):
+            commands = list(commands)
+            counters["commands"] += len(commands)
+            return base.pack_commands(self, commands)
+
+    conn.connection_pool.disconnect()
+    conn.connection_pool.connection_class = ShimConnection
+    return counters
+
+
+def fakeredis_backend():
+    import fakeredis
+    return fakeredis.FakeStrictRedis(decode_responses=True), None
+
+
+def server_backend():
+    """
+    Spawns a `redis-server` with persistence turned off on a free port.
+    """
+    binary = shutil.which("redis-server")
+    if binary is None:
+        raise SystemExit("redis-server isn't on the PATH.")
+
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    port = sock.getsockname()[1]
+    sock.close()
+
+    process = subprocess.Popen([binary, "--port", str(port), "--bind", "127.0.0.1",
+                                "--save", "", "--appendonly", "no"],
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    conn = redis.StrictRedis("127.0.0.1", port=port, decode_responses=True)
+    for attempt in range(50):
+        try:
+            conn.ping()
+            return conn, process
+        except redis.ConnectionError:
+            time.sleep(0.1)
+
+    process.terminate()
+    raise SystemExit("redis-server didn't start.")
+
+
+BACKENDS = {"fakeredis": fakeredis_backend, "server": server_backend}
+
+
+def run_scenario(conn, counters, func, size, repeat):
+    best = None
+    for attempt in range(repeat):
+        conn.flushdb()
+        timed = func(conn, size)
+
+        counters["round_trips"] = counters["commands"] = 0
+        start = time.perf_counter()
+        timed()
+        seconds = time.perf_counter() - start
+
+        if best is None or seconds < best["seconds"]:
+            best = {"scenario": func.__name__, "size": size, "seconds": seconds,
+                    "round_trips": counters["round_trips"],
+                    "commands": counters["commands"]}
+    return best
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"],
+                                       stderr=subprocess.DEVNULL).decode("ascii").strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline_path):
+    with open(baseline_path) as f:
+        baseline = dict(((r["scenario"], r["size"]), r) for r in json.load(f)["results"])
+
+    print("\nCompared to %s:" % baseline_path)
+    print("%-20s %7s %10s %14s" % ("scenario", "size", "time", "round trips"))
+    for result in results:
+        old = baseline.get((result["scenario"], result["size"]))
+        if old is None:
+            continue
+        print("%-20s %7d %9.2fx %+14d" % (result["scenario"], result["size"],
+                                           result["seconds"] / old["seconds"],
+                                           result["round_trips"] - old["round_trips"]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--backend", choices=sorted(BACKENDS), default="fakeredis")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--scenarios", nargs="+", metavar="NAME",
+                        help="Only run these, out of: %s" % ", ".join(f.__name__ for f in SCENARIOS))
+    parser.add_argument("--rtt", type=float, default=0.0,
+                        help="Simulated round trip time in milliseconds.")
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="Runs per scenario, the fastest is reported.")
+    parser.add_argument("--json", metavar="PATH", help="Write the results here as JSON.")
+    parser.add_argument("--compare", metavar="PATH", help="A JSON file from an earlier run.")
+    args = parser.parse_args()
+
+    conn, process = BACKENDS[args.backend]()
+    counters = instrument(conn, args.rtt / 1000.0)
+
+    scenarios = [func for func in SCENARIOS
+                 if not args.scenarios or func.__name__ in args.scenarios]
+    results = []
+    try:
+        print("%-20s %7s %12s %12s %10s" % ("scenario", "size", "time (ms)", "round trips",
+                                            "commands"))
+        for func in scenarios:
+            for size in args.sizes:
+                result = run_scenario(conn, counters, func, size, args.repeat)
+                results.append(result)
+                print("%-20s %7d %12.2f %12d %10d" % (result["scenario"], size,
+                                                     result["seconds"] * 1000,
+                                                     result["round_trips"],
+                                                     result["commands"]))
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"commit": git_commit(), "python": platform.python_version(),
+                       "backend": args.backend, "rtt_ms": args.rtt, "results": results},
+                      f, indent=2, sort_keys=True)
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -49,9 +49,9 @@ copyright = u'2014, Joshua P Ashby'
 # built documents.
 #
 # The short X.Y version.
-version = '0.1.0'
+version = '0.3'
 # The full version, including alpha/beta/rc tags.
-release = '0.1.0'
+release = '0.3.0'
 
 # The language for content autogenerated by Sphinx. Refer to documentation
 # for a list of supported languages.
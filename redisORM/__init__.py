@@ -1,7 +1,14 @@
 #!/usr/bin/env python
-from .redis_model import RedisModel, RedisList, RedisORMException, RedisKeys
+from .redis_model import (RedisModel, RedisList, LazyRedisList, RedisSet,
+                          RedisSortedSet, RedisHash, Scored, RedisORMException,
+                          RedisORMConflict, RedisKeys, Batch, batch, load_many,
+                          build_part_index, migrate_to_hash, purge_namespace,
+                          load_scripts)
 
-__version__ = '0.2.0'
+__version__ = '0.3.0'
 VERSION = tuple(map(int, __version__.split('.')))
 
-__all__ = ["RedisModel", "RedisList", "RedisORMException", "RedisKeys"]
+__all__ = ["RedisModel", "RedisList", "LazyRedisList", "RedisSet", "RedisSortedSet",
+           "RedisHash", "Scored", "RedisORMException",
+           "RedisORMConflict", "RedisKeys", "Batch", "batch", "load_many",
+           "build_part_index", "migrate_to_hash", "purge_namespace", "load_scripts"]
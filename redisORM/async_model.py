@@ -0,0 +1,446 @@
+#!/usr/bin/env python
+"""
+Asyncio counterparts of :py:class:`.RedisModel` and :py:class:`.RedisList`,
+built on `redis.asyncio`, for use from inside an event loop.
+
+They are built on the same :py:class:`.RedisKeys` as the synchronous classes,
+so they share its key layout, part index, fields hash, typed field schemas,
+secondary indexes and TTLs, and data written by either can be read by the
+other. Unlike :py:class:`.RedisModel` though, setting an attribute on an
+:py:class:`.AsyncRedisModel` only changes it in memory; changes are written
+with `await model.save()`::
+
+    from redis import asyncio as aioredis
+    from redisORM.async_model import AsyncRedisModel
+
+    conn = aioredis.StrictRedis(host="localhost", decode_responses=True)
+
+    model = await AsyncRedisModel.load("test", "sample1", conn=conn)
+    model.name = "Ludwig Van Beethoven"
+    await model.save()
+
+    async for work in model.famous_works:
+        print(work)
+
+Since nothing in here holds a connection for longer than a single command or
+pipeline, many loads can be in flight at once on a single connection pool, for
+example with `asyncio.gather`.
+
+.. note::
+    Requires redis-py 5.0.1 or newer. Only scalar and list parts
+    are supported; models with set, sorted set or hash parts raise a
+    :py:class:`.RedisORMException`. The module level `cache` of
+    :py:mod:`redisORM.redis_model` is invalidated by writes, but not read
+    from.
+"""
+from redis.exceptions import WatchError
+
+from . import redis_model
+from .redis_model import RedisORMException, RedisORMConflict, RedisContainer, RedisKeys, \
+    RedisList, _text, _text_keys, _stored_values
+
+redis = None
+"""
+Global AsyncRedisModel connection, a `redis.asyncio` client, which can be set
+before hand to avoid passing a connection around everywhere all the time.
+"""
+
+
+class AsyncRedisList(RedisContainer):
+    """
+    The asyncio counterpart of :py:class:`.RedisList`. Reads of the mirrored
+    list are plain `list` operations, while everything which talks to redis
+    is a coroutine. `async for` streams the list straight from redis a page
+    at a time rather than using the mirror.
+    """
+    __slots__ = ("_list", "chunk_size", "page_size")
+
+    object_type = "list"
+
+    def __init__(self, key, conn, loaded=None, index=None, page_size=None, codec=None,
+                 ttl=None, index_ttl=None):
+        """
+        :param key: The full Redis key of the list.
+        :param conn: The `redis.asyncio` connection to use.
+        :param loaded: The already fetched contents of the list.
+        :param index: A `(index_key, part)` tuple for the owning models part
+            index, which is updated whenever this list is pushed to.
+        :param page_size: The number of items fetched per `LRANGE` by
+            `async for`. Defaults to the module level `list_page_size` of
+            :py:mod:`redisORM.redis_model`.
+        :param codec: The :py:class:`redisORM.fields.Field` used to encode and
+            decode each item.
+        :param ttl: The TTL in seconds the list is given every time it's
+            written to. `None` for no expiry.
+        :param index_ttl: The TTL in seconds of the owning models part index,
+            refreshed along with the list.
+        """
+        self.conn = conn
+        self.key = key
+        self._index = index
+        self._batch = None
+        self.deferred = False
+        self.dirty = False
+        self.codec = codec
+        self.ttl = ttl
+        self.index_ttl = index_ttl
+        self.read_conn = None
+        self.chunk_size = None
+        self.page_size = page_size or redis_model.list_page_size
+        self._list = self._decode_items(list(loaded or []))
+
+    # The writes a model queues when it saves the whole list are the same
+    # as the synchronous lists.
+    _copy = RedisList._copy
+    _local = RedisList._local
+    _queue_replace = RedisList._queue_replace
+    _push = RedisList._push
+
+    def __repr__(self):
+        return repr(self._list)
+
+    async def _write(self, pipe):
+        """
+        Sends a pipeline from :py:meth:`._pipeline` along with the refresh of
+        the TTLs, returning the replies of the commands queued on it.
+        """
+        expires = self._queue_expire(pipe)
+        try:
+            replies = await pipe.execute()
+        finally:
+            self._invalidate()
+        return replies[:len(replies) - expires]
+
+    async def sync(self):
+        self._list = self._decode_items(await self.conn.lrange(self.key, 0, -1))
+        return self._list
+
+    async def append(self, other):
+        self._list.append(other)
+        pipe = self._pipeline(indexed=True)
+        pipe.rpush(self.key, self._encode_item(other))
+        await self._write(pipe)
+        return self._list
+
+    async def prepend(self, other):
+        self._list.insert(0, other)
+        pipe = self._pipeline(indexed=True)
+        pipe.lpush(self.key, self._encode_item(other))
+        await self._write(pipe)
+        return self._list
+
+    async def extend(self, other):
+        assert type(other) == list
+        self._list.extend(other)
+        if other:
+            pipe = self._pipeline(indexed=True)
+            self._push(pipe, other)
+            await self._write(pipe)
+        return self._list
+
+    async def replace(self, other):
+        self._list = list(other)
+        pipe = self._pipeline()
+        self._queue_replace(pipe)
+        await self._write(pipe)
+        return self._list
+
+    async def remove(self, elem):
+        self._list.remove(elem)
+        pipe = self._pipeline()
+        pipe.lrem(self.key, 1, self._encode_item(elem))
+        await self._write(pipe)
+        return self._list
+
+    async def pop(self):
+        value = self._list.pop()
+        pipe = self._pipeline()
+        pipe.rpop(self.key)
+        await self._write(pipe)
+        return value
+
+    async def lpop(self):
+        value = self._list.pop(0)
+        pipe = self._pipeline()
+        pipe.lpop(self.key)
+        await self._write(pipe)
+        return value
+
+    async def reset(self):
+        self._list = []
+        pipe = self._pipeline()
+        pipe.delete(self.key)
+        await self._write(pipe)
+
+    async def set(self, index, value):
+        self._list[index] = value
+        pipe = self._pipeline()
+        pipe.lset(self.key, index, self._encode_item(value))
+        await self._write(pipe)
+
+    def index(self, elem):
+        return self._list.index(elem)
+
+    def __len__(self):
+        return len(self._list)
+
+    def __getitem__(self, index):
+        return self._list[index]
+
+    def __iter__(self):
+        return iter(self._list)
+
+    async def __aiter__(self):
+        start = 0
+        while True:
+            page = await self.conn.lrange(self.key, start, start + self.page_size - 1)
+            for item in self._decode_items(page):
+                yield item
+            if len(page) < self.page_size:
+                return
+            start += self.page_size
+
+    def __contains__(self, item):
+        return item in self._list
+
+    def __eq__(self, other):
+        return self._list == other
+
+
+class _AsyncKeys(RedisKeys):
+    """
+    The :py:class:`.RedisKeys` behind an :py:class:`.AsyncRedisModel`. It
+    is always deferred, and never talks to redis itself: the model queues
+    its loads and writes on `redis.asyncio` pipelines and awaits them.
+    """
+    __slots__ = ()
+
+    def _new_container(self, part, object_type="list", **kwargs):
+        """
+        :raises RedisORMException: For anything other than a list.
+        """
+        if object_type != "list":
+            raise RedisORMException("AsyncRedisModel doesn't support %s parts." % object_type)
+        return AsyncRedisList(self._redis_key(part), self.conn, loaded=kwargs.get("loaded"),
+                              index=(self.index_key, part), codec=self.schema.get(part),
+                              ttl=self._part_ttl(part), index_ttl=self.model_ttl)
+
+
+class AsyncRedisModel(object):
+    """
+    The asyncio counterpart of :py:class:`.RedisModel`. Create instances with
+    :py:meth:`.load` or :py:meth:`.get_many`, rather than the constructor,
+    so that the models data is fetched.
+
+    Attribute and item access work just like :py:class:`.RedisModel`, except
+    that changes are kept in memory until :py:meth:`.save` is awaited. Only
+    the parts which were changed are written, in a single transaction.
+    """
+    key = None
+    conn = None
+    namespace = None
+    _protected_items = [] #: Object properties which shouldn't be stored in redis.
+    _hash_storage = False #: Store scalar parts in a single Redis hash, see :py:class:`.RedisKeys`.
+    _schema = {} #: Part name to :py:class:`redisORM.fields.Field`, see :py:mod:`redisORM.fields`.
+    _indexes = {} #: Part name to `"equality"` or `"range"`, see :py:meth:`.RedisModel.find`.
+    _ttl = None #: The TTL in seconds of the whole model, renewed on every write.
+    _field_ttls = {} #: Part name to TTL in seconds, for parts which expire on their own.
+
+    def __init__(self, namespace=None, key=None, conn=None):
+        """
+        Creates an empty model without talking to redis.
+
+        :raises RedisORMException: If no connection or key was supplied.
+        """
+        if not key:
+            raise RedisORMException("No key supplied.")
+
+        conn = conn or redis
+        if not conn:
+            raise RedisORMException("No connection supplied.")
+
+        cls = type(self)
+        object.__setattr__(self, "namespace", namespace or "")
+        object.__setattr__(self, "key", key)
+        object.__setattr__(self, "conn", conn)
+        object.__setattr__(self, "_data", _AsyncKeys(key, namespace=self.namespace, conn=conn,
+                                                     hash_storage=cls._hash_storage,
+                                                     load=False, deferred=True,
+                                                     indexes=cls._indexes, schema=cls._schema,
+                                                     ttl=cls._ttl,
+                                                     field_ttls=cls._field_ttls))
+
+    @classmethod
+    async def load(cls, namespace, key, conn=None):
+        """
+        Creates a model and fetches all of its data from redis.
+
+        :raises RedisORMException: If any part is of an unsupported type.
+        """
+        model = cls(namespace=namespace, key=key, conn=conn)
+        await _load_many(model.conn, [model])
+        return model
+
+    @classmethod
+    async def get_many(cls, namespace, keys, conn=None, create_missing=False):
+        """
+        Loads many models at once in the same pipelined round trips. Works
+        just like :py:meth:`.RedisModel.get_many`.
+        """
+        models = [cls(namespace=namespace, key=key, conn=conn) for key in keys]
+        if models:
+            await _load_many(models[0].conn, models)
+
+        return [model if model._data._data or model._data._types or create_missing else None
+                for model in models]
+
+    async def reload(self):
+        """
+        Throws away any unsaved changes and fetches the model again.
+        """
+        await _load_many(self.conn, [self])
+
+    async def save(self):
+        """
+        Writes every part which was changed or deleted since the model was
+        loaded or last saved, in a single transaction, along with the
+        updates to their secondary indexes and TTLs.
+        """
+        keys = self._data
+        dirty = keys.dirty_parts()
+        if not dirty:
+            return
+
+        pipe = self.conn.pipeline()
+        keys._queue_save(pipe, dirty)
+        try:
+            await pipe.execute()
+        finally:
+            keys._invalidate()
+        keys._saved()
+
+    async def delete(self, retries=None):
+        """
+        Removes every key of the model, and its secondary index entries, in
+        a single transaction, just like :py:meth:`.RedisModel.delete`.
+
+        :param retries: How many times to retry on a conflict. Defaults to the
+            module level `transaction_retries` of :py:mod:`redisORM.redis_model`.
+        :raises RedisORMConflict: If every attempt conflicted.
+        """
+        keys = self._data
+        if retries is None:
+            retries = redis_model.transaction_retries
+
+        for attempt in range(retries + 1):
+            async with self.conn.pipeline() as pipe:
+                try:
+                    await pipe.watch(keys.index_key)
+                    parts = _text_keys(await pipe.hgetall(keys.index_key), values=True)
+                    if not parts and redis_model.scan_fallback:
+                        parts = await _scan_parts(keys)
+
+                    reads = self.conn.pipeline(transaction=False)
+                    wanted = keys._queue_stored_values(reads, parts)
+                    stored = _stored_values(wanted, await reads.execute()) if wanted else {}
+
+                    pipe.multi()
+                    keys._queue_remove(pipe, parts, stored)
+                    await pipe.execute()
+                    break
+
+                except WatchError:
+                    continue
+
+        else:
+            raise RedisORMConflict("Gave up after %s conflicting writes." % (retries + 1))
+
+        keys._invalidate()
+        keys._reset_tracking()
+        keys._data = dict()
+        keys._types = dict()
+
+    def get(self, attr, default=None):
+        return self._data.get_default(attr, default)
+
+    def _is_attribute(self, attr):
+        return attr[0] == "_" or attr in self._protected_items or hasattr(type(self), attr)
+
+    def __getattr__(self, attr):
+        if attr[0] == "_":
+            raise AttributeError(attr)
+        try:
+            return self._data[attr]
+        except KeyError:
+            raise AttributeError(attr)
+
+    def __setattr__(self, attr, value):
+        if self._is_attribute(attr) or hasattr(value, "__call__"):
+            return object.__setattr__(self, attr, value)
+        self[attr] = value
+
+    def __getitem__(self, part):
+        return self._data[part]
+
+    def __setitem__(self, part, value):
+        self._data[part] = value
+
+    def __delitem__(self, part):
+        del self._data[part]
+
+    def __contains__(self, part):
+        return part in self._data
+
+    def __repr__(self):
+        return "<AsyncRedisModel.%s at %s with data: %s >" % (self.__class__.__name__,
+                                                              id(self),
+                                                              self._data)
+
+
+async def _scan_parts(keys):
+    """
+    The asyncio version of :py:meth:`.RedisKeys._scan_parts`.
+    """
+    prefix = keys._redis_key("")
+    found = [_text(key) async for key in keys.conn.scan_iter(
+        match=prefix + "*", count=keys.scan_count or redis_model.scan_count)]
+    found = [key for key in found if not key[len(prefix):].startswith("_")]
+    if not found:
+        return {}
+
+    pipe = keys.conn.pipeline(transaction=False)
+    for key in found:
+        pipe.type(key)
+
+    return dict(zip([key[len(prefix):] for key in found], map(_text, await pipe.execute())))
+
+
+async def _load_many(conn, models):
+    """
+    The asyncio version of :py:func:`.load_many`, taking the same two round
+    trips for indexed models and sharing the loading steps of
+    :py:class:`.RedisKeys`.
+    """
+    keysets = [model._data for model in models]
+
+    pipe = conn.pipeline(transaction=False)
+    counts = [keys._queue_index(pipe) for keys in keysets]
+    replies = await pipe.execute()
+
+    found = []
+    start = 0
+    for keys, count in zip(keysets, counts):
+        index = replies[start:start + count]
+        start += count
+
+        scanned = None
+        if not index[0] and redis_model.scan_fallback:
+            scanned = await _scan_parts(keys)
+        found.append(keys._queue_values(pipe, index, scanned))
+
+    values = await pipe.execute() if any(found) else []
+
+    start = 0
+    for keys, queued in zip(keysets, found):
+        keys._apply_values(queued, values[start:start + len(queued)])
+        start += len(queued)
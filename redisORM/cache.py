@@ -0,0 +1,181 @@
+#!/usr/bin/env python
+"""
+A process local read cache for :py:class:`.RedisModel` data.
+
+Once a cache is installed as the module level `cache` in
+:py:mod:`redisORM.redis_model`, loading a model which was loaded recently
+doesn't touch Redis at all::
+
+    from redisORM import redis_model
+    from redisORM.cache import ModelCache
+
+    redis_model.cache = ModelCache(max_size=50000, ttl=30,
+                                   namespace_ttls={"flags": 300})
+
+What is cached is the data as read from Redis, which each model decodes
+with its own schema, so classes with different schemas over the same data can
+share an entry.
+
+Writes made through the ORM invalidate the cached copy of the model they
+touch. Writes made by other processes are only noticed once the entry expires,
+unless :py:meth:`.ModelCache.listen` is used to invalidate entries from Redis
+keyspace notifications.
+
+.. note::
+    Models which use `lazy` loading or `lazy_lists` are never cached, since
+    they don't hold a full copy of their data to begin with.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from .redis_model import INDEX_PART
+
+
+class ModelCache(object):
+    """
+    A size bounded LRU cache of loaded model data, keyed by each models part
+    index key, with an optional time to live per namespace.
+
+    The `hits`, `misses`, `evictions` and `invalidations` counters can be read
+    directly, or all at once with :py:meth:`.stats`.
+    """
+    def __init__(self, max_size=10000, ttl=None, namespace_ttls=None):
+        """
+        :param max_size: The most models kept in the cache, after which the
+            least recently used are evicted.
+        :param ttl: How many seconds a model is cached for, or `None` to keep
+            it until it is evicted or invalidated.
+        :param namespace_ttls: A `dict` of namespace to ttl which overrides
+            `ttl` for those namespaces. A ttl of `0` disables caching for
+            that namespace.
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.namespace_ttls = namespace_ttls or {}
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._listener = None
+
+    def _ttl_for(self, namespace):
+        return self.namespace_ttls.get(namespace, self.ttl)
+
+    def get(self, cache_key):
+        """
+        Returns the cached data for a model, or `None` if it isn't cached or
+        has expired.
+        """
+        with self._lock:
+            entry = self._entries.get(cache_key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            expires, data = entry
+            if expires is not None and expires < time.time():
+                del self._entries[cache_key]
+                self.misses += 1
+                return None
+
+            # Mark as the most recently used
+            del self._entries[cache_key]
+            self._entries[cache_key] = entry
+            self.hits += 1
+            return data
+
+    def set(self, cache_key, namespace, data):
+        """
+        Caches the data for a model, evicting the least recently used models
+        if the cache is full.
+        """
+        ttl = self._ttl_for(namespace)
+        if ttl == 0:
+            return
+
+        expires = time.time() + ttl if ttl is not None else None
+        with self._lock:
+            self._entries.pop(cache_key, None)
+            self._entries[cache_key] = (expires, data)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, cache_key):
+        """
+        Drops the cached data for a model, if there is any.
+        """
+        with self._lock:
+            if self._entries.pop(cache_key, None) is not None:
+                self.invalidations += 1
+
+    def clear(self):
+        """
+        Drops everything from the cache. The counters are left alone.
+        """
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """
+        Returns a `dict` of the current size and counters of the cache.
+        """
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+    def __len__(self):
+        return len(self._entries)
+
+    def listen(self, conn, namespace="*", configure=False, sleep_time=0.1):
+        """
+        Starts a background thread which invalidates cached models as soon as
+        any of their keys change in Redis, no matter which client changed
+        them, using keyspace notifications.
+
+        Redis only sends these notifications if `notify-keyspace-events` is
+        configured to include at least `K` and the generic, string, list,
+        set, sorted set, hash and expired classes (`Kg$lszhx`).
+
+        :param conn: The redis connection to listen with.
+        :param namespace: Only listen for changes to models in this namespace.
+        :param configure: If `True`, `notify-keyspace-events` is set on the
+            server first.
+        :param sleep_time: How long the listener thread waits between polls.
+        :returns: The listener thread, which can be stopped with its `stop()`
+            method or :py:meth:`.stop_listening`.
+        """
+        if configure:
+            conn.config_set("notify-keyspace-events", "Kg$lszhx")
+
+        db = conn.connection_pool.connection_kwargs.get("db", 0)
+        prefix = "__keyspace@%s__:" % db
+
+        def handler(message):
+            channel = message["channel"]
+            if isinstance(channel, bytes):
+                channel = channel.decode("utf-8")
+            model_key = channel[len(prefix):].rsplit(":", 1)[0]
+            self.invalidate(":".join([model_key, INDEX_PART]))
+
+        pubsub = conn.pubsub(ignore_subscribe_messages=True)
+        pubsub.psubscribe(**{prefix + namespace + ":*": handler})
+        self._listener = pubsub.run_in_thread(sleep_time=sleep_time, daemon=True)
+        return self._listener
+
+    def stop_listening(self):
+        """
+        Stops the keyspace notification listener, if it is running.
+        """
+        if self._listener is not None:
+            self._listener.stop()
+            self._listener = None
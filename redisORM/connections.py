@@ -0,0 +1,232 @@
+#!/usr/bin/env python
+"""
+Connection providers, which pick the Redis connection each namespace uses.
+
+By default every model uses the `conn` it was given, or the module level
+`redis` connection of :py:mod:`redisORM.redis_model`. Setting the module level
+`connections` to a provider instead lets connections come from a managed
+pool, a Sentinel monitored master or a Redis Cluster, and lets namespaces live
+on separate Redis instances::
+
+    from redisORM import redis_model
+    from redisORM.connections import PooledProvider, ClusterProvider, RoutingProvider
+
+    redis_model.hash_tags = True
+    redis_model.connections = RoutingProvider({
+        "sessions": PooledProvider("redis://sessions.internal:6379/0", max_connections=50),
+        "events": ClusterProvider("redis://events.internal:7000"),
+    }, default=PooledProvider("redis://localhost:6379/0"))
+
+Providers can also hand out a second client for a read replica, which models
+are loaded from and read from while their writes go to the primary. See
+`read_your_writes` in :py:mod:`redisORM.redis_model` for keeping a process
+from reading its own writes from a replica which hasn't caught up yet.
+
+A `conn` passed straight to a model or function still wins over the
+provider. Replies are decoded to `str`, which the ORM expects, unless
+`decode_responses=False` is passed.
+
+.. note::
+    Pipelines of Redis Cluster clients send each command to the node which
+    holds its key instead of wrapping them in `MULTI`/`EXEC`, so in a cluster
+    the writes of a model or :py:class:`redisORM.redis_model.Batch` aren't
+    atomic, :py:meth:`redisORM.redis_model.RedisModel.transaction` isn't
+    supported, and deleting a model doesn't watch its part index. Turning on
+    the module level `hash_tags` of :py:mod:`redisORM.redis_model` keeps each
+    model on one node. Secondary indexes are shared by the whole namespace,
+    so can't be kept with the models they index, and aren't supported in a
+    cluster. :py:class:`redisORM.async_model.AsyncRedisModel` doesn't
+    support cluster clients.
+"""
+import redis
+
+from .redis_model import RedisORMException
+
+
+class ConnectionProvider(object):
+    """
+    The interface providers implement.
+    """
+    def get(self, namespace):
+        """
+        Returns the client which models in `namespace` should use.
+        """
+        raise NotImplementedError
+
+    def get_reader(self, namespace):
+        """
+        Returns the client for a read replica of `namespace`, or `None` if
+        reads should go to the primary as well.
+        """
+        return None
+
+
+class PooledProvider(ConnectionProvider):
+    """
+    A single client backed by a connection pool with an upper bound on how
+    many connections it opens.
+    """
+    def __init__(self, url=None, max_connections=None, pool=None, replica_url=None,
+                 replica_pool=None, client_class=redis.StrictRedis, **kwargs):
+        """
+        :param url: A `redis://`, `rediss://` or `unix://` URL of the server.
+        :param max_connections: The most connections the pool opens at once.
+        :param pool: An existing `redis.ConnectionPool` to use instead.
+        :param replica_url: The URL of a read replica, which gets a pool of
+            its own with the same settings.
+        :param replica_pool: An existing `redis.ConnectionPool` for a read
+            replica to use instead.
+        :param client_class: The client class to wrap the pools in.
+        :param kwargs: Passed on to the connection pools, such as `host`,
+            `port`, `db` or `health_check_interval`.
+        """
+        kwargs.setdefault("decode_responses", True)
+        if pool is None:
+            pool = _pool(url, max_connections, kwargs)
+        if replica_pool is None and replica_url is not None:
+            replica_pool = _pool(replica_url, max_connections, kwargs)
+
+        self.pool = pool
+        self.client = client_class(connection_pool=pool)
+        self.replica_pool = replica_pool
+        self.replica = None
+        if replica_pool is not None:
+            self.replica = client_class(connection_pool=replica_pool)
+
+    def get(self, namespace):
+        return self.client
+
+    def get_reader(self, namespace):
+        return self.replica
+
+    def disconnect(self):
+        """
+        Closes every connection in the pools.
+        """
+        self.pool.disconnect()
+        if self.replica_pool is not None:
+            self.replica_pool.disconnect()
+
+
+def _pool(url, max_connections, kwargs):
+    if url is not None:
+        return redis.ConnectionPool.from_url(url, max_connections=max_connections, **kwargs)
+    return redis.ConnectionPool(max_connections=max_connections, **kwargs)
+
+
+class SentinelProvider(ConnectionProvider):
+    """
+    The master of a group monitored by Redis Sentinel. The client asks the
+    sentinels where the master is, so it follows failovers.
+    """
+    def __init__(self, sentinels, service_name, sentinel_kwargs=None,
+                 read_from_replicas=False, **kwargs):
+        """
+        :param sentinels: A list of `(host, port)` tuples of the sentinels.
+        :param service_name: The name the sentinels monitor the group under.
+        :param sentinel_kwargs: Connection arguments for the sentinels
+            themselves.
+        :param read_from_replicas: If `True`, reads go to the replicas of
+            the group, round robin.
+        :param kwargs: Connection arguments for the master, such as `db` or
+            `password`.
+        """
+        from redis.sentinel import Sentinel
+
+        kwargs.setdefault("decode_responses", True)
+        self.sentinel = Sentinel(sentinels, sentinel_kwargs=sentinel_kwargs, **kwargs)
+        self.service_name = service_name
+        self.client = self.sentinel.master_for(service_name, redis_class=redis.StrictRedis)
+        self.replica = None
+        if read_from_replicas:
+            self.replica = self.sentinel.slave_for(service_name, redis_class=redis.StrictRedis)
+
+    def get(self, namespace):
+        return self.client
+
+    def get_reader(self, namespace):
+        return self.replica
+
+
+class ClusterProvider(ConnectionProvider):
+    """
+    A Redis Cluster client. Requires redis-py 4.1 or newer.
+
+    :raises RedisORMException: If redis-py doesn't support Redis Cluster.
+    """
+    def __init__(self, url=None, startup_nodes=None, read_from_replicas=False, **kwargs):
+        """
+        :param url: A `redis://` URL of any node in the cluster.
+        :param startup_nodes: A list of `(host, port)` tuples of nodes to
+            discover the cluster from, instead of a `url`.
+        :param read_from_replicas: If `True`, a second client is kept which
+            sends reads to the replicas of each shard.
+        :param kwargs: Passed on to `redis.cluster.RedisCluster`.
+        """
+        try:
+            from redis.cluster import RedisCluster, ClusterNode
+        except ImportError:
+            raise RedisORMException("The ClusterProvider needs redis-py 4.1 or newer.")
+
+        kwargs.setdefault("decode_responses", True)
+        if url is None:
+            kwargs["startup_nodes"] = [ClusterNode(host, port)
+                                       for host, port in startup_nodes or []]
+
+        def client(**extra):
+            options = dict(kwargs, **extra)
+            if url is not None:
+                return RedisCluster.from_url(url, **options)
+            return RedisCluster(**options)
+
+        self.client = client()
+        self.replica = client(read_from_replicas=True) if read_from_replicas else None
+
+    def get(self, namespace):
+        return self.client
+
+    def get_reader(self, namespace):
+        return self.replica
+
+
+class RoutingProvider(ConnectionProvider):
+    """
+    Sends each namespace to its own provider or client, picked by the
+    longest matching namespace. A route for `users` covers the `users`
+    namespace along with nested ones like `users:archived`.
+    """
+    def __init__(self, routes, default=None):
+        """
+        :param routes: A `dict` of namespace to a provider or a client.
+        :param default: The provider or client for every other namespace.
+        """
+        self.routes = sorted(routes.items(), key=lambda route: len(route[0]), reverse=True)
+        self.default = default
+
+    def get(self, namespace):
+        """
+        :raises RedisORMException: If no route matches and there's no
+            default.
+        """
+        return _resolve(self._route(namespace), namespace)
+
+    def get_reader(self, namespace):
+        target = self._route(namespace)
+        if isinstance(target, ConnectionProvider):
+            return target.get_reader(namespace)
+        return None
+
+    def _route(self, namespace):
+        for prefix, target in self.routes:
+            if namespace == prefix or namespace.startswith(prefix + ":"):
+                return target
+
+        if self.default is None:
+            raise RedisORMException("No connection is routed for the namespace %s." % namespace)
+        return self.default
+
+
+def _resolve(target, namespace):
+    if isinstance(target, ConnectionProvider):
+        return target.get(namespace)
+    return target
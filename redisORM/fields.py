@@ -0,0 +1,234 @@
+#!/usr/bin/env python
+"""
+Typed fields for :py:class:`.RedisModel` parts.
+
+Without a schema every value goes to Redis as whatever `str()` makes of it,
+scalars come back as strings, and list items which look like ints come back
+as ints. Declaring a `_schema` on a model gives its parts a type instead, so
+that each value is encoded once on the way in and decoded once on the way
+out::
+
+    from redisORM import RedisModel
+    from redisORM.fields import Integer, Boolean, DateTime, JSON
+
+    class User(RedisModel):
+        _schema = {
+            "age": Integer(),
+            "admin": Boolean(),
+            "joined": DateTime(),
+            "scores": Integer(),
+            "settings": JSON(),
+        }
+
+A field declared for a list part, like `scores` above, is used for each item
+of the list, and whole lists are decoded in one go. Packed fields, `JSON` and
+`MsgPack`, instead store lists and dicts whole, in a single key or hash field.
+
+`None` is stored as an empty string, which typed fields read back as `None`.
+
+Binary data, in :py:class:`.Bytes` and :py:class:`.MsgPack` fields, needs a
+connection created without `decode_responses`. Models work the same over
+such a connection, except that the values of untyped parts and container
+items come back as `bytes`, so declare a :py:class:`.String` field for text
+parts which should be `str`.
+"""
+import json
+from datetime import datetime, timedelta
+
+from .redis_model import RedisORMException
+
+try:
+    import msgpack
+except ImportError: # pragma: no cover
+    msgpack = None
+
+
+class Field(object):
+    """
+    The base of all fields, which stores values untouched. Subclasses
+    override :py:meth:`.to_redis` and :py:meth:`.to_python`, and
+    :py:meth:`.decode_list` where there is a faster way of decoding many
+    values at once.
+    """
+    packed = False #: Whether lists and dicts are stored whole, rather than as Redis lists.
+
+    def encode(self, value):
+        """
+        Turns a python value into what is sent to Redis.
+
+        :raises RedisORMException: If the value can't be stored in this field.
+        """
+        if value is None or value == "":
+            return ""
+        try:
+            return self.to_redis(value)
+        except (TypeError, ValueError) as e:
+            raise RedisORMException("Can't store %r in a %s field: %s" % (value,
+                                                                          type(self).__name__,
+                                                                          e))
+
+    def decode(self, raw):
+        """
+        Turns a value read from Redis back into a python value.
+        """
+        if raw == "" or raw == b"":
+            return None
+        return self.to_python(raw)
+
+    def decode_list(self, items):
+        """
+        Decodes every item of a list read from Redis.
+        """
+        return [self.decode(item) for item in items]
+
+    def to_redis(self, value):
+        return value
+
+    def to_python(self, raw):
+        return raw
+
+
+class String(Field):
+    """
+    Text, stored as is. Unlike untyped list items, strings of digits such as
+    `"007"` are never turned into ints.
+    """
+    def decode(self, raw):
+        if isinstance(raw, bytes):
+            return raw.decode("utf-8")
+        return raw
+
+
+class Integer(Field):
+    """
+    An `int`, stored in decimal.
+    """
+    def to_redis(self, value):
+        return "%d" % int(value)
+
+    def to_python(self, raw):
+        return int(raw)
+
+    def decode_list(self, items):
+        try:
+            return list(map(int, items))
+        except ValueError:
+            # Only lists holding a `None` are this unlucky.
+            return Field.decode_list(self, items)
+
+
+class Float(Field):
+    """
+    A `float`, stored with `repr` so that it reads back exactly.
+    """
+    def to_redis(self, value):
+        return repr(float(value))
+
+    def to_python(self, raw):
+        return float(raw)
+
+    def decode_list(self, items):
+        try:
+            return list(map(float, items))
+        except ValueError:
+            return Field.decode_list(self, items)
+
+
+class Boolean(Field):
+    """
+    A `bool`, stored as `1` or `0`.
+    """
+    def encode(self, value):
+        if value is None:
+            return ""
+        return "1" if value else "0"
+
+    def to_python(self, raw):
+        return raw in ("1", b"1")
+
+
+class DateTime(Field):
+    """
+    A `datetime`, stored as seconds since the epoch, which is both shorter
+    than an ISO 8601 string and usable as a range index score. Naive
+    datetimes are taken to be in UTC, and naive UTC datetimes are returned.
+    """
+    EPOCH = datetime(1970, 1, 1)
+
+    def to_redis(self, value):
+        offset = value.utcoffset()
+        if offset is not None:
+            value = value.replace(tzinfo=None) - offset
+        delta = value - self.EPOCH
+        micros = (delta.days * 86400 + delta.seconds) * 1000000 + delta.microseconds
+        # Split the magnitude, so that times before the epoch read as a
+        # single negative number, e.g. "-0.500000" rather than "-1.500000".
+        sign = "-" if micros < 0 else ""
+        seconds, micros = divmod(abs(micros), 1000000)
+        if micros:
+            return "%s%d.%06d" % (sign, seconds, micros)
+        return "%s%d" % (sign, seconds)
+
+    def to_python(self, raw):
+        if isinstance(raw, bytes):
+            raw = raw.decode("ascii")
+        seconds, _, micro = raw.lstrip("-").partition(".")
+        delta = timedelta(seconds=int(seconds), microseconds=int(micro or 0))
+        if raw.startswith("-"):
+            return self.EPOCH - delta
+        return self.EPOCH + delta
+
+
+class Bytes(Field):
+    """
+    Raw `bytes`, stored as is. Text read from connections created with
+    `decode_responses` is encoded back to UTF-8, but arbitrary binary data
+    needs a connection without it.
+    """
+    def to_redis(self, value):
+        if not isinstance(value, bytes):
+            raise TypeError("expected bytes")
+        return value
+
+    def to_python(self, raw):
+        if isinstance(raw, bytes):
+            return raw
+        return raw.encode("utf-8")
+
+
+class JSON(Field):
+    """
+    Any JSON serializable value, stored as compact JSON. This is a packed
+    field, so lists and dicts are stored whole rather than as Redis lists.
+    """
+    packed = True
+
+    def to_redis(self, value):
+        return json.dumps(value, separators=(",", ":"))
+
+    def to_python(self, raw):
+        if isinstance(raw, bytes):
+            raw = raw.decode("utf-8")
+        return json.loads(raw)
+
+
+class MsgPack(Field):
+    """
+    Any value `msgpack` can serialize, stored in its binary format, which is
+    smaller and faster to decode than JSON. This is a packed field like
+    :py:class:`.JSON`. Requires the `msgpack` package and, like
+    :py:class:`.Bytes`, a connection without `decode_responses`.
+
+    :raises RedisORMException: If `msgpack` isn't installed.
+    """
+    packed = True
+
+    def __init__(self):
+        if msgpack is None:
+            raise RedisORMException("The MsgPack field needs the msgpack package installed.")
+
+    def to_redis(self, value):
+        return msgpack.packb(value, use_bin_type=True)
+
+    def to_python(self, raw):
+        return msgpack.unpackb(raw, raw=False)
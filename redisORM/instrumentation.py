@@ -0,0 +1,357 @@
+#!/usr/bin/env python
+"""
+Per operation metrics for the Redis traffic the ORM makes.
+
+An :py:class:`.Instrumentation` wraps the connection the ORM uses, and
+records the number of commands, the bytes sent and received and the latency
+of every round trip, tagged with the namespace and the ORM operation which
+made it, such as `load`, `set`, `delete`, `batch` or `list.extend`::
+
+    from redisORM import redis_model
+    from redisORM.instrumentation import Instrumentation, StatsdSink
+
+    metrics = Instrumentation(sinks=[StatsdSink(statsd_client)])
+    redis_model.redis = metrics.install(redis.StrictRedis("localhost", decode_responses=True))
+
+    ...
+
+    metrics.stats()[("load", "users")]["commands"]
+
+Totals and latency histograms are kept in memory and can be read with
+:py:meth:`.Instrumentation.stats`, while sinks forward every round trip to
+statsd, Prometheus or OpenTelemetry as it happens.
+
+When the module level `instrumentation` of :py:mod:`redisORM.redis_model`
+is `None`, the default, all the ORM does is check that before each
+operation.
+
+.. note::
+    Byte counts are the lengths of the command arguments and replies, which
+    for text is the number of characters rather than the exact wire size.
+"""
+import copy
+import threading
+import time
+
+from . import redis_model
+from .redis_model import RedisORMException
+
+_timer = getattr(time, "perf_counter", time.time)
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+"""
+The upper bounds, in seconds, of the latency histogram buckets.
+"""
+
+UNTRACKED = "other"
+"""
+The operation recorded for commands sent outside of any ORM operation.
+"""
+
+
+def _size(value):
+    """
+    Roughly how many bytes a command or reply takes.
+    """
+    if isinstance(value, (bytes, str)):
+        return len(value)
+    if isinstance(value, (list, tuple, set)):
+        return sum(_size(item) for item in value)
+    if isinstance(value, dict):
+        return sum(_size(key) + _size(item) for key, item in value.items())
+    if value is None:
+        return 0
+    return len(str(value))
+
+
+class _Operation(object):
+    """
+    Tags every round trip made inside of it with an ORM operation. The
+    innermost operation wins, so a `load` made while setting a list is
+    still counted as a `load`.
+    """
+    __slots__ = ("local", "tag")
+
+    def __init__(self, local, tag):
+        self.local = local
+        self.tag = tag
+
+    def __enter__(self):
+        stack = getattr(self.local, "stack", None)
+        if stack is None:
+            stack = self.local.stack = []
+        stack.append(self.tag)
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.local.stack.pop()
+        return False
+
+
+class Instrumentation(object):
+    """
+    Collects the commands, bytes and latency of every round trip made
+    through the connections it has wrapped, per `(operation, namespace)`,
+    and forwards them to its sinks.
+    """
+    def __init__(self, sinks=None, buckets=DEFAULT_BUCKETS):
+        """
+        :param sinks: Objects with a `record` method like
+            :py:meth:`.Sink.record`, which are given every round trip.
+        :param buckets: The upper bounds, in seconds, of the latency
+            histogram buckets. Slower round trips go in one last bucket.
+        """
+        self.sinks = list(sinks or [])
+        self.buckets = tuple(buckets)
+
+        self._stats = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def operation(self, operation, namespace):
+        """
+        Returns a context manager which tags the round trips made inside of
+        it, on this thread.
+        """
+        return _Operation(self._local, (operation, namespace or ""))
+
+    def current(self):
+        """
+        Returns the `(operation, namespace)` round trips are currently
+        tagged with.
+        """
+        stack = getattr(self._local, "stack", None)
+        if stack:
+            return stack[-1]
+        return (UNTRACKED, "")
+
+    def record(self, commands, bytes_sent, bytes_received, seconds):
+        """
+        Records a single round trip under the current operation.
+        """
+        operation, namespace = self.current()
+        with self._lock:
+            stats = self._stats.get((operation, namespace))
+            if stats is None:
+                stats = self._stats[(operation, namespace)] = {
+                    "round_trips": 0,
+                    "commands": 0,
+                    "bytes_sent": 0,
+                    "bytes_received": 0,
+                    "seconds": 0.0,
+                    "histogram": [0] * (len(self.buckets) + 1),
+                }
+            stats["round_trips"] += 1
+            stats["commands"] += commands
+            stats["bytes_sent"] += bytes_sent
+            stats["bytes_received"] += bytes_received
+            stats["seconds"] += seconds
+
+            bucket = 0
+            while bucket < len(self.buckets) and seconds > self.buckets[bucket]:
+                bucket += 1
+            stats["histogram"][bucket] += 1
+
+        for sink in self.sinks:
+            sink.record(operation, namespace, commands, bytes_sent, bytes_received, seconds)
+
+    def stats(self):
+        """
+        Returns a copy of the totals so far, as a `dict` of
+        `(operation, namespace)` to a `dict` of `round_trips`, `commands`,
+        `bytes_sent`, `bytes_received`, `seconds` and `histogram`, the counts
+        of round trips per bucket.
+        """
+        with self._lock:
+            return dict((tag, dict(stats, histogram=list(stats["histogram"])))
+                        for tag, stats in self._stats.items())
+
+    def reset(self):
+        """
+        Drops the totals so far.
+        """
+        with self._lock:
+            self._stats.clear()
+
+    def wrap(self, conn):
+        """
+        Returns a copy of a redis client, sharing its connection pool, which
+        records every command and pipeline it sends. The client passed in is
+        left alone.
+        """
+        wrapped = copy.copy(conn)
+        execute_command = type(conn).execute_command.__get__(wrapped)
+        pipeline = type(conn).pipeline.__get__(wrapped)
+
+        def instrumented_execute_command(*args, **options):
+            start = _timer()
+            reply = execute_command(*args, **options)
+            self.record(1, _size(args), _size(reply), _timer() - start)
+            return reply
+
+        def instrumented_pipeline(*args, **kwargs):
+            return self._wrap_pipeline(pipeline(*args, **kwargs))
+
+        wrapped.execute_command = instrumented_execute_command
+        wrapped.pipeline = instrumented_pipeline
+        return wrapped
+
+    def _wrap_pipeline(self, pipe):
+        execute = pipe.execute
+        immediate_execute_command = pipe.immediate_execute_command
+
+        def instrumented_execute(*args, **kwargs):
+            commands = len(pipe.command_stack)
+            sent = sum(_size(command[0]) for command in pipe.command_stack)
+            start = _timer()
+            replies = execute(*args, **kwargs)
+            if commands:
+                self.record(commands, sent, _size(replies), _timer() - start)
+            return replies
+
+        def instrumented_immediate_execute_command(*args, **options):
+            # Commands sent straight away while the pipeline is watching.
+            start = _timer()
+            reply = immediate_execute_command(*args, **options)
+            self.record(1, _size(args), _size(reply), _timer() - start)
+            return reply
+
+        pipe.execute = instrumented_execute
+        pipe.immediate_execute_command = instrumented_immediate_execute_command
+        return pipe
+
+    def install(self, conn):
+        """
+        Makes this the module level `instrumentation` of
+        :py:mod:`redisORM.redis_model`, so ORM operations tag their round
+        trips, and returns the wrapped connection from :py:meth:`.wrap`.
+        """
+        redis_model.instrumentation = self
+        return self.wrap(conn)
+
+    def uninstall(self):
+        """
+        Turns off tagging, if this is the installed instrumentation. Wrapped
+        connections still record round trips, as untracked.
+        """
+        if redis_model.instrumentation is self:
+            redis_model.instrumentation = None
+
+
+class Sink(object):
+    """
+    The interface sinks implement. Sinks are called on the thread which made
+    the round trip, so should be quick.
+    """
+    def record(self, operation, namespace, commands, bytes_sent, bytes_received, seconds):
+        """
+        Called for every round trip.
+
+        :param operation: The ORM operation, such as `load` or `list.extend`.
+        :param namespace: The namespace of the model.
+        :param commands: The number of commands in the round trip.
+        :param bytes_sent: Roughly how many bytes were sent.
+        :param bytes_received: Roughly how many bytes were received.
+        :param seconds: How long the round trip took.
+        """
+        raise NotImplementedError
+
+
+def _metric_part(value):
+    return (value or "none").replace(":", "_").replace(".", "_")
+
+
+class StatsdSink(Sink):
+    """
+    Sends counters and timers to statsd, with the namespace and operation in
+    the metric name: `<prefix>.<namespace>.<operation>.commands`. Any client
+    with `incr(name, count)` and `timing(name, milliseconds)` works, such as
+    the `statsd` package.
+    """
+    def __init__(self, client, prefix="redisorm"):
+        self.client = client
+        self.prefix = prefix
+
+    def record(self, operation, namespace, commands, bytes_sent, bytes_received, seconds):
+        name = ".".join([self.prefix, _metric_part(namespace), _metric_part(operation)])
+        self.client.incr(name + ".round_trips", 1)
+        self.client.incr(name + ".commands", commands)
+        self.client.incr(name + ".bytes_sent", bytes_sent)
+        self.client.incr(name + ".bytes_received", bytes_received)
+        self.client.timing(name + ".latency", seconds * 1000.0)
+
+
+class PrometheusSink(Sink):
+    """
+    Updates Prometheus counters and a latency histogram, labelled by
+    `operation` and `namespace`. Requires the `prometheus_client` package.
+
+    :raises RedisORMException: If `prometheus_client` isn't installed.
+    """
+    def __init__(self, registry=None, prefix="redisorm", buckets=DEFAULT_BUCKETS):
+        try:
+            import prometheus_client
+        except ImportError:
+            raise RedisORMException("The PrometheusSink needs prometheus_client installed.")
+
+        kwargs = {"labelnames": ("operation", "namespace")}
+        if registry is not None:
+            kwargs["registry"] = registry
+
+        self.round_trips = prometheus_client.Counter(prefix + "_round_trips_total",
+                                                     "Redis round trips made by the ORM.",
+                                                     **kwargs)
+        self.commands = prometheus_client.Counter(prefix + "_commands_total",
+                                                  "Redis commands sent by the ORM.", **kwargs)
+        self.bytes_sent = prometheus_client.Counter(prefix + "_sent_bytes_total",
+                                                    "Bytes sent to Redis by the ORM.", **kwargs)
+        self.bytes_received = prometheus_client.Counter(prefix + "_received_bytes_total",
+                                                        "Bytes received from Redis by the ORM.",
+                                                        **kwargs)
+        self.latency = prometheus_client.Histogram(prefix + "_round_trip_seconds",
+                                                   "Latency of Redis round trips made by the ORM.",
+                                                   buckets=buckets, **kwargs)
+
+    def record(self, operation, namespace, commands, bytes_sent, bytes_received, seconds):
+        labels = (operation, namespace)
+        self.round_trips.labels(*labels).inc()
+        self.commands.labels(*labels).inc(commands)
+        self.bytes_sent.labels(*labels).inc(bytes_sent)
+        self.bytes_received.labels(*labels).inc(bytes_received)
+        self.latency.labels(*labels).observe(seconds)
+
+
+class OpenTelemetrySink(Sink):
+    """
+    Records OpenTelemetry counters and a latency histogram, with `operation`
+    and `namespace` attributes. Requires the `opentelemetry-api` package.
+
+    :param meter: The meter to create the instruments with, defaults to the
+        `redisORM` meter of the global meter provider.
+    :raises RedisORMException: If `opentelemetry` isn't installed.
+    """
+    def __init__(self, meter=None):
+        if meter is None:
+            try:
+                from opentelemetry import metrics
+            except ImportError:
+                raise RedisORMException("The OpenTelemetrySink needs opentelemetry-api installed.")
+            meter = metrics.get_meter("redisORM")
+
+        self.round_trips = meter.create_counter("redisorm.round_trips",
+                                                description="Redis round trips made by the ORM.")
+        self.commands = meter.create_counter("redisorm.commands",
+                                             description="Redis commands sent by the ORM.")
+        self.bytes_sent = meter.create_counter("redisorm.bytes_sent", unit="By",
+                                               description="Bytes sent to Redis by the ORM.")
+        self.bytes_received = meter.create_counter("redisorm.bytes_received", unit="By",
+                                                   description="Bytes received from Redis by the ORM.")
+        self.latency = meter.create_histogram("redisorm.round_trip.duration", unit="s",
+                                              description="Latency of Redis round trips made by the ORM.")
+
+    def record(self, operation, namespace, commands, bytes_sent, bytes_received, seconds):
+        attributes = {"operation": operation, "namespace": namespace}
+        self.round_trips.add(1, attributes)
+        self.commands.add(commands, attributes)
+        self.bytes_sent.add(bytes_sent, attributes)
+        self.bytes_received.add(bytes_received, attributes)
+        self.latency.record(seconds, attributes)
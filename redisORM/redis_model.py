@@ -11,275 +11,3152 @@ This module provides a basic object mapper for groups of Redis keys.
         #. key - the actual name or id of this object
         #. part - the specific element of the model
 
+    With the module level `hash_tags` set, the key is wrapped in a hash tag,
+    `namespace:{key}:part`, so Redis Cluster keeps a model in one slot.
+
 Basic use is like so:
 
 >>> import redis
 >>> from redisORM import RedisModel
->>> redis_instance = redis.StrictRedis("localhost", db=0)
+>>> redis_instance = redis.StrictRedis("localhost", db=0, decode_responses=True)
+
+Lets create a new model:
+
+>>> sample1 = RedisModel(namespace="test", key="sample1", conn=redis_instance)
+>>> sample1 #doctest: +ELLIPSIS
+<RedisModel.RedisModel ...>
+
+And now lets add some data to it. Two strings and a list:
+
+>>> sample1.name = "Ludwig Van Beethoven"
+>>> sample1["era"] = "Classical" # you can also treat it like a dictionary (with some missing features)
+>>> sample1.famous_works = ["Symphony No.5", "Symphony No.7", "Symphony No.9"] # Lists have limited support also
+
+Along with setting data you can also access data, both like an object property
+or by using the dictionary index style:
+
+>>> sample1["name"]
+'Ludwig Van Beethoven'
+>>> sample1.era
+'Classical'
+>>> sample1.famous_works
+['Symphony No.5', 'Symphony No.7', 'Symphony No.9']
+
+You can also check for a property in the model:
+
+>>> "name" in sample1
+True
+>>> "age" in sample1
+False
+>>> "Symphony No.9" in sample1.famous_works
+True
+
+Sets and dicts are stored as Redis sets and hashes, and a
+:py:class:`.Scored` mapping of member to score as a Redis sorted set:
+
+>>> from redisORM import Scored
+>>> sample1.instruments = set(["piano", "viola"])
+>>> "piano" in sample1.instruments
+True
+>>> sample1.symphonies = Scored({"Eroica": 1804, "Pastoral": 1808})
+>>> sample1.symphonies.range_by_score(1805, 1810)
+['Pastoral']
+"""
+import collections
+import contextlib
+import functools
+import hashlib
+import re
+import threading
+import time
+import weakref
+from sys import intern
+from types import MappingProxyType
+
+from redis.exceptions import WatchError, NoScriptError, ResponseError
+
+redis = None
+"""
+Global RedisModel connection which can be set before hand to avoid passing a
+redis instance around everywhere all the time.
+"""
+
+read_redis = None
+"""
+Global connection to a read replica of `redis`. When set, models which use
+the module level connection send their loads and other reads here, while
+every write still goes to `redis`.
+"""
+
+read_your_writes = 0
+"""
+How many seconds after a model is written its reads go to the primary rather
+than a replica, so that replication lag can't hide a write from the process
+which made it. `0` turns this off.
+"""
+
+cache = None
+"""
+An optional process local read cache, such as a
+:py:class:`redisORM.cache.ModelCache`, which loaded models are kept in.
+"""
+
+instrumentation = None
+"""
+An optional :py:class:`redisORM.instrumentation.Instrumentation`, which the
+round trips made by ORM operations are tagged for.
+"""
+
+INDEX_PART = "_parts"
+"""
+The reserved part under which each model keeps its part index: a hash of part
+name to Redis type. Parts starting with an underscore are reserved for
+bookkeeping like this.
+"""
+
+FIELDS_PART = "_fields"
+"""
+The reserved part under which models using hash storage keep their scalar
+parts, as a single Redis hash.
+"""
+
+SECONDARY_INDEX_PART = "_idx"
+"""
+The reserved key, in place of a model key, under which the secondary indexes
+of a namespace are kept: `namespace:_idx:part:value` sets for equality
+indexes and `namespace:_idx:part` sorted sets for range indexes. Model keys
+starting with an underscore are reserved for this.
+"""
+
+scan_fallback = False
+"""
+Whether models without a part index should be discovered by scanning the
+keyspace. Data written before models kept a part index can only be read this
+way, but it makes loading every new or empty model a `SCAN` of the whole
+keyspace. Rather than turning this on, run :py:func:`.build_part_index` once
+over the existing data.
+"""
+
+list_chunk_size = 1000
+"""
+The most items :py:class:`.RedisList` sends in a single `RPUSH`. Big lists are
+split into several pushes of this size, all sent in one pipeline.
+"""
+
+list_page_size = 500
+"""
+The number of items a :py:class:`.LazyRedisList` fetches per `LRANGE` while
+iterating, and the default size of its window cache.
+"""
+
+transaction_retries = 5
+"""
+How many times :py:meth:`.RedisKeys.transaction` retries after a conflicting
+write, before giving up with :py:class:`.RedisORMConflict`.
+"""
+
+unlink = True
+"""
+Remove keys with `UNLINK`, which frees their memory in a background thread on
+the server instead of blocking it while big lists are freed. Set to `False`
+to use `DEL` against servers older than Redis 4.0.
+"""
+
+connections = None
+"""
+An optional :py:class:`redisORM.connections.ConnectionProvider`, which picks
+the connection each namespace uses when no `conn` is passed in, in place of
+the module level `redis` connection.
+"""
+
+hash_tags = False
+"""
+Wrap the key of each model in a hash tag, `namespace:{key}:part`, so that
+Redis Cluster keeps every part of a model in the same hash slot, and so on
+the same node, where loading it takes a single pipeline. Models written with
+one layout aren't found with the other.
+"""
+
+scan_count = 1000
+"""
+The `COUNT` hint given to `SCAN` while discovering the parts of a model.
+Larger values mean fewer round trips but longer individual server steps;
+`SCAN` never blocks the server the way `KEYS` does either way.
+"""
+
+
+class RedisORMException(Exception):
+    """
+    The general exception class which is raised by this module. Nothing special.
+    """
+
+
+class RedisORMConflict(RedisORMException):
+    """
+    Raised when an optimistic transaction keeps conflicting with writes from
+    other clients, and has run out of retries.
+    """
+
+
+def _model_key(namespace, key, part):
+    """
+    Builds the Redis key for a part of a model, with the models key wrapped
+    in a hash tag if the module level `hash_tags` is set.
+    """
+    if hash_tags:
+        return "%s:{%s}:%s" % (namespace, key, part)
+    return ":".join([namespace, key, part])
+
+
+def _text(value):
+    """
+    Connections without `decode_responses` reply with `bytes`, which turns
+    the key names, part names and Redis types the ORM works with back into
+    `str`. Part values are left alone, for fields to decode.
+    """
+    if isinstance(value, bytes):
+        return value.decode("utf-8")
+    return value
+
+
+def _text_keys(mapping, values=False):
+    """
+    Runs :py:func:`._text` over the keys of a hash reply, and its values as
+    well if `values` is set.
+    """
+    if values:
+        return dict((_text(key), _text(value)) for key, value in mapping.items())
+    return dict((_text(key), value) for key, value in mapping.items())
+
+
+def _split_model_key(namespace, redis_key):
+    """
+    The reverse of :py:func:`._model_key`, returns the `(key, part)` of a
+    Redis key in the given namespace.
+    """
+    key, part = redis_key[len(namespace) + 1:].rsplit(":", 1)
+    if hash_tags and key.startswith("{") and key.endswith("}"):
+        key = key[1:-1]
+    return key, part
+
+
+def _is_nested(namespace, redis_key):
+    """
+    Whether a key matched by a `namespace:*` pattern belongs to a model in a
+    nested namespace, such as `users:archived:george:_parts` when looking
+    through `users`, rather than to a model in `namespace` itself.
+    """
+    key = redis_key[len(namespace) + 1:].rsplit(":", 1)[0]
+    if hash_tags:
+        return not (key.startswith("{") and key.endswith("}"))
+    return ":" in key
+
+
+def _connection(namespace, conn=None):
+    """
+    Picks the connection for a namespace: the one passed in, otherwise the
+    one from the module level `connections` provider, otherwise the module
+    level `redis` connection.
+
+    :raises RedisORMException: If there is no connection to use.
+    """
+    if conn is None and connections is not None:
+        conn = connections.get(namespace or "")
+    if conn is None:
+        conn = redis
+    if conn is None:
+        raise RedisORMException("No connection supplied.")
+    return conn
+
+
+def _connections(namespace, conn=None, read_conn=None):
+    """
+    Picks the `(conn, read_conn)` pair for a namespace. A `conn` passed in
+    without a `read_conn` is used for reads as well, otherwise the replica
+    comes from the module level `connections` provider, or `read_redis`.
+    `read_conn` is `None` when reads go to the primary.
+    """
+    if conn is None and read_conn is None:
+        if connections is not None:
+            read_conn = connections.get_reader(namespace or "")
+        else:
+            read_conn = read_redis
+    return _connection(namespace, conn), read_conn
+
+
+_recent_writes = collections.OrderedDict()
+_recent_writes_lock = threading.Lock()
+
+
+def _wrote(index_key):
+    """
+    Records that a model was just written, for `read_your_writes`.
+    """
+    if not read_your_writes:
+        return
+
+    now = time.time()
+    with _recent_writes_lock:
+        _recent_writes.pop(index_key, None)
+        _recent_writes[index_key] = now + read_your_writes
+        # Entries are kept in the order they expire in, drop the stale ones.
+        while True:
+            oldest = next(iter(_recent_writes))
+            if _recent_writes[oldest] > now:
+                break
+            del _recent_writes[oldest]
+
+
+def _recently_written(index_key):
+    until = _recent_writes.get(index_key)
+    return until is not None and until > time.time()
+
+
+def _node_of(conn, key):
+    """
+    The name of the Redis Cluster node which holds `key`, or `None` for
+    clients which aren't clustered.
+    """
+    get_node = getattr(conn, "get_node_from_key", None)
+    if get_node is None:
+        return None
+    return get_node(key).name
+
+
+def _is_cluster(conn):
+    """
+    Whether a client, or a pipeline of one, is for Redis Cluster. Their
+    pipelines send each command to the node holding its key rather than as
+    one `MULTI`/`EXEC`, so they can't `WATCH`, and only take one key per
+    `DEL` or `UNLINK`.
+    """
+    return getattr(conn, "keyslot", None) is not None
+
+
+def _secondary_key(namespace, part, value=None):
+    """
+    Builds the Redis key for the secondary index of a part, see
+    `SECONDARY_INDEX_PART`.
+    """
+    parts = [namespace, SECONDARY_INDEX_PART, part]
+    if value is not None:
+        parts.append("%s" % value)
+    return ":".join(parts)
+
+
+def _track(operation, namespace):
+    """
+    Returns a context manager which tags the round trips made inside of it
+    with an ORM operation, if the module level `instrumentation` is set.
+    """
+    if instrumentation is None:
+        return _NOT_TRACKED
+    return instrumentation.operation(operation, namespace)
+
+
+def _tracked(operation):
+    """
+    Decorates a :py:class:`.RedisKeys` or :py:class:`.RedisContainer` method so
+    that its round trips are tagged with `operation` and the namespace of
+    the model, see :py:func:`._track`.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(self, *args, **kwargs):
+            if instrumentation is None:
+                return func(self, *args, **kwargs)
+            if isinstance(self, RedisKeys):
+                namespace = self.namespace
+            else:
+                namespace = self.key.rsplit(":", 2)[0]
+            with instrumentation.operation(operation, namespace):
+                return func(self, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class _NotTracked(object):
+    __slots__ = ()
+
+    def __enter__(self):
+        pass
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+_NOT_TRACKED = _NotTracked()
+
+
+def _queue_fetch(pipe, redis_key, object_type):
+    """
+    Queues the command needed to fetch a part of the given Redis type.
+    Returns `False` if the key has gone away since its type was checked.
+
+    :raises RedisORMException: If the redis type isn't a string, list, set,
+        sorted set or hash.
+    """
+    if object_type == "string":
+        pipe.get(redis_key)
+
+    elif object_type == "list":
+        pipe.lrange(redis_key, 0, -1)
+
+    elif object_type == "set":
+        pipe.smembers(redis_key)
+
+    elif object_type == "zset":
+        pipe.zrange(redis_key, 0, -1, withscores=True)
+
+    elif object_type == "hash":
+        pipe.hgetall(redis_key)
+
+    elif object_type == "none":
+        return False
+
+    else:
+        raise RedisORMException("Redis type %s is unsupported at this time." % object_type)
+
+    return True
+
+
+_CONTAINER_TYPES = frozenset(["list", "set", "zset", "hash"])
+"""
+The Redis types which are kept in a :py:class:`.RedisContainer` rather than
+as a plain value.
+"""
+
+_NOTHING = MappingProxyType({})
+
+_SCALAR_TYPES = frozenset([str, bytes, int, float, bool, type(None)])
+"""
+Types which are never stored as a :py:class:`.RedisContainer`, which part
+writes check for before anything else.
+"""
+
+
+class RedisKeys(object):
+    """
+    Where the realtime syncing and updating takes place.
+
+    A `dict` like object which is used as the backing data store for
+    :py:class:`.RedisModel`.
+
+    Aka: The Source of Magic
+    """
+    # Batch jobs can hold hundreds of thousands of these, so skip the
+    # per instance __dict__.
+    __slots__ = ("_data", "_types", "conn", "namespace", "key", "scan_count",
+                 "hash_storage", "lazy_lists", "lazy", "indexes", "prefetch",
+                 "deferred", "schema", "model_ttl", "field_ttls", "read_conn",
+                 "_indexed_values", "_dirty", "_deleted", "_batch")
+
+    def __init__(self, key, namespace="", conn=None, scan_count=None,
+                 hash_storage=False, load=True, lazy_lists=False, lazy=False,
+                 prefetch=None, deferred=False, indexes=None, schema=None, ttl=None,
+                 field_ttls=None, read_conn=None):
+        """
+        Creates a new `dict` like object which is used to actually store data in
+        Redis. Under all normal circumstances, you should not need to use this
+        class in any way shape or form, as it is the backing datastore for the
+        model.
+
+        :param key: The key section of the Redis key.
+        :param namespace: The key namespace.
+        :param conn: The Redis connection to use.
+        :param scan_count: The `COUNT` hint to use while scanning for this
+            models parts. Defaults to the module level `scan_count`.
+        :param hash_storage: If `True`, scalar parts are written as fields of
+            a single Redis hash rather than as their own keys. Lists are still
+            stored in their own keys. Models written either way can be read
+            in either mode.
+        :param load: If `False` nothing is fetched from redis, which is used
+            when loading several models at once with :py:func:`.load_many`.
+        :param lazy_lists: If `True` list, set, sorted set and hash parts are
+            not fetched while loading, and are :py:class:`.LazyRedisList`
+            instances or lazy :py:class:`.RedisSet`,
+            :py:class:`.RedisSortedSet` and :py:class:`.RedisHash` instances,
+            which read from redis as needed.
+        :param lazy: If `True` loading only reads the part index, and each
+            part is fetched from redis the first time it is used.
+        :param prefetch: Parts which should still be fetched while loading a
+            lazy model, all in the same pipelined round trip.
+        :param deferred: If `True` changes are only made in memory, and are
+            written to redis by :py:meth:`.save`. Only the parts which have
+            actually changed are written. Lazy lists are always written
+            straight away.
+        :param indexes: A `dict` of part name to `"equality"` or `"range"`,
+            for the parts which have secondary indexes. See
+            :py:meth:`.RedisModel.find`. Indexed parts are always prefetched
+            by lazy models, so that their old index entries can be removed.
+        :param schema: A `dict` of part name to :py:class:`redisORM.fields.Field`,
+            for the parts which are encoded and decoded as a declared type.
+            The field of a list part is used for each of its items.
+        :param ttl: The TTL in seconds of the whole model. Every write sets
+            the TTL of the keys it writes, along with the part index and
+            fields hash, in the same transaction. `None` for no expiry.
+        :param field_ttls: A `dict` of part name to TTL in seconds, for parts
+            which expire on their own schedule. These parts are always
+            stored in their own key, even with `hash_storage`.
+        :param read_conn: A connection to a read replica, which loads and
+            other reads are sent to, while writes go to `conn`. For
+            `read_your_writes` seconds after the model is written its reads
+            go to `conn` as well.
+
+        :raises RedisORMException: If no key was provided.
+        """
+        self._data = dict()
+        self._types = dict()
+        self.conn = conn
+        self.namespace = intern(namespace or "") # Key prefix
+        self.key = key
+        self.scan_count = scan_count
+        self.hash_storage = hash_storage
+        self.lazy_lists = lazy_lists
+        self.lazy = lazy
+        # The settings dicts are shared with the model class, not copied.
+        self.indexes = indexes if indexes is not None else {}
+        self.prefetch = tuple(prefetch or ()) + tuple(part for part in self.indexes
+                                                      if part not in (prefetch or ()))
+        self.deferred = deferred
+        self.schema = schema if schema is not None else {}
+        self.model_ttl = ttl
+        self.field_ttls = field_ttls if field_ttls is not None else {}
+        self.read_conn = read_conn
+        self._reset_tracking()
+        self._batch = None
+
+        if not self.key:
+            raise RedisORMException("RedisKeys needs a key, which means something went terribly wrong.")
+
+        if load:
+            self.load()
+
+    def _redis_key(self, part):
+        return _model_key(self.namespace, self.key, part)
+
+    def _read(self):
+        """
+        The connection reads go to: the replica, unless there isn't one or
+        the model was written within the `read_your_writes` window.
+        """
+        if self.read_conn is None or _recently_written(self.index_key):
+            return self.conn
+        return self.read_conn
+
+    @contextlib.contextmanager
+    def _on_primary(self):
+        """
+        Sends every read made inside of it to the primary, for reads which
+        writes are based on.
+        """
+        read_conn, self.read_conn = self.read_conn, None
+        try:
+            yield
+        finally:
+            self.read_conn = read_conn
+            # Containers created in the meantime were given no replica.
+            for value in self._data.values():
+                if isinstance(value, RedisContainer):
+                    value.read_conn = read_conn
+
+    def _reset_tracking(self):
+        """
+        Forgets which parts have changed and the loaded values of indexed
+        parts. Models which track neither share one read only empty mapping
+        rather than each holding empty dicts.
+        """
+        self._dirty = dict() if self.deferred else _NOTHING
+        self._deleted = dict() if self.deferred else _NOTHING
+        self._indexed_values = dict() if self.indexes else _NOTHING
+
+    def _pipeline(self):
+        """
+        Returns the pipeline writes should be queued on: the pipeline of the
+        current :py:class:`.Batch` if there is one, otherwise a new
+        transactional pipeline.
+        """
+        if self._batch is not None:
+            return self._batch.pipe
+        return self.conn.pipeline()
+
+    def _execute(self, pipe):
+        """
+        Executes a pipeline from :py:meth:`._pipeline`, unless it belongs to a
+        :py:class:`.Batch` in which case it is left for the batch to flush,
+        and the batch invalidates the cached copy of the model instead.
+        """
+        if self._batch is None:
+            try:
+                pipe.execute()
+            finally:
+                # Only once the write is done, so that a load made in the
+                # meantime can't put the old data back in the cache.
+                self._invalidate()
+
+    def _new_container(self, part, object_type="list", **kwargs):
+        """
+        Creates the :py:class:`.RedisContainer` for a part of this model
+        which is stored as a Redis list, set, sorted set or hash.
+        """
+        if object_type == "list":
+            if self.lazy_lists:
+                cls = LazyRedisList
+            else:
+                cls = RedisList
+                kwargs["deferred"] = self.deferred
+        else:
+            cls = _CONTAINER_CLASSES[object_type]
+            kwargs["lazy"] = self.lazy_lists
+            kwargs["deferred"] = self.deferred
+        return cls(self._redis_key(part), self.conn, index=(self.index_key, part),
+                   batch=self._batch, codec=self.schema.get(part), ttl=self._part_ttl(part),
+                   index_ttl=self.model_ttl, read_conn=self.read_conn, **kwargs)
+
+    def _part_ttl(self, part):
+        """
+        The TTL in seconds of a part, or `None` if it doesn't expire.
+        """
+        return self.field_ttls.get(part, self.model_ttl)
+
+    def _scalar_type(self, part):
+        """
+        The Redis type a scalar part is written as: `field` for hash
+        storage, unless the part has its own TTL, otherwise `string`.
+        """
+        if self.hash_storage and part not in self.field_ttls:
+            return "field"
+        return "string"
+
+    def _queue_expire_model(self, pipe):
+        """
+        Queues the refresh of the TTL of the part index and fields hash, if
+        the model has one.
+        """
+        if self.model_ttl:
+            pipe.expire(self.index_key, self.model_ttl)
+            pipe.expire(self.fields_key, self.model_ttl)
+
+    def _container_type(self, part, value):
+        """
+        Returns the Redis type a value is stored as if it's a container:
+        `list` for a `list`, `set` for a `set` or `frozenset`, `zset` for a
+        :py:class:`.Scored` mapping and `hash` for any other `dict`. Returns
+        `None` for scalars, and for anything the parts field packs into a
+        single value.
+        """
+        if getattr(self.schema.get(part), "packed", False):
+            return None
+        if isinstance(value, list):
+            return "list"
+        if isinstance(value, Scored):
+            return "zset"
+        if isinstance(value, dict):
+            return "hash"
+        if isinstance(value, (set, frozenset)):
+            return "set"
+        return None
+
+    def _encode(self, part, value):
+        """
+        Turns a scalar value into what is stored in redis for a part.
+        """
+        field = self.schema.get(part)
+        if field is None:
+            return value
+        return field.encode(value)
+
+    def _part_name(self, redis_key):
+        return redis_key[len(self._redis_key("")):]
+
+    @property
+    def index_key(self):
+        """
+        The Redis key of the hash which lists this models parts along with
+        their Redis types. See :py:func:`.build_part_index`.
+        """
+        return self._redis_key(INDEX_PART)
+
+    @property
+    def fields_key(self):
+        """
+        The Redis key of the hash which holds this models scalar parts when
+        they are stored with `hash_storage`.
+        """
+        return self._redis_key(FIELDS_PART)
+
+    def _scan_parts(self):
+        """
+        Incrementally discovers the parts of a model which has no part index,
+        using `SCAN` rather than the blocking `KEYS` command followed by one
+        pipelined round trip for all of the `TYPE` lookups.
+        """
+        conn = self._read()
+        keys = [key for key in map(_text, conn.scan_iter(match=self._redis_key("*"),
+                                                         count=self.scan_count or scan_count))
+                if not self._part_name(key).startswith("_")]
+        if not keys:
+            return {}
+
+        pipe = conn.pipeline(transaction=False)
+        for key in keys:
+            pipe.type(key)
+
+        return dict(zip([self._part_name(key) for key in keys], map(_text, pipe.execute())))
+
+    def parts(self):
+        """
+        Returns a `dict` of part name to Redis type for every part of this
+        model, as recorded in the part index. If there is no index for this
+        model, and the module level `scan_fallback` is set, then the keyspace
+        is scanned instead.
+        """
+        parts = _text_keys(self._read().hgetall(self.index_key), values=True)
+        if not parts and scan_fallback:
+            parts = self._scan_parts()
+
+        return parts
+
+    def load(self):
+        """
+        Fetches every part of the model from redis, replacing the internal
+        `_data` dict.
+
+        For an indexed model this takes at most two round trips no matter how
+        many parts there are: one which reads both the part index and the
+        scalar fields hash, and one pipelined round trip for the values of
+        any parts which are kept in their own keys.
+
+        :raises RedisORMException: If any part is of an unsupported type.
+        """
+        load_many([self])
+
+    @property
+    def cacheable(self):
+        """
+        Whether this model can be kept in the module level `cache`. Lazy
+        models can't, as they don't hold all of their data.
+        """
+        return cache is not None and not self.lazy and not self.lazy_lists
+
+    def _invalidate(self):
+        _wrote(self.index_key)
+        if cache is not None:
+            cache.invalidate(self.index_key)
+
+    def _snapshot(self, raw):
+        """
+        Returns the loaded data in the form kept in the cache: the raw
+        replies from redis for each loaded part, rather than the decoded
+        values, since models of other classes with other schemas can load
+        the same data.
+
+        :param raw: A `dict` of part to raw reply for the parts fetched.
+        """
+        return dict((part, (self._types.get(part), raw[part])) for part in self._data)
+
+    def _restore(self, snapshot):
+        """
+        Rebuilds the loaded data from a :py:meth:`._snapshot`, decoding it
+        afresh so that no two models share a value.
+        """
+        self._data = dict()
+        self._types = dict()
+        for part, (object_type, value) in snapshot.items():
+            self._data[part] = self._decode(part, object_type, value)
+            self._types[part] = object_type
+        self._remember_indexed()
+
+    def _queue_index(self, pipe):
+        """
+        First loading step: queues the read of the part index along with the
+        scalar fields hash, or just the prefetched fields when lazy. Returns
+        the number of commands queued.
+        """
+        pipe.hgetall(self.index_key)
+        if not self.lazy:
+            pipe.hgetall(self.fields_key)
+            return 2
+
+        if self.prefetch:
+            pipe.hmget(self.fields_key, self.prefetch)
+            return 2
+        return 1
+
+    def _queue_values(self, pipe, replies, scanned=None):
+        """
+        Second loading step: fills in the hash stored fields and queues the
+        fetches for every other part which should be loaded now. Returns the
+        `(part, type)` pairs which were queued, in order.
+
+        :param scanned: The parts of a model without a part index, if they
+            have already been scanned for, rather than scanning here.
+        """
+        self._data = dict()
+        self._types = dict()
+        self._reset_tracking()
+
+        parts = _text_keys(replies[0], values=True)
+        if not self.lazy:
+            fields = _text_keys(replies[1])
+        elif self.prefetch:
+            fields = dict((part, value) for part, value in zip(self.prefetch, replies[1])
+                          if value is not None)
+        else:
+            fields = {}
+
+        if not parts and scan_fallback:
+            parts = self._scan_parts() if scanned is None else dict(scanned)
+            for field in fields:
+                parts.setdefault(field, "field")
+
+        found = []
+        for part, object_type in parts.items():
+            if self.lazy:
+                # Remember the type so the part can be fetched on first use.
+                self._types[part] = object_type
+                if part not in self.prefetch:
+                    continue
+
+            if object_type == "field":
+                if part in fields:
+                    self._data[part] = self._decode(part, object_type, fields[part])
+                    self._types[part] = object_type
+
+            elif object_type in _CONTAINER_TYPES and self.lazy_lists:
+                self._data[part] = self._new_container(part, object_type)
+                self._types[part] = object_type
+
+            elif _queue_fetch(pipe, self._redis_key(part), object_type):
+                found.append((part, object_type))
+
+        return found
+
+    def _apply_values(self, found, values):
+        """
+        Final loading step: decodes the fetched values into `_data`.
+        """
+        for (part, object_type), value in zip(found, values):
+            if value is None or (object_type in _CONTAINER_TYPES and not value):
+                # Stale index entry, the part has gone away since.
+                self._types.pop(part, None)
+                continue
+            self._data[part] = self._decode(part, object_type, value)
+            self._types[part] = object_type
+
+        self._remember_indexed()
+
+    def _remember_indexed(self):
+        """
+        Records the loaded values of the parts with secondary indexes, so
+        the old index entries can be removed when they change.
+        """
+        for part in self.indexes:
+            if part in self._data:
+                self._indexed_values[part] = self._data[part]
+
+    def _range_score(self, part, value):
+        """
+        Returns the score a range indexed part is kept under in its index,
+        or `None` if it shouldn't be indexed at all, which is the case for
+        `None` and the empty string untyped parts store `None` as.
+
+        :raises RedisORMException: If the value isn't a number.
+        """
+        if value is None or value == "":
+            return None
+        try:
+            return float(self._encode(part, value))
+        except (TypeError, ValueError):
+            raise RedisORMException("Range indexed parts must be numbers.")
+
+    def _validate(self, part, value):
+        """
+        Checks that a scalar value can be stored in a part, before any of
+        the models state is changed for it.
+
+        :raises RedisORMException: If the parts field can't encode the
+            value, or a range indexed part is given a value which isn't a
+            number.
+        """
+        self._encode(part, value)
+        if self.indexes.get(part) == "range":
+            self._range_score(part, value)
+
+    def _queue_reindex(self, pipe, part, value):
+        """
+        Queues the updates to the secondary index of a part, if it has one,
+        for its value changing to `value`, or being removed if `None`.
+        Nothing is queued, or remembered, if the value can't be indexed.
+
+        :raises RedisORMException: If a range indexed part is given a value
+            which isn't a number.
+        """
+        kind = self.indexes.get(part)
+        if kind is None:
+            return
+
+        old_value = self._indexed_values.get(part)
+        if kind == "range":
+            index_key = _secondary_key(self.namespace, part)
+            score = self._range_score(part, value)
+            if score is None:
+                pipe.zrem(index_key, self.key)
+            else:
+                pipe.zadd(index_key, {self.key: score})
+        else:
+            new_key = None
+            if value is not None:
+                new_key = _secondary_key(self.namespace, part, self._encode(part, value))
+            if old_value is not None:
+                pipe.srem(_secondary_key(self.namespace, part, self._encode(part, old_value)),
+                          self.key)
+            if new_key is not None:
+                pipe.sadd(new_key, self.key)
+
+        if value is None:
+            self._indexed_values.pop(part, None)
+        else:
+            self._indexed_values[part] = value
+
+    def _decode(self, part, object_type, value):
+        """
+        Turns the raw reply for a part into the value stored in `_data`.
+        """
+        if object_type in _CONTAINER_TYPES:
+            return self._new_container(part, object_type, loaded=value)
+
+        field = self.schema.get(part)
+        if field is None:
+            return value
+        return field.decode(value)
+
+    def _queue_stored_values(self, pipe, parts):
+        """
+        Queues the reads of the raw stored values of the parts with equality
+        indexes, which are needed to find their index entries. Returns the
+        names of the parts queued, in order.
+        """
+        wanted = []
+        for part, kind in self.indexes.items():
+            if kind == "range" or part not in parts:
+                continue
+            if parts[part] == "field":
+                pipe.hget(self.fields_key, part)
+            else:
+                pipe.get(self._redis_key(part))
+            wanted.append(part)
+        return wanted
+
+    def _stored_indexed_values(self, parts):
+        """
+        Reads the raw stored values of the parts with equality indexes, see
+        :py:meth:`._queue_stored_values`.
+        """
+        pipe = self._read().pipeline(transaction=False)
+        wanted = self._queue_stored_values(pipe, parts)
+        if not wanted:
+            return {}
+        return _stored_values(wanted, pipe.execute())
+
+    def _queue_remove(self, pipe, parts, stored):
+        """
+        Queues a single `UNLINK` for every key of the model, along with the
+        removal of its secondary index entries.
+        """
+        keys = [self._redis_key(part) for part, object_type in parts.items()
+                if object_type != "field"]
+        keys.extend([self.index_key, self.fields_key])
+        _queue_unlink(pipe, keys)
+
+        for part, kind in self.indexes.items():
+            if part not in parts:
+                continue
+            if kind == "range":
+                pipe.zrem(_secondary_key(self.namespace, part), self.key)
+            elif part in stored:
+                pipe.srem(_secondary_key(self.namespace, part, stored[part]), self.key)
+
+    @_tracked("delete")
+    def delete(self, retries=None):
+        """
+        Removes every key of the model with a single `UNLINK`, so the server
+        frees big lists in the background, in the same `MULTI`/`EXEC` as its
+        secondary index entries, then empties the objects internal `_data`
+        dict.
+
+        The part index is watched while the parts are looked up, so a part
+        added by another client in the meantime is never left behind; the
+        delete is retried instead. Inside of a :py:class:`.Batch` the delete
+        is queued along with the rest of the batch. Redis Cluster clients
+        can't watch keys, so on those the keys are unlinked one by one
+        without a transaction.
+
+        :param retries: How many times to retry on a conflict. Defaults to the
+            module level `transaction_retries`.
+        :raises RedisORMConflict: If every attempt conflicted.
+        """
+        if self._batch is not None or _is_cluster(self.conn):
+            # Cluster pipelines can't WATCH, so a part added by another
+            # client while a cluster model is being deleted is left behind.
+            with self._on_primary():
+                parts = self.parts()
+                stored = self._stored_indexed_values(parts)
+            pipe = self._pipeline()
+            self._queue_remove(pipe, parts, stored)
+            self._execute(pipe)
+
+        else:
+            if retries is None:
+                retries = transaction_retries
+
+            for attempt in range(retries + 1):
+                pipe = self.conn.pipeline()
+                try:
+                    pipe.watch(self.index_key)
+                    with self._on_primary():
+                        parts = self.parts()
+                        stored = self._stored_indexed_values(parts)
+
+                    pipe.multi()
+                    self._queue_remove(pipe, parts, stored)
+                    pipe.execute()
+                    break
+
+                except WatchError:
+                    continue
+
+                finally:
+                    pipe.reset()
+
+            else:
+                raise RedisORMConflict("Gave up after %s conflicting writes." % (retries + 1))
+
+        self._invalidate()
+        self._reset_tracking()
+        self._data = dict()
+        self._types = dict()
+
+        del self
+
+    @_tracked("get")
+    def get(self, part):
+        """
+        Retrieves a part of the model from redis and stores it.
+
+        :param part: The part of the model to retrieve.
+        :raises RedisORMException: If the part doesn't exist, or its redis
+            type isn't a string, list, set, sorted set or hash.
+        """
+        redis_key = self._redis_key(part)
+
+        pipe = self._read().pipeline(transaction=False)
+        pipe.type(redis_key)
+        pipe.hget(self.fields_key, part)
+        object_type, field = pipe.execute()
+        object_type = _text(object_type)
+
+        if object_type == "none" and field is not None:
+            self._data[part] = self._decode(part, "field", field)
+            self._types[part] = "field"
+            self._remember_indexed()
+            return
+
+        if not _queue_fetch(pipe, redis_key, object_type):
+            raise RedisORMException("Part %s doesn't exist." % part)
+
+        self._data[part] = self._decode(part, object_type, pipe.execute()[0])
+        self._types[part] = object_type
+        self._remember_indexed()
+
+    def get_default(self, part, default=None):
+        """
+        Works just like a `dict`'s `get()` method, returning the default if no
+        matching key was found.
+
+        :param part: The key which to look for
+        :param default: The default to return if no match was found
+        """
+        try:
+            return self[part]
+        except KeyError:
+            return default
+
+    @_tracked("get")
+    def fetch(self, parts):
+        """
+        Fetches the given parts from redis in a single pipelined round trip,
+        replacing whatever is currently in `_data` for them. Parts which are
+        not in the part index are ignored.
+
+        :param parts: The names of the parts to fetch.
+        """
+        pipe = self._read().pipeline(transaction=False)
+        found = []
+        for part in parts:
+            object_type = self._types.get(part)
+            if object_type == "field":
+                pipe.hget(self.fields_key, part)
+            elif object_type in _CONTAINER_TYPES and self.lazy_lists:
+                self._data[part] = self._new_container(part, object_type)
+                continue
+            elif object_type is None or not _queue_fetch(pipe, self._redis_key(part), object_type):
+                continue
+            found.append((part, object_type))
+
+        if found:
+            for part, object_type in found:
+                self._data.pop(part, None)
+            self._apply_values(found, pipe.execute())
+
+    def __repr__(self):
+        return str(self._data)
+
+    def __getitem__(self, part):
+        if part not in self._data and part in self._types:
+            # Parts whose key has gone, such as by expiring, are dropped by
+            # the fetch and raise a KeyError like any other missing part.
+            self.fetch([part])
+        return self._data[part]
+
+    @_tracked("set")
+    def __setitem__(self, part, value):
+        if part.startswith("_"):
+            raise RedisORMException("Parts starting with an underscore are reserved.")
+
+        if value is None and part not in self.schema:
+            value = ""
+
+        old_type = self._types.get(part)
+        if type(value) in _SCALAR_TYPES:
+            object_type = None
+        else:
+            object_type = self._container_type(part, value)
+        if object_type is None and (part in self.schema or part in self.indexes):
+            self._validate(part, value)
+
+        if self.deferred:
+            if part in self._data and self._data[part] == value:
+                return
+            if part not in self._dirty:
+                self._dirty[part] = self._deleted.pop(part, old_type)
+
+            if object_type is not None:
+                items, value = value, self._new_container(part, object_type, loaded=())
+                value._local(items)
+                self._types[part] = object_type
+            else:
+                self._types[part] = self._scalar_type(part)
+            self._data[part] = value
+            return
+
+        if object_type is not None:
+            container = self._new_container(part, object_type, loaded=())
+            container._local(value)
+            pipe = self._pipeline()
+            self._queue_reindex(pipe, part, None)
+            if old_type == "field":
+                pipe.hdel(self.fields_key, part)
+            container._queue_replace(pipe)
+            container._queue_expire(pipe)
+            self._execute(pipe)
+            if self.lazy_lists:
+                # Lazy containers read from redis, so there's no need to
+                # hold on to the items.
+                container._local(())
+            self._data[part] = container
+            self._types[part] = object_type
+
+        else:
+            pipe = self._pipeline()
+            self._queue_set(pipe, part, value, old_type)
+            self._data[part] = value
+            self._execute(pipe)
+
+    def _queue_set(self, pipe, part, value, old_type):
+        """
+        Queues the writes for a scalar part, removing any copy of it which is
+        stored in the other layout.
+        """
+        key = self._redis_key(part)
+        encoded = self._encode(part, value)
+        self._queue_reindex(pipe, part, value)
+        value = encoded
+        if self._scalar_type(part) == "field":
+            if old_type == "string" or old_type in _CONTAINER_TYPES:
+                pipe.delete(key)
+            pipe.hset(self.fields_key, part, value)
+            pipe.hset(self.index_key, part, "field")
+            self._types[part] = "field"
+        else:
+            if old_type == "field":
+                pipe.hdel(self.fields_key, part)
+            pipe.set(key, value, ex=self._part_ttl(part))
+            pipe.hset(self.index_key, part, "string")
+            self._types[part] = "string"
+        self._queue_expire_model(pipe)
+
+    def _queue_delete(self, pipe, part):
+        self._queue_reindex(pipe, part, None)
+        pipe.delete(self._redis_key(part))
+        pipe.hdel(self.fields_key, part)
+        pipe.hdel(self.index_key, part)
+
+    @_tracked("del")
+    def __delitem__(self, part):
+        if part not in self:
+            raise KeyError(part)
+        # Lazy parts are only in the part index until they're fetched.
+        self._data.pop(part, None)
+        old_type = self._types.pop(part, None)
+
+        if self.deferred:
+            self._deleted[part] = self._dirty.pop(part, old_type)
+            return
+
+        pipe = self._pipeline()
+        self._queue_delete(pipe, part)
+        self._execute(pipe)
+
+    def dirty_parts(self):
+        """
+        Returns the names of the parts which have been changed or deleted
+        since the model was loaded or last saved, including containers which
+        were changed in place. Only deferred models track this.
+        """
+        dirty = set(self._dirty) | set(self._deleted)
+        for part, value in self._data.items():
+            if isinstance(value, RedisContainer) and value.dirty:
+                dirty.add(part)
+        return dirty
+
+    @_tracked("save")
+    def save(self):
+        """
+        Writes every part of a deferred model which has been changed or
+        deleted since it was loaded or last saved, in a single transaction.
+        Parts which haven't changed aren't written at all. Does nothing for
+        models which aren't deferred, since their writes have already been
+        made.
+        """
+        dirty = self.dirty_parts()
+        if not dirty:
+            return
+
+        pipe = self._pipeline()
+        self._queue_save(pipe, dirty)
+        self._execute(pipe)
+        self._saved()
+
+    def _queue_save(self, pipe, dirty):
+        """
+        Queues the writes of :py:meth:`.save` for the given dirty parts.
+        """
+        for part in dirty:
+            if part in self._deleted:
+                self._queue_delete(pipe, part)
+                continue
+
+            value = self._data[part]
+            old_type = self._dirty.get(part, self._types.get(part))
+            if isinstance(value, RedisContainer):
+                self._queue_reindex(pipe, part, None)
+                if old_type == "field":
+                    pipe.hdel(self.fields_key, part)
+                value._queue_replace(pipe)
+                value._queue_expire(pipe)
+                self._types[part] = value.object_type
+            else:
+                self._queue_set(pipe, part, value, old_type)
+
+    def _saved(self):
+        """
+        Marks every part as clean once the writes of :py:meth:`.save` have
+        been made.
+        """
+        self._dirty = dict()
+        self._deleted = dict()
+        for value in self._data.values():
+            if isinstance(value, RedisContainer):
+                value.dirty = False
+
+    @_tracked("transaction")
+    def transaction(self, func, retries=None):
+        """
+        Runs `func` as an optimistic transaction using `WATCH`: the model is
+        reloaded, `func` is called with this object to make its changes, and
+        all of its writes, to scalar parts and lists alike, are sent as one
+        `MULTI`/`EXEC`. If another client changed the model in the meantime
+        nothing is written and the whole thing is retried, so `func` should
+        base its changes on the freshly loaded data::
+
+            def add_point(keys):
+                keys["points"] = int(keys["points"]) + 1
+                keys["history"].append("point")
+
+            keys.transaction(add_point)
+
+        :param func: Called with this object, its return value is returned.
+        :param retries: How many times to retry on a conflict. Defaults to the
+            module level `transaction_retries`.
+        :raises RedisORMConflict: If every attempt conflicted.
+        :raises RedisORMException: If this model is part of a batch, or uses a
+            Redis Cluster client, whose pipelines can't `WATCH`.
+        """
+        if self._batch is not None:
+            raise RedisORMException("Transactions can't be run inside of a batch.")
+        if _is_cluster(self.conn):
+            raise RedisORMException("Transactions aren't supported on Redis Cluster clients.")
+
+        if retries is None:
+            retries = transaction_retries
+
+        for attempt in range(retries + 1):
+            pipe = self.conn.pipeline()
+            try:
+                # Every write through the ORM touches the part index, watching
+                # the parts themselves catches writes from anything else.
+                pipe.watch(self.index_key, self.fields_key)
+                # Including the reads made by func, which WATCH can't check
+                # if they come from a replica which is behind.
+                with self._on_primary():
+                    keys = [self._redis_key(part) for part, object_type in self.parts().items()
+                            if object_type != "field"]
+                    if keys:
+                        pipe.watch(*keys)
+
+                    self._invalidate()
+                    self.load()
+
+                    pipe.multi()
+                    with Batch(self.conn, pipe=pipe) as work:
+                        work.add(self)
+                        result = func(self)
+                        self.save()
+                return result
+
+            except WatchError:
+                continue
+
+            finally:
+                pipe.reset()
+
+        raise RedisORMConflict("Gave up after %s conflicting writes." % (retries + 1))
+
+    @_tracked("migrate")
+    def migrate_to_hash(self):
+        """
+        Moves every scalar part which is stored in its own key into the
+        models fields hash, in a single transaction. Lists are left alone.
+        After this the model is read and written using `hash_storage`.
+
+        :returns: The number of parts which were moved.
+        """
+        strings = dict((part, self._encode(part, self._data[part]))
+                       for part, object_type in self._types.items()
+                       if object_type == "string" and part not in self.field_ttls)
+        self.hash_storage = True
+        if not strings:
+            return 0
+
+        pipe = self.conn.pipeline()
+        pipe.hset(self.fields_key, mapping=strings)
+        pipe.hset(self.index_key, mapping=dict((part, "field") for part in strings))
+        _queue_unlink(pipe, [self._redis_key(part) for part in strings])
+        self._queue_expire_model(pipe)
+        pipe.execute()
+        self._invalidate()
+
+        for part in strings:
+            self._types[part] = "field"
+
+        return len(strings)
+
+    @_tracked("touch")
+    def touch(self, ttl=None):
+        """
+        Pushes back the expiry of every key of the model in a single round
+        trip. Each part gets its TTL from `field_ttls`, or the models TTL,
+        and the part index and fields hash get the models TTL. Models which
+        haven't been loaded look their parts up first.
+
+        :param ttl: A TTL in seconds to give every key instead.
+        :raises RedisORMException: If no TTL was given and the model doesn't
+            have one.
+        """
+        if ttl is None and not self.model_ttl and not self.field_ttls:
+            raise RedisORMException("No TTL given, and the model doesn't have one.")
+
+        types = self._types or self.parts()
+        pipe = self._pipeline()
+        for part, object_type in types.items():
+            part_ttl = ttl or self._part_ttl(part)
+            if object_type != "field" and part_ttl:
+                pipe.expire(self._redis_key(part), part_ttl)
+
+        model_ttl = ttl or self.model_ttl
+        if model_ttl:
+            pipe.expire(self.index_key, model_ttl)
+            pipe.expire(self.fields_key, model_ttl)
+        self._execute(pipe)
+
+    @_tracked("ttl")
+    def ttl(self):
+        """
+        Returns the remaining TTL in seconds of every part of the model,
+        read in a single round trip, as a `dict` of part name to seconds.
+        Parts which don't expire map to `None`, and parts which have already
+        expired are left out. Parts stored in the fields hash share its TTL.
+        """
+        parts = list((self._types or self.parts()).items())
+        pipe = self._read().pipeline(transaction=False)
+        for part, object_type in parts:
+            pipe.ttl(self.fields_key if object_type == "field" else self._redis_key(part))
+
+        ttls = {}
+        for (part, object_type), seconds in zip(parts, pipe.execute()):
+            if seconds == -2:
+                continue
+            ttls[part] = None if seconds == -1 else seconds
+        return ttls
+
+    def __contains__(self, part):
+        return part in self._data or part in self._types
+
+
+class Batch(object):
+    """
+    A unit of work which buffers every write made through a group of
+    :py:class:`.RedisKeys` (and their :py:class:`.RedisContainer` parts), then
+    flushes them all as a single `MULTI`/`EXEC` pipeline when the `with`
+    block exits. If the block raises, or the flush fails, nothing is written
+    and the in memory data of every model is rolled back to how it was when
+    the batch started.
+
+    Reads are not buffered, they always go straight to redis. Use
+    :py:func:`.batch` or :py:meth:`.RedisModel.batch` rather than creating
+    this directly.
+    """
+    def __init__(self, conn, pipe=None):
+        self.conn = conn
+        self.pipe = pipe or conn.pipeline()
+        self._depth = 0
+        self._snapshots = []
+
+    def add(self, keys):
+        """
+        Adds a :py:class:`.RedisKeys` to this batch, so that its writes are
+        buffered.
+
+        :raises RedisORMException: If the keys already belong to another
+            batch, or use a different connection.
+        """
+        if keys._batch is self:
+            return
+        if keys._batch is not None:
+            raise RedisORMException("Model is already part of another batch.")
+        if keys.conn is not self.conn:
+            raise RedisORMException("All models in a batch must share a connection.")
+
+        containers = [(value, value._copy()) for value in keys._data.values()
+                      if isinstance(value, RedisContainer)]
+        tracking = tuple(_copy_tracking(mapping) for mapping in
+                         (keys._indexed_values, keys._dirty, keys._deleted))
+        self._snapshots.append((keys, dict(keys._data), dict(keys._types), containers,
+                                tracking))
+
+        keys._batch = self
+        for value, _ in containers:
+            value._batch = self
+
+    def __enter__(self):
+        self._depth += 1
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._depth -= 1
+        if self._depth:
+            return False
+
+        try:
+            if exc_type is None:
+                namespace = self._snapshots[0][0].namespace if self._snapshots else ""
+                with _track("batch", namespace):
+                    self.pipe.execute()
+            else:
+                self.pipe.reset()
+        except Exception:
+            self.rollback()
+            raise
+        else:
+            if exc_type is not None:
+                self.rollback()
+        finally:
+            self._detach()
+
+        return False
+
+    def rollback(self):
+        """
+        Restores the in memory data of every model in the batch, along with
+        the loaded values of its indexed parts and which of its parts are
+        dirty.
+        """
+        for keys, data, types, containers, tracking in self._snapshots:
+            keys._data = data
+            keys._types = types
+            keys._indexed_values, keys._dirty, keys._deleted = tracking
+            for value, items in containers:
+                value._local(items)
+
+    def _detach(self):
+        for keys, data, types, containers, tracking in self._snapshots:
+            keys._invalidate()
+            keys._batch = None
+            for value in list(keys._data.values()) + list(data.values()):
+                if isinstance(value, RedisContainer):
+                    value._batch = None
+
+
+def _stored_values(parts, replies):
+    """
+    Pairs up the parts queued by :py:meth:`.RedisKeys._queue_stored_values`
+    with their replies, leaving out the ones which weren't stored.
+    """
+    return dict((part, _text(value)) for part, value in zip(parts, replies)
+                if value is not None)
+
+
+def _copy_tracking(mapping):
+    """
+    Copies one of the tracking dicts of a :py:class:`.RedisKeys`, leaving
+    the shared empty mapping of models which don't track anything as it is.
+    """
+    if mapping is _NOTHING:
+        return mapping
+    return dict(mapping)
+
+
+def batch(*models):
+    """
+    Returns a :py:class:`.Batch` covering all of the given models (either
+    :py:class:`.RedisModel` or :py:class:`.RedisKeys` instances), for use
+    as a context manager::
+
+        with batch(order, customer):
+            order.status = "paid"
+            customer.orders.append(order.key)
+
+    If the first model is already part of a batch, that batch is extended
+    and returned instead, so batches can be nested.
+
+    :raises RedisORMException: If no models were given.
+    """
+    keysets = [model._data if isinstance(model, RedisModel) else model for model in models]
+    if not keysets:
+        raise RedisORMException("No models supplied.")
+
+    current = keysets[0]._batch or Batch(keysets[0].conn)
+    for keys in keysets:
+        current.add(keys)
+
+    return current
+
+
+def load_many(keysets):
+    """
+    Loads several :py:class:`.RedisKeys` at once, sharing round trips between
+    them. Models with a part index take two pipelined round trips in total
+    per connection, or per node of a Redis Cluster, no matter how many
+    models or parts there are.
+
+    :param keysets: The :py:class:`.RedisKeys` to load, which can use
+        different connections.
+    :raises RedisORMException: If any part is of an unsupported type.
+    """
+    if cache is not None:
+        pending = []
+        for keys in keysets:
+            snapshot = cache.get(keys.index_key) if keys.cacheable else None
+            if snapshot is None:
+                pending.append(keys)
+            else:
+                keys._restore(snapshot)
+        keysets = pending
+
+    groups = {}
+    for keys in keysets:
+        conn = keys._read()
+        node = (id(conn), _node_of(conn, keys.index_key))
+        groups.setdefault(node, []).append(keys)
+
+    for group in groups.values():
+        _load_group(group)
+
+
+def _load_group(keysets):
+    """
+    Loads :py:class:`.RedisKeys` which all live on the same connection, or
+    cluster node, in two pipelined round trips.
+    """
+    with _track("load", keysets[0].namespace):
+        pipe = keysets[0]._read().pipeline(transaction=False)
+        counts = [keys._queue_index(pipe) for keys in keysets]
+        replies = pipe.execute()
+
+        found = []
+        start = 0
+        for keys, count in zip(keysets, counts):
+            found.append(keys._queue_values(pipe, replies[start:start + count]))
+            start += count
+
+        values = pipe.execute() if any(found) else []
+
+        start = 0
+        reply = 0
+        for keys, queued, count in zip(keysets, found, counts):
+            fetched = values[start:start + len(queued)]
+            keys._apply_values(queued, fetched)
+            if keys.cacheable:
+                # Cacheable models aren't lazy, so they read the whole fields hash.
+                raw = _text_keys(replies[reply + 1])
+                raw.update((part, value) for (part, object_type), value in zip(queued, fetched))
+                cache.set(keys.index_key, keys.namespace, keys._snapshot(raw))
+            start += len(queued)
+            reply += count
+
+
+def build_part_index(namespace="", conn=None, count=None):
+    """
+    One shot migration which builds the part index for every model in the
+    given namespace which was written before models kept one. This walks the
+    namespace with `SCAN` so it is safe to run against a live server, and is
+    safe to run more than once.
+
+    Models which haven't been indexed can't be loaded, unless the module
+    level `scan_fallback` is turned on, which scans the keyspace for every
+    new or empty model.
+
+    :param namespace: The key prefix of the models to index.
+    :param conn: The redis connection to use, defaults to the module level
+        connection.
+    :param count: The `COUNT` hint to use while scanning.
+    :returns: The number of parts which were indexed.
+    """
+    conn = _connection(namespace, conn)
+
+    prefix = namespace + ":"
+    indexed = 0
+    keys = []
+
+    def flush(keys):
+        pipe = conn.pipeline(transaction=False)
+        for key in keys:
+            pipe.type(key)
+        types = map(_text, pipe.execute())
+
+        for key, object_type in zip(keys, types):
+            if object_type == "string" or object_type in _CONTAINER_TYPES:
+                model_key, part = _split_model_key(namespace, key)
+                pipe.hset(_model_key(namespace, model_key, INDEX_PART), part, object_type)
+        return len(pipe.execute())
+
+    for key in map(_text, conn.scan_iter(match=prefix + "*", count=count or scan_count)):
+        rest = key[len(prefix):]
+        if ":" not in rest or rest.startswith("_") or rest.rsplit(":", 1)[1].startswith("_"):
+            continue
+
+        keys.append(key)
+        if len(keys) >= 1000:
+            indexed += flush(keys)
+            keys = []
+
+    if keys:
+        indexed += flush(keys)
+
+    return indexed
+
+
+def purge_namespace(namespace, conn=None, count=None, batch_size=1000, max_rate=None):
+    """
+    Removes every key in a namespace: the models, their part indexes and the
+    secondary indexes. Keys are found with `SCAN` and removed a batch at a
+    time with `UNLINK`, so only one batch of key names is held in memory and
+    the server is never blocked, even for millions of models::
+
+        purge_namespace("sessions", max_rate=20000)
+
+    .. warning::
+        Every key starting with `namespace:` is removed, including the keys
+        of any nested namespaces such as `namespace:archived`.
+
+    :param namespace: The key prefix of the models to remove.
+    :param conn: The redis connection to use, defaults to the module level
+        connection.
+    :param count: The `COUNT` hint to use while scanning, defaults to
+        `batch_size`.
+    :param batch_size: How many keys are removed per `UNLINK`.
+    :param max_rate: The most keys to remove per second, to leave room for
+        other traffic. Unlimited if `None`.
+    :returns: The number of keys which were removed.
+    :raises RedisORMException: If no connection or namespace was supplied.
+    """
+    conn = _connection(namespace, conn)
+    if not namespace:
+        raise RedisORMException("A namespace must be given to purge.")
+
+    prefix = namespace + ":"
+    suffix = ":" + INDEX_PART
+    removed = 0
+    queued = 0
+    started = time.time()
+    keys = []
+
+    def flush(keys):
+        if cache is not None:
+            for key in keys:
+                if key.endswith(suffix):
+                    cache.invalidate(key)
+        pipe = conn.pipeline(transaction=False)
+        queued = _queue_unlink(pipe, keys)
+        return sum(pipe.execute()[:queued])
+
+    with _track("purge", namespace):
+        for key in map(_text, conn.scan_iter(match=prefix + "*", count=count or batch_size)):
+            keys.append(key)
+            if len(keys) < batch_size:
+                continue
+
+            removed += flush(keys)
+            queued += len(keys)
+            keys = []
+
+            if max_rate:
+                # Sleep off whatever is left of the time this batch is allowed.
+                wait = queued / float(max_rate) - (time.time() - started)
+                if wait > 0:
+                    time.sleep(wait)
+
+        if keys:
+            removed += flush(keys)
+
+    return removed
+
+
+def _queue_unlink(pipe, keys):
+    """
+    Queues the removal of keys, with `UNLINK` unless the module level
+    `unlink` is off, in one command, or one per key on a Redis Cluster
+    pipeline. Returns the number of commands queued.
+    """
+    remove = pipe.unlink if unlink else pipe.delete
+    if _is_cluster(pipe):
+        for key in keys:
+            remove(key)
+        return len(keys)
+    remove(*keys)
+    return 1
+
+
+def migrate_to_hash(namespace="", conn=None, count=None):
+    """
+    One shot migration which moves the scalar parts of every indexed model in
+    the given namespace into hash storage. See
+    :py:meth:`.RedisKeys.migrate_to_hash`. Run :py:func:`.build_part_index`
+    first if the namespace has data which was written before models kept a
+    part index.
+
+    :param namespace: The key prefix of the models to migrate.
+    :param conn: The redis connection to use, defaults to the module level
+        connection.
+    :param count: The `COUNT` hint to use while scanning.
+    :returns: The number of parts which were moved.
+    """
+    conn = _connection(namespace, conn)
+
+    moved = 0
+
+    for index_key in map(_text, conn.scan_iter(match=namespace + ":*:" + INDEX_PART,
+                                               count=count or scan_count)):
+        if _is_nested(namespace, index_key):
+            continue
+        key, part = _split_model_key(namespace, index_key)
+        moved += RedisKeys(key, namespace=namespace, conn=conn).migrate_to_hash()
+
+    return moved
+
+
+class RedisContainer(object):
+    """
+    The base of the classes which back a model part with a Redis data
+    structure: :py:class:`.RedisList`, :py:class:`.RedisSet`,
+    :py:class:`.RedisSortedSet` and :py:class:`.RedisHash`. It handles
+    where writes go (straight to redis, a :py:class:`.Batch`, or nowhere
+    for deferred models), along with the part index and item encoding.
+    """
+    __slots__ = ("conn", "key", "_index", "_batch", "deferred", "dirty", "codec", "ttl",
+                 "index_ttl", "read_conn")
+
+    object_type = None #: The Redis type, as recorded in the part index.
+
+    def _read(self):
+        """
+        The connection reads go to: the replica, unless there isn't one or
+        the owning model was written within the `read_your_writes` window.
+        """
+        if self.read_conn is None or (self._index and _recently_written(self._index[0])):
+            return self.conn
+        return self.read_conn
+
+    def _pipeline(self, indexed=False):
+        """
+        Returns the pipeline writes should be queued on: the pipeline of the
+        current :py:class:`.Batch` if there is one, otherwise a new
+        transactional pipeline.
+
+        :param indexed: If `True` the pipeline also records this part in the
+            owning models part index, so that creating the part and indexing
+            it happen atomically.
+        """
+        if self.deferred:
+            return _NullPipeline()
+        if self._batch is not None:
+            pipe = self._batch.pipe
+        else:
+            pipe = self.conn.pipeline()
+        if indexed and self._index:
+            pipe.hset(self._index[0], self._index[1], self.object_type)
+        return pipe
+
+    def _execute(self, pipe):
+        """
+        Executes a pipeline from :py:meth:`._pipeline` and returns its replies,
+        unless it belongs to a :py:class:`.Batch` (or the part is deferred) in
+        which case `None` is returned.
+        """
+        if self.deferred:
+            self.dirty = True
+            return None
+        expires = self._queue_expire(pipe)
+        if self._batch is None:
+            try:
+                replies = pipe.execute()
+            finally:
+                self._invalidate()
+            return replies[:len(replies) - expires]
+        return None
+
+    def _invalidate(self):
+        """
+        Drops the cached copy of the owning model once a write has been made.
+        """
+        if self._index:
+            _wrote(self._index[0])
+            if cache is not None:
+                cache.invalidate(self._index[0])
+
+    def _queue_expire(self, pipe):
+        """
+        Queues the refresh of the TTLs of this part and of the owning models
+        part index and fields hash, if they have one, after a write. Returns
+        the number of commands queued.
+        """
+        queued = 0
+        if self.ttl:
+            pipe.expire(self.key, self.ttl)
+            queued += 1
+        if self.index_ttl and self._index:
+            index_key = self._index[0]
+            pipe.expire(index_key, self.index_ttl)
+            pipe.expire(index_key[:-len(INDEX_PART)] + FIELDS_PART, self.index_ttl)
+            queued += 2
+        return queued
+
+    def _encode_item(self, item):
+        if self.codec is None:
+            return item
+        return self.codec.encode(item)
+
+    def _decode_items(self, items):
+        """
+        Decodes a list of items read from redis, all in one go.
+        """
+        if self.codec is None:
+            return _list_to_int(items)
+        return self.codec.decode_list(items)
+
+    def _copy(self):
+        """
+        Returns a copy of the local contents, for snapshots.
+        """
+        raise NotImplementedError
+
+    def _local(self, items):
+        """
+        Replaces the local contents without writing anything.
+        """
+        raise NotImplementedError
+
+    def _queue_replace(self, pipe):
+        """
+        Queues the writes which replace the part in redis with the local
+        copy, and records it in the owning models part index.
+        """
+        raise NotImplementedError
+
+
+class RedisList(RedisContainer):
+    """
+    Attempts to emulate a python `list`, while backing the list in redis. This
+    supports most of the common `list` functions, except as noted.
+
+    Generally speaking, you won't have to create an instance of this class,
+    however if you are working with a `list` then this is the class you'll get
+    back, not a `list` class.
+
+    .. note::
+        Most notably, this is currently missing the sort and reverse functions.
+
+    """
+    __slots__ = ("_list", "chunk_size")
+
+    object_type = "list"
+
+    def __init__(self, key, conn, start=[], reset=False, loaded=None, index=None,
+                 batch=None, chunk_size=None, deferred=False, codec=None, ttl=None,
+                 index_ttl=None, read_conn=None):
+        """
+        :param key: The full Redis key of the list.
+        :param conn: The Redis connection to use.
+        :param start: Items to push onto the list once it has been synced.
+        :param reset: If `True` the list is replaced with `start` in a single
+            transaction, without syncing its old contents first.
+        :param loaded: The already fetched contents of the list, as returned by
+            `LRANGE`. If given, the initial sync with redis is skipped.
+        :param index: A `(index_key, part)` tuple for the owning models part
+            index, which is updated whenever this list is pushed to.
+        :param batch: The :py:class:`.Batch` which writes should be buffered
+            in, if any.
+        :param chunk_size: The most items sent in a single `RPUSH`. Defaults
+            to the module level `list_chunk_size`.
+        :param deferred: If `True` changes are only made to the local list
+            and `dirty` is set; the owning model writes the whole list when
+            it is saved.
+        :param codec: The :py:class:`redisORM.fields.Field` used to encode and
+            decode each item. Without one, items which look like ints are
+            read back as ints.
+        :param ttl: The TTL in seconds the list is given, in the same
+            transaction, every time it's written to. `None` for no expiry.
+        :param index_ttl: The TTL in seconds of the owning models part index,
+            refreshed along with the list.
+        :param read_conn: A connection to a read replica to read the list
+            from, while writes go to `conn`.
+        """
+        self._list = []
+        self.conn = conn
+        self.key = key
+        self._index = index
+        self._batch = batch
+        self.chunk_size = chunk_size
+        self.deferred = deferred
+        self.dirty = False
+        self.codec = codec
+        self.ttl = ttl
+        self.index_ttl = index_ttl
+        self.read_conn = read_conn
+
+        if reset:
+            self.replace(start)
+            return
+
+        if loaded is not None:
+            self._list = list(loaded)
+            self.listToInt()
+        else:
+            self.sync()
+
+        if start:
+            self.extend(start)
+
+    def __repr__(self):
+        return repr(self._list)
+
+    def __str__(self):
+        return str(self._list)
+
+    def _script(self, name, args, indexed=False, state=True):
+        """
+        Runs one of the list scripts against this list, atomically along with
+        the part index update if `indexed`. Returns the scripts reply, or
+        `None` if it was queued in a batch.
+
+        :raises IndexError: If the index was out of range on the server, after
+            syncing the local copy.
+        """
+        _ensure_scripts(self.conn)
+        args = list(args) + [_LIST_MARKER, 1 if state else 0]
+
+        for attempt in range(2):
+            pipe = self._pipeline(indexed=indexed)
+            if attempt == 0:
+                pipe.evalsha(_LIST_SCRIPT_SHAS[name], 1, self.key, *args)
+            else:
+                # Sending the whole script can't fail with NoScriptError.
+                pipe.eval(_LIST_SCRIPTS[name], 1, self.key, *args)
+            try:
+                replies = self._execute(pipe)
+            except NoScriptError:
+                # The server lost its script cache, probably due to a restart.
+                load_scripts(self.conn)
+                continue
+            except ResponseError as e:
+                if "index out of range" not in str(e):
+                    raise
+                self.sync()
+                raise IndexError("list index out of range")
+            return replies[-1] if replies else None
+
+    def _resync(self, state):
+        """
+        Replaces the local copy with the state returned by a list script.
+        """
+        if state is not None:
+            self._list = self._decode_items(state)
+
+
+    def _copy(self):
+        return list(self._list)
+
+    def _local(self, items):
+        self._list = list(items)
+
+    def _queue_replace(self, pipe):
+        pipe.delete(self.key)
+        self._push(pipe, self._list)
+        if self._list and self._index:
+            pipe.hset(self._index[0], self._index[1], "list")
+
+    @_tracked("list.sync")
+    def sync(self):
+        self._list = self._read().lrange(self.key, 0, -1)
+        self.listToInt()
+
+    def listToInt(self):
+        self._list = self._decode_items(self._list)
+
+    @_tracked("list.append")
+    def append(self, other):
+        self._list.append(other)
+        pipe = self._pipeline(indexed=True)
+        pipe.rpush(self.key, self._encode_item(other))
+        self._execute(pipe)
+        return self._list
+
+    @_tracked("list.prepend")
+    def prepend(self, other):
+        self._list.insert(0, other)
+        pipe = self._pipeline(indexed=True)
+        pipe.lpush(self.key, self._encode_item(other))
+        self._execute(pipe)
+
+    def _push(self, pipe, items):
+        """
+        Queues variadic `RPUSH` commands for all of the items, at most
+        `chunk_size` items at a time.
+        """
+        if self.codec is not None:
+            items = [self.codec.encode(item) for item in items]
+        chunk = self.chunk_size or list_chunk_size
+        for start in range(0, len(items), chunk):
+            pipe.rpush(self.key, *items[start:start + chunk])
+
+    @_tracked("list.extend")
+    def extend(self, other):
+        assert type(other) == list
+        self._list.extend(other)
+        if other:
+            pipe = self._pipeline(indexed=True)
+            self._push(pipe, other)
+            self._execute(pipe)
+        return self._list
+
+    @_tracked("list.replace")
+    def replace(self, other):
+        """
+        Replaces the whole contents of the list, deleting the old list and
+        pushing the new items in a single transaction.
+        """
+        self._list = list(other)
+        pipe = self._pipeline(indexed=bool(other))
+        pipe.delete(self.key)
+        self._push(pipe, self._list)
+        self._execute(pipe)
+        return self._list
+
+    @_tracked("list.insert")
+    def insert(self, index, elem):
+        """
+        Inserts `elem` before `index` just like `list.insert`, atomically on
+        the server.
+        """
+        self._list.insert(index, elem)
+        self._resync(self._script("insert", [index, self._encode_item(elem)], indexed=True))
+        return self._list
+
+    @_tracked("list.remove")
+    def remove(self, elem):
+        self._list.remove(elem)
+        pipe = self._pipeline()
+        pipe.lrem(self.key, 1, self._encode_item(elem))
+        self._execute(pipe)
+        return self._list
+
+    @_tracked("list.pop")
+    def pop(self, index=-1):
+        """
+        Removes and returns the item at `index`, the last item by default,
+        atomically on the server.
+        """
+        value = self._list.pop(index)
+        if index == -1:
+            pipe = self._pipeline()
+            pipe.rpop(self.key)
+            self._execute(pipe)
+            return value
+
+        reply = self._script("pop", [index])
+        if reply is not None:
+            value, state = reply
+            self._resync(state)
+            value = self._decode_items([value])[0]
+        return value
+
+    @_tracked("list.lpop")
+    def lpop(self):
+        value = self._list.pop(0)
+        pipe = self._pipeline()
+        pipe.lpop(self.key)
+        self._execute(pipe)
+        return value
+
+    def index(self, elem):
+        return self._list.index(elem)
+
+    def count(self):
+        return self._list.count()
+
+    @_tracked("list.reset")
+    def reset(self):
+        self._list = []
+        pipe = self._pipeline()
+        pipe.delete(self.key)
+        self._execute(pipe)
+
+    def __len__(self):
+        return len(self._list)
+
+    def __getitem__(self, index):
+        return self._list[index]
+
+    @_tracked("list.set")
+    def __setitem__(self, index, value):
+        self._list[index] = value
+        self._resync(self._script("set", [index, self._encode_item(value)]))
+
+    @_tracked("list.del")
+    def __delitem__(self, index):
+        del self._list[index]
+        reply = self._script("pop", [index])
+        if reply is not None:
+            self._resync(reply[1])
+
+    def __iter__(self):
+        for item in self._list:
+            yield item
+
+    def __contains__(self, item):
+        return item in self._list
+
+    def __eq__(self, other):
+        return self._list == other
+
+
+class LazyRedisList(RedisList):
+    """
+    A :py:class:`.RedisList` which does not mirror the whole list in memory.
+    Its length comes from `LLEN`, indexing and slicing map onto `LINDEX` and
+    `LRANGE`, and iteration streams the list a page at a time, so only the
+    items which are actually used are sent over the wire.
+
+    The most recently fetched page is kept in a small window cache, which is
+    dropped whenever the list is changed through this object. Changes made by
+    other clients are only seen once the window moves, or after
+    :py:meth:`.sync`.
+
+    Models use this class for their lists if `lazy_lists` is set.
+    """
+    __slots__ = ("page_size", "cache_size", "_window_start", "_window")
+
+    def __init__(self, key, conn, start=[], reset=False, loaded=None, index=None,
+                 batch=None, chunk_size=None, page_size=None, cache_size=None, codec=None,
+                 ttl=None, index_ttl=None, read_conn=None):
+        """
+        Takes the same arguments as :py:class:`.RedisList`, except `loaded`
+        which is ignored since nothing is mirrored, and:
+
+        :param page_size: The number of items fetched per `LRANGE` while
+            iterating. Defaults to the module level `list_page_size`.
+        :param cache_size: The largest page which is kept in the window
+            cache, which also caps how many items around an index a single
+            item read fetches. `0` disables the cache. Defaults to
+            `page_size`.
+        """
+        self._list = []
+        self.conn = conn
+        self.key = key
+        self._index = index
+        self._batch = batch
+        self.chunk_size = chunk_size
+        self.deferred = False
+        self.dirty = False
+        self.codec = codec
+        self.ttl = ttl
+        self.index_ttl = index_ttl
+        self.read_conn = read_conn
+        self.page_size = page_size or list_page_size
+        self.cache_size = self.page_size if cache_size is None else cache_size
+        self._window_start = None
+        self._window = []
+
+        if reset:
+            self.replace(start)
+        elif start:
+            self.extend(start)
+
+    def __repr__(self):
+        return "<LazyRedisList %s>" % self.key
+
+    def __str__(self):
+        return repr(self)
+
+    def _cache(self, start, items):
+        if self._batch is None and len(items) <= self.cache_size:
+            self._window_start = start
+            self._window = items
+
+    @_tracked("list.read")
+    def _range(self, start, end):
+        items = self._decode_items(self._read().lrange(self.key, start, end))
+        if start >= 0:
+            self._cache(start, items)
+        return items
+
+    def sync(self):
+        """
+        Drops the window cache, so the next read goes to redis.
+        """
+        self._window_start = None
+        self._window = []
+
+    def _write(self, indexed=False):
+        self.sync()
+        return self._pipeline(indexed=indexed)
+
+    def pages(self):
+        """
+        Generator which yields the list a page of `page_size` items at a time.
+        """
+        start = 0
+        while True:
+            page = self._range(start, start + self.page_size - 1)
+            if page:
+                yield page
+            if len(page) < self.page_size:
+                return
+            start += self.page_size
+
+    @_tracked("list.append")
+    def append(self, other):
+        pipe = self._write(indexed=True)
+        pipe.rpush(self.key, self._encode_item(other))
+        self._execute(pipe)
+
+    @_tracked("list.prepend")
+    def prepend(self, other):
+        pipe = self._write(indexed=True)
+        pipe.lpush(self.key, self._encode_item(other))
+        self._execute(pipe)
+
+    @_tracked("list.extend")
+    def extend(self, other):
+        assert type(other) == list
+        if other:
+            pipe = self._write(indexed=True)
+            self._push(pipe, other)
+            self._execute(pipe)
+
+    @_tracked("list.replace")
+    def replace(self, other):
+        pipe = self._write(indexed=bool(other))
+        pipe.delete(self.key)
+        self._push(pipe, list(other))
+        self._execute(pipe)
+
+    @_tracked("list.insert")
+    def insert(self, index, elem):
+        self.sync()
+        self._script("insert", [index, self._encode_item(elem)], indexed=True, state=False)
+
+    @_tracked("list.remove")
+    def remove(self, elem):
+        pipe = self._write()
+        pipe.lrem(self.key, 1, self._encode_item(elem))
+        self._execute(pipe)
+
+    @_tracked("list.pop")
+    def pop(self, index=-1):
+        if self._batch is not None:
+            # The reply isn't available until the batch is flushed.
+            value = self[index]
+            self.sync()
+            self._script("pop", [index], state=False)
+            return value
+
+        self.sync()
+        return self._decode_items([self._script("pop", [index], state=False)[0]])[0]
+
+    @_tracked("list.lpop")
+    def lpop(self):
+        value = self[0]
+        pipe = self._write()
+        pipe.lpop(self.key)
+        self._execute(pipe)
+        return value
+
+    def index(self, elem):
+        position = 0
+        for page in self.pages():
+            if elem in page:
+                return position + page.index(elem)
+            position += len(page)
+        raise ValueError("%r is not in list" % (elem,))
+
+    def count(self, elem):
+        return sum(page.count(elem) for page in self.pages())
+
+    @_tracked("list.reset")
+    def reset(self):
+        pipe = self._write()
+        pipe.delete(self.key)
+        self._execute(pipe)
+
+    @_tracked("list.len")
+    def __len__(self):
+        return self._read().llen(self.key)
+
+    @_tracked("list.read")
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            if index.step not in (None, 1):
+                return list(self)[index]
+            start = index.start or 0
+            if index.stop is None:
+                end = -1
+            elif index.stop == 0:
+                return []
+            else:
+                end = index.stop - 1
+            return self._range(start, end)
+
+        if self._window_start is not None and 0 <= index - self._window_start < len(self._window):
+            return self._window[index - self._window_start]
+
+        if index >= 0 and self.cache_size:
+            # Fetch no more around the item than the window cache can keep.
+            size = min(self.page_size, self.cache_size)
+            start = index - index % size
+            page = self._range(start, start + size - 1)
+            if index - start < len(page):
+                return page[index - start]
+            raise IndexError("list index out of range")
+
+        value = self._read().lindex(self.key, index)
+        if value is None:
+            raise IndexError("list index out of range")
+        return self._decode_items([value])[0]
+
+    @_tracked("list.set")
+    def __setitem__(self, index, value):
+        self.sync()
+        self._script("set", [index, self._encode_item(value)], state=False)
+
+    @_tracked("list.del")
+    def __delitem__(self, index):
+        self.sync()
+        self._script("pop", [index], state=False)
+
+    def __iter__(self):
+        for page in self.pages():
+            for item in page:
+                yield item
+
+    def __contains__(self, item):
+        return any(item in page for page in self.pages())
+
+    def __eq__(self, other):
+        return list(self) == other
+
+
+class Scored(dict):
+    """
+    A `dict` of member to score. Assigning one to a model part stores it as a
+    Redis sorted set, a :py:class:`.RedisSortedSet`, rather than as a hash::
+
+        model.leaderboard = Scored({"fred": 10, "george": 7})
+    """
+    __slots__ = ()
+
+
+class _RedisCollection(RedisContainer):
+    """
+    The shared setup of :py:class:`.RedisSet`, :py:class:`.RedisSortedSet`
+    and :py:class:`.RedisHash`, which can each be eager, mirroring the whole
+    structure in memory like :py:class:`.RedisList`, or lazy, sending every
+    read to redis like :py:class:`.LazyRedisList`.
+    """
+    __slots__ = ("lazy", "page_size")
+
+    def __init__(self, key, conn, start=None, reset=False, loaded=None, index=None,
+                 batch=None, deferred=False, codec=None, lazy=False, page_size=None,
+                 ttl=None, index_ttl=None, read_conn=None):
+        """
+        :param key: The full Redis key of the structure.
+        :param conn: The Redis connection to use.
+        :param start: Contents to add once it has been synced.
+        :param reset: If `True` the structure is replaced with `start` in a
+            single transaction, without syncing its old contents first.
+        :param loaded: The already fetched contents. If given, the initial
+            sync with redis is skipped.
+        :param index: A `(index_key, part)` tuple for the owning models part
+            index, which is updated whenever this is added to.
+        :param batch: The :py:class:`.Batch` which writes should be buffered
+            in, if any.
+        :param deferred: If `True` changes are only made locally and `dirty`
+            is set; the owning model writes the whole structure when it is
+            saved. Lazy structures are never deferred.
+        :param codec: The :py:class:`redisORM.fields.Field` used to encode and
+            decode each member or value.
+        :param lazy: If `True` nothing is mirrored in memory, and every read
+            goes to redis.
+        :param page_size: The `COUNT` hint used while iterating lazily.
+            Defaults to the module level `list_page_size`.
+        :param ttl: The TTL in seconds the structure is given, in the same
+            transaction, every time it's written to. `None` for no expiry.
+        :param index_ttl: The TTL in seconds of the owning models part index,
+            refreshed along with the structure.
+        :param read_conn: A connection to a read replica to read the
+            structure from, while writes go to `conn`.
+        """
+        self.conn = conn
+        self.key = key
+        self._index = index
+        self._batch = batch
+        self.deferred = deferred and not lazy
+        self.dirty = False
+        self.codec = codec
+        self.ttl = ttl
+        self.index_ttl = index_ttl
+        self.read_conn = read_conn
+        self.lazy = lazy
+        self.page_size = page_size or list_page_size
+        self._local(())
+
+        if reset:
+            self.replace(start or ())
+            return
+
+        if not lazy:
+            if loaded is not None:
+                self._load(loaded)
+            else:
+                self.sync()
+
+        if start:
+            self.update(start)
+
+    def __repr__(self):
+        if self.lazy:
+            return "<%s %s>" % (type(self).__name__, self.key)
+        return repr(self._copy())
+
+    def __str__(self):
+        return repr(self)
+
+    def _load(self, raw):
+        """
+        Replaces the local contents with a reply from redis.
+        """
+        raise NotImplementedError
+
+    def _add_all(self, pipe, items):
+        raise NotImplementedError
+
+    def replace(self, other):
+        """
+        Replaces the whole contents, deleting the old structure and writing
+        the new contents in a single transaction.
+        """
+        self._local(other)
+        pipe = self._pipeline(indexed=bool(other))
+        pipe.delete(self.key)
+        self._add_all(pipe, other)
+        self._execute(pipe)
+
+    def _queue_replace(self, pipe):
+        items = self._copy()
+        pipe.delete(self.key)
+        self._add_all(pipe, items)
+        if items and self._index:
+            pipe.hset(self._index[0], self._index[1], self.object_type)
+
+    @_tracked("collection.reset")
+    def reset(self):
+        """
+        Removes everything, deleting the key.
+        """
+        self._local(())
+        pipe = self._pipeline()
+        pipe.delete(self.key)
+        self._execute(pipe)
+
+    clear = reset
+
+
+class RedisSet(_RedisCollection):
+    """
+    Emulates a python `set` while backing it with a Redis set. Membership
+    tests are `O(1)` either way: against the local mirror when eager, or
+    with `SISMEMBER` when lazy.
+
+    Assigning a `set` or `frozenset` to a model part creates one of these.
+    Members which look like ints are read back as ints, like the items of a
+    :py:class:`.RedisList`, unless the part has a declared field.
+    """
+    __slots__ = ("_set",)
 
-Lets create a new model:
+    object_type = "set"
 
->>> sample1 = RedisModel(namespace="test", key="sample1", conn=redis_instance)
->>> sample1 #doctest: +ELLIPSIS
-<RedisModel.RedisModel ...>
+    def _copy(self):
+        return set(self._set)
 
-And now lets add some data to it. Two strings and a list:
+    def _local(self, items):
+        self._set = set(items)
 
->>> sample1.name = "Ludwig Van Beethoven"
->>> sample1["era"] = "Classical" # you can also treat it like a dictionary (with some missing features)
->>> sample1.famous_works = ["Symphony No.5", "Symphony No.7", "Symphony No.9"] # Lists have limited support also
+    def _load(self, raw):
+        self._set = set(self._decode_items(list(raw)))
 
-Along with setting data you can also access data, both like an object property
-or by using the dictionary index style:
+    def _add_all(self, pipe, items):
+        members = [self._encode_item(item) for item in items]
+        chunk = list_chunk_size
+        for start in range(0, len(members), chunk):
+            pipe.sadd(self.key, *members[start:start + chunk])
 
->>> sample1["name"]
-'Ludwig Van Beethoven'
->>> sample1.era
-'Classical'
->>> sample1.famous_works
-['Symphony No.5', 'Symphony No.7', 'Symphony No.9']
+    @_tracked("set.sync")
+    def sync(self):
+        """
+        Reloads the local mirror from redis. Does nothing when lazy.
+        """
+        if not self.lazy:
+            self._load(self._read().smembers(self.key))
+
+    @_tracked("set.add")
+    def add(self, member):
+        self._set.add(member)
+        pipe = self._pipeline(indexed=True)
+        pipe.sadd(self.key, self._encode_item(member))
+        self._execute(pipe)
+
+    @_tracked("set.update")
+    def update(self, *others):
+        members = set().union(*others)
+        if not members:
+            return
+        self._set.update(members)
+        pipe = self._pipeline(indexed=True)
+        self._add_all(pipe, members)
+        self._execute(pipe)
+
+    @_tracked("set.remove")
+    def remove(self, member):
+        """
+        Removes `member`, raising `KeyError` if it isn't in the set.
+        """
+        if not self.lazy:
+            self._set.remove(member)
+        pipe = self._pipeline()
+        pipe.srem(self.key, self._encode_item(member))
+        replies = self._execute(pipe)
+        if self.lazy and replies is not None and not replies[-1]:
+            raise KeyError(member)
+
+    @_tracked("set.discard")
+    def discard(self, member):
+        self._set.discard(member)
+        pipe = self._pipeline()
+        pipe.srem(self.key, self._encode_item(member))
+        self._execute(pipe)
+
+    @_tracked("set.pop")
+    def pop(self):
+        """
+        Removes and returns an arbitrary member. Lazy sets inside of a
+        :py:class:`.Batch` return `None`, since the reply isn't available
+        until the batch is flushed.
 
-You can also check for a property in the model:
+        :raises KeyError: If the set is empty.
+        """
+        if not self.lazy:
+            member = self._set.pop()
+            pipe = self._pipeline()
+            pipe.srem(self.key, self._encode_item(member))
+            self._execute(pipe)
+            return member
+
+        pipe = self._pipeline()
+        pipe.spop(self.key)
+        replies = self._execute(pipe)
+        if replies is None:
+            return None
+        if replies[-1] is None:
+            raise KeyError("pop from an empty set")
+        return self._decode_items([replies[-1]])[0]
+
+    @_tracked("set.contains")
+    def __contains__(self, member):
+        if self.lazy:
+            return bool(self._read().sismember(self.key, self._encode_item(member)))
+        return member in self._set
+
+    @_tracked("set.len")
+    def __len__(self):
+        if self.lazy:
+            return self._read().scard(self.key)
+        return len(self._set)
 
->>> "name" in sample1
-True
->>> "age" in sample1
-False
->>> "Symphony No.9" in sample1.famous_works
-True
-"""
+    def __iter__(self):
+        if not self.lazy:
+            for member in list(self._set):
+                yield member
+            return
+
+        cursor = 0
+        while True:
+            with _track("set.scan", self.key.rsplit(":", 2)[0]):
+                cursor, page = self._read().sscan(self.key, cursor, count=self.page_size)
+            for member in self._decode_items(list(page)):
+                yield member
+            if not cursor:
+                return
 
-redis = None
-"""
-Global RedisModel connection which can be set before hand to avoid passing a
-redis instance around everywhere all the time.
-"""
+    def __eq__(self, other):
+        return set(self) == other
 
 
-class RedisORMException(Exception):
+class RedisSortedSet(_RedisCollection):
     """
-    The general exception class which is raised by this module. Nothing special.
+    A Redis sorted set of members and their scores, which acts like a `dict`
+    of member to score with a few extras. Iterating goes through the
+    members in score order. :py:meth:`.range_by_score` and :py:meth:`.range`
+    read just the requested slice with `ZRANGEBYSCORE` and `ZRANGE` when
+    lazy, or from the local mirror when eager.
+
+    Assigning a :py:class:`.Scored` mapping to a model part creates one of
+    these.
     """
+    __slots__ = ("_scores",)
 
+    object_type = "zset"
 
-class RedisKeys(object):
-    """
-    Where the realtime syncing and updating takes place.
+    def _copy(self):
+        return dict(self._scores)
 
-    A `dict` like object which is used as the backing data store for
-    :py:class:`.RedisModel`.
+    def _local(self, items):
+        self._scores = dict((member, float(score)) for member, score in dict(items).items())
 
-    Aka: The Source of Magic
-    """
-    def __init__(self, key, namespace="", conn=None):
-        """
-        Creates a new `dict` like object which is used to actually store data in
-        Redis. Under all normal circumstances, you should not need to use this
-        class in any way shape or form, as it is the backing datastore for the
-        model.
+    def _load(self, raw):
+        raw = list(raw)
+        members = self._decode_items([member for member, score in raw])
+        self._scores = dict(zip(members, [float(score) for member, score in raw]))
 
-        :param key: The key section of the Redis key.
-        :param namespace: The key namespace.
-        :param conn: The Redis connection to use.
+    def _add_all(self, pipe, items):
+        scores = list(dict(items).items())
+        chunk = list_chunk_size
+        for start in range(0, len(scores), chunk):
+            pipe.zadd(self.key, dict((self._encode_item(member), score)
+                                     for member, score in scores[start:start + chunk]))
 
-        :raises RedisORMException: If no key was provided.
+    def _ordered(self):
         """
-        self._data = dict()
-        self.conn = conn
-        self.namespace = namespace # Key prefix
-        self.key = key
-
-        if not self.key:
-            raise RedisORMException("RedisKeys needs a key, which means something went terribly wrong.")
+        The local mirror in the same order redis keeps it.
+        """
+        return sorted(self._scores.items(),
+                      key=lambda item: (item[1], "%s" % (self._encode_item(item[0]),)))
 
-        redis_search_key = ":".join([self.namespace, self.key, "*"])
-        keys = self.conn.keys(redis_search_key)
-        if keys:
-            for key in keys:
-                part = key.split(":")[-1]
-                self.get(part)
+    def _decode_scored(self, raw, withscores):
+        if not withscores:
+            return self._decode_items(list(raw))
+        members = self._decode_items([member for member, score in raw])
+        return list(zip(members, [float(score) for member, score in raw]))
 
-    def delete(self):
+    @_tracked("zset.sync")
+    def sync(self):
         """
-        Deletes all the keys from redis along with emptying the objects
-        internal `_data` dict, then deleting itself at the end of it all.
+        Reloads the local mirror from redis. Does nothing when lazy.
         """
-        redis_search_key = ":".join([self.namespace, self.key, "*"])
-        keys = self.conn.keys(redis_search_key)
-        if keys:
-            for key in keys:
-                part = key.split(":")[-1]
-                self._data.pop(part)
-                self.conn.delete(part)
+        if not self.lazy:
+            self._load(self._read().zrange(self.key, 0, -1, withscores=True))
+
+    @_tracked("zset.add")
+    def add(self, member, score):
+        self._scores[member] = float(score)
+        pipe = self._pipeline(indexed=True)
+        pipe.zadd(self.key, {self._encode_item(member): score})
+        self._execute(pipe)
+
+    @_tracked("zset.update")
+    def update(self, scores):
+        if not scores:
+            return
+        self._scores.update((member, float(score)) for member, score in dict(scores).items())
+        pipe = self._pipeline(indexed=True)
+        self._add_all(pipe, scores)
+        self._execute(pipe)
+
+    @_tracked("zset.increment")
+    def increment(self, member, amount=1):
+        """
+        Adds `amount` to the score of `member`, which starts at `0`, and
+        returns the new score, or `None` if it was queued in a batch.
+        """
+        if not self.lazy:
+            self._scores[member] = self._scores.get(member, 0.0) + amount
+        pipe = self._pipeline(indexed=True)
+        pipe.zincrby(self.key, amount, self._encode_item(member))
+        replies = self._execute(pipe)
+        if not self.lazy:
+            return self._scores[member]
+        return None if replies is None else float(replies[-1])
+
+    @_tracked("zset.remove")
+    def remove(self, member):
+        """
+        Removes `member`, raising `KeyError` if it isn't in the sorted set.
+        """
+        if not self.lazy:
+            del self._scores[member]
+        pipe = self._pipeline()
+        pipe.zrem(self.key, self._encode_item(member))
+        replies = self._execute(pipe)
+        if self.lazy and replies is not None and not replies[-1]:
+            raise KeyError(member)
+
+    @_tracked("zset.discard")
+    def discard(self, member):
+        self._scores.pop(member, None)
+        pipe = self._pipeline()
+        pipe.zrem(self.key, self._encode_item(member))
+        self._execute(pipe)
+
+    @_tracked("zset.score")
+    def score(self, member, default=None):
+        """
+        Returns the score of `member`, or `default` if it isn't in the
+        sorted set.
+        """
+        if not self.lazy:
+            return self._scores.get(member, default)
+        score = self._read().zscore(self.key, self._encode_item(member))
+        return default if score is None else float(score)
 
-        del self
+    @_tracked("zset.range")
+    def range_by_score(self, min=None, max=None, withscores=False, start=None, num=None):
+        """
+        Returns the members with scores between `min` and `max` inclusive,
+        in score order. Either end can be `None` to leave it open.
 
-    def get(self, part):
+        :param withscores: If `True`, `(member, score)` tuples are returned.
+        :param start: How many matching members to skip, for paging.
+        :param num: The most members to return, for paging.
         """
-        Retrieves a part of the model from redis and stores it.
+        if self.lazy:
+            if start is not None and num is None:
+                # LIMIT needs both, a negative count returns everything left.
+                num = -1
+            elif num is not None and start is None:
+                start = 0
+            raw = self._read().zrangebyscore(self.key,
+                                          "-inf" if min is None else min,
+                                          "+inf" if max is None else max,
+                                          start=start, num=num, withscores=withscores)
+            return self._decode_scored(raw, withscores)
+
+        items = [(member, score) for member, score in self._ordered()
+                 if (min is None or score >= min) and (max is None or score <= max)]
+        items = items[start or 0:]
+        if num is not None:
+            items = items[:num]
+        if withscores:
+            return items
+        return [member for member, score in items]
+
+    @_tracked("zset.range")
+    def range(self, start=0, end=-1, withscores=False):
+        """
+        Returns the members ranked `start` to `end` inclusive, in score order,
+        with the same negative index rules as `ZRANGE`.
 
-        :param part: The part of the model to retrieve.
-        :raises RedisORMException: If the redis type is different from string
-            or list (the only two supported types at this time.)
+        :param withscores: If `True`, `(member, score)` tuples are returned.
         """
-        redis_key = ':'.join([self.namespace, self.key, part])
+        if self.lazy:
+            raw = self._read().zrange(self.key, start, end, withscores=withscores)
+            return self._decode_scored(raw, withscores)
+
+        items = self._ordered()
+        stop = None if end == -1 else (end + 1 or None)
+        items = items[start:stop]
+        if withscores:
+            return items
+        return [member for member, score in items]
+
+    def items(self):
+        """
+        Returns the `(member, score)` pairs in score order. Lazy sorted sets
+        read them from redis a page at a time.
+        """
+        if not self.lazy:
+            return self._ordered()
+        return self._pages(withscores=True)
+
+    def _pages(self, withscores):
+        start = 0
+        while True:
+            page = self.range(start, start + self.page_size - 1, withscores=withscores)
+            for item in page:
+                yield item
+            if len(page) < self.page_size:
+                return
+            start += self.page_size
+
+    def __getitem__(self, member):
+        score = self.score(member)
+        if score is None:
+            raise KeyError(member)
+        return score
+
+    def __setitem__(self, member, score):
+        self.add(member, score)
+
+    def __delitem__(self, member):
+        self.remove(member)
+
+    def __contains__(self, member):
+        return self.score(member) is not None
+
+    @_tracked("zset.len")
+    def __len__(self):
+        if self.lazy:
+            return self._read().zcard(self.key)
+        return len(self._scores)
 
-        objectType = self.conn.type(redis_key)
-        if objectType == "string":
-            self._data[part] = self.conn.get(redis_key)
+    def __iter__(self):
+        if not self.lazy:
+            return iter([member for member, score in self._ordered()])
+        return self._pages(withscores=False)
 
-        elif objectType == "list":
-            self._data[part] = RedisList(redis_key, self.conn)
+    def __eq__(self, other):
+        return dict(self.items()) == other
 
-        else:
-            raise RedisORMException("Other types besides string and list are unsupported at this time.")
 
-    def get_default(self, part, default=None):
-        """
-        Works just like a `dict`'s `get()` method, returning the default if no
-        matching key was found.
+class RedisHash(_RedisCollection):
+    """
+    Emulates a python `dict` while backing it with a Redis hash. Lazy hashes
+    read single fields with `HGET` and iterate with `HSCAN`.
 
-        :param part: The key which to look for
-        :param default: The default to return if no match was found
-        """
-        return self._data.get(part, default)
+    Assigning a `dict` to a model part creates one of these, unless the part
+    has a packed field like :py:class:`redisORM.fields.JSON`. Values are read
+    back as strings, just like scalar parts, unless the part has a declared
+    field.
+    """
+    __slots__ = ("_dict",)
 
-    def __repr__(self):
-        return str(self._data)
+    object_type = "hash"
 
-    def __getitem__(self, part):
-        return self._data[part]
+    def _copy(self):
+        return dict(self._dict)
 
-    def __setitem__(self, part, value):
-        key = ':'.join([self.namespace, self.key, part])
+    def _local(self, items):
+        self._dict = dict(items)
 
-        if isinstance(value, list):
-            self._data[part] = RedisList(key, self.conn, start=value)
+    def _decode_values(self, values):
+        if self.codec is None:
+            return values
+        return self.codec.decode_list(values)
 
-        else:
-            if value == None:
-                value = ""
+    def _load(self, raw):
+        fields = list(raw)
+        self._dict = dict(zip(fields, self._decode_values([raw[field] for field in fields])))
 
-            self._data[part] = value
-            self.conn.set(key, value)
+    def _add_all(self, pipe, items):
+        items = list(dict(items).items())
+        chunk = list_chunk_size
+        for start in range(0, len(items), chunk):
+            pipe.hset(self.key, mapping=dict((field, self._encode_item(value))
+                                             for field, value in items[start:start + chunk]))
 
-    def __delitem__(self, part):
-        key = ':'.join([self.namespace, self.key, part])
-        self._data.pop(part)
-        self.conn.delete(key)
+    @_tracked("hash.sync")
+    def sync(self):
+        """
+        Reloads the local mirror from redis. Does nothing when lazy.
+        """
+        if not self.lazy:
+            self._load(self._read().hgetall(self.key))
+
+    @_tracked("hash.get")
+    def get(self, field, default=None):
+        if not self.lazy:
+            return self._dict.get(field, default)
+        value = self._read().hget(self.key, field)
+        if value is None:
+            return default
+        return self._decode_values([value])[0]
+
+    def __getitem__(self, field):
+        if not self.lazy:
+            return self._dict[field]
+        value = self.get(field, _MISSING)
+        if value is _MISSING:
+            raise KeyError(field)
+        return value
 
-    def __contains__(self, part):
-        return part in self._data
+    @_tracked("hash.set")
+    def __setitem__(self, field, value):
+        self._dict[field] = value
+        pipe = self._pipeline(indexed=True)
+        pipe.hset(self.key, field, self._encode_item(value))
+        self._execute(pipe)
+
+    @_tracked("hash.update")
+    def update(self, other):
+        if not other:
+            return
+        self._dict.update(other)
+        pipe = self._pipeline(indexed=True)
+        self._add_all(pipe, other)
+        self._execute(pipe)
+
+    @_tracked("hash.del")
+    def __delitem__(self, field):
+        if not self.lazy:
+            del self._dict[field]
+        pipe = self._pipeline()
+        pipe.hdel(self.key, field)
+        replies = self._execute(pipe)
+        if self.lazy and replies is not None and not replies[-1]:
+            raise KeyError(field)
+
+    def keys(self):
+        return [field for field, value in self.items()]
+
+    def values(self):
+        return [value for field, value in self.items()]
+
+    def items(self):
+        """
+        Returns the `(field, value)` pairs. Lazy hashes read them from redis
+        with `HSCAN`, a page at a time.
+        """
+        if not self.lazy:
+            return list(self._dict.items())
+        return self._scan()
+
+    def _scan(self):
+        cursor = 0
+        while True:
+            with _track("hash.scan", self.key.rsplit(":", 2)[0]):
+                cursor, page = self._read().hscan(self.key, cursor, count=self.page_size)
+            fields = list(page)
+            for item in zip(fields, self._decode_values([page[field] for field in fields])):
+                yield item
+            if not cursor:
+                return
+
+    @_tracked("hash.contains")
+    def __contains__(self, field):
+        if self.lazy:
+            return bool(self._read().hexists(self.key, field))
+        return field in self._dict
+
+    @_tracked("hash.len")
+    def __len__(self):
+        if self.lazy:
+            return self._read().hlen(self.key)
+        return len(self._dict)
 
+    def __iter__(self):
+        for field, value in self.items():
+            yield field
 
-class RedisList(object):
-    """
-    Attempts to emulate a python `list`, while backing the list in redis. This
-    supports most of the common `list` functions, except as noted.
+    def __eq__(self, other):
+        return dict(self.items()) == other
 
-    Generally speaking, you won't have to create an instance of this class,
-    however if you are working with a `list` then this is the class you'll get
-    back, not a `list` class.
 
-    .. note::
-        Most notably, this is currently missing the sort and reverse functions.
+_MISSING = object()
 
-    """
-    def __init__(self, key, conn, start=[], reset=False):
-        self._list = []
-        self.conn = conn
-        self.key = key
-        self.sync()
+_CONTAINER_CLASSES = {
+    "set": RedisSet,
+    "zset": RedisSortedSet,
+    "hash": RedisHash,
+}
+"""
+The container class for each Redis type besides lists, see
+:py:meth:`.RedisKeys._new_container`.
+"""
 
-        # Haxs I say...
-        if start and not reset:
-            self.extend(start)
-        if start and reset:
-            self.reset()
-            self.extend(start)
 
-    def __repr__(self):
-        return repr(self._list)
+_LIST_MARKER = "__redisORM_marker__"
+
+_LIST_SCRIPTS = {
+    # Insert ARGV[2] before index ARGV[1], with the same clamping as
+    # list.insert. The item at the index is swapped for a marker so that
+    # LINSERT can find it.
+    "insert": """
+local len = redis.call('LLEN', KEYS[1])
+local i = tonumber(ARGV[1])
+if i < 0 then i = math.max(len + i, 0) end
+if i >= len then
+    redis.call('RPUSH', KEYS[1], ARGV[2])
+else
+    local pivot = redis.call('LINDEX', KEYS[1], i)
+    redis.call('LSET', KEYS[1], i, ARGV[3])
+    redis.call('LINSERT', KEYS[1], 'BEFORE', ARGV[3], ARGV[2])
+    redis.call('LSET', KEYS[1], i + 1, pivot)
+end
+if ARGV[4] == '1' then return redis.call('LRANGE', KEYS[1], 0, -1) end
+return false
+""",
+    # Set index ARGV[1] to ARGV[2], LSET already understands negative indexes.
+    "set": """
+redis.call('LSET', KEYS[1], ARGV[1], ARGV[2])
+if ARGV[4] == '1' then return redis.call('LRANGE', KEYS[1], 0, -1) end
+return false
+""",
+    # Remove and return the item at index ARGV[1].
+    "pop": """
+local value = redis.call('LINDEX', KEYS[1], ARGV[1])
+if not value then return redis.error_reply('index out of range') end
+redis.call('LSET', KEYS[1], ARGV[1], ARGV[2])
+redis.call('LREM', KEYS[1], 1, ARGV[2])
+if ARGV[3] == '1' then return {value, redis.call('LRANGE', KEYS[1], 0, -1)} end
+return {value, {}}
+""",
+}
+"""
+Lua scripts for the :py:class:`.RedisList` operations which work on an index,
+so that each one is atomic. The last two arguments of every script are a
+marker value and whether the resulting list should be returned.
+"""
 
-    def __str__(self):
-        return str(self._list)
+_LIST_SCRIPT_SHAS = dict((name, hashlib.sha1(script.encode("utf-8")).hexdigest())
+                         for name, script in _LIST_SCRIPTS.items())
 
-    def sync(self):
-        self._list = self.conn.lrange(self.key, 0, -1)
-        self.listToInt()
+_scripts_loaded = weakref.WeakKeyDictionary()
 
-    def listToInt(self):
-        for elem in range(len(self._list)):
-            try:
-                self._list[elem] = int(self._list[elem])
-            except:
-                pass
 
-    def append(self, other):
-        self._list.append(other)
-        self.conn.rpush(self.key, other)
-        return self._list
+def load_scripts(conn):
+    """
+    Loads the Lua scripts used by :py:class:`.RedisList` into the script
+    cache of the server, so that they can be called with `EVALSHA`. This
+    happens automatically the first time a connection needs them.
+    """
+    pipe = conn.pipeline(transaction=False)
+    for script in _LIST_SCRIPTS.values():
+        pipe.script_load(script)
+    pipe.execute()
+    _scripts_loaded[conn] = True
 
-    def prepend(self, other):
-        self._list.insert(0, other)
-        self.conn.lpush(self.key, other)
 
-    def extend(self, other):
-        assert type(other) == list
-        self._list.extend(other)
-        for key in other:
-            self.conn.rpush(self.key, key)
-        return self._list
+def _ensure_scripts(conn):
+    if conn not in _scripts_loaded:
+        load_scripts(conn)
 
-    def insert(self, index, elem):
-        self._list.insert(index, elem)
-        self.conn.linsert(self.key, 'AFTER', index, elem)
-        return self._list
 
-    def remove(self, elem):
-        self._list.remove(elem)
-        self.conn.lrem(self.key, 1, elem)
-        return self._list
+class _NullPipeline(object):
+    """
+    Stands in for a pipeline when writes aren't wanted, swallowing every
+    command which is queued on it.
+    """
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: self
 
-    def pop(self):
-        value = self._list.pop()
-        self.conn.rpop(self.key)
-        return value
 
-    def lpop(self):
-        value = self._list.pop(0)
-        self.conn.lpop(self.key)
-        return value
+_INT_PATTERN = re.compile(r"-?(0|[1-9][0-9]*)\Z")
+_INT_BYTES_PATTERN = re.compile(br"-?(0|[1-9][0-9]*)\Z")
 
-    def index(self, elem):
-        return self._list.index(elem)
 
-    def count(self):
-        return self._list.count()
+def _list_to_int(items):
+    """
+    Converts every item which is written exactly like an int into one, in
+    place. Anything else, including ints with leading zeros like `"007"`
+    which wouldn't survive the round trip, is left alone.
+    """
+    for elem, item in enumerate(items):
+        if isinstance(item, str):
+            match = _INT_PATTERN.match(item)
+        elif isinstance(item, bytes):
+            match = _INT_BYTES_PATTERN.match(item)
+        else:
+            continue
+        if match:
+            items[elem] = int(item)
+    return items
 
-    def reset(self):
-        self._list = []
-        self.conn.delete(self.key)
 
-    def __len__(self):
-        return len(self._list)
+_reserved_names = {}
+"""
+Model class to the names which are python attributes of that class rather
+than parts, see :py:func:`._build_reserved_names`. Cleared whenever
+:py:attr:`.RedisModel.protected_items` changes.
+"""
 
-    def __getitem__(self, index):
-        return self._list[index]
 
-    def __setitem__(self, index, value):
-        self._list[index] = value
-        self.conn.lset(self.key, index, value)
+def _build_reserved_names(cls):
+    """
+    Works out, and caches, the names which are python attributes of a model
+    class rather than parts: everything in `dir()` of the class, plus the
+    protected items. Model attribute access only has to do this once per
+    class, rather than calling `dir()` every time.
+    """
+    names = frozenset(dir(cls)) | frozenset(cls._protected_items)
+    _reserved_names[cls] = names
+    return names
 
-    def __iter__(self):
-        for item in self._list:
-            yield item
 
-    def __contains__(self, item):
-        return item in self._list
+class _PartAttribute(object):
+    """
+    A class level attribute which reads and writes a declared part of a
+    model straight from its :py:class:`.RedisKeys`.
+    """
+    __slots__ = ("part",)
 
-    def __eq__(self, other):
-        return self._list == other
+    def __init__(self, part):
+        self.part = part
+
+    def __get__(self, model, cls=None):
+        if model is None:
+            return self
+        return model._data[self.part]
+
+    def __set__(self, model, value):
+        model._data[self.part] = value
 
 
 class RedisModel(object):
@@ -292,14 +3169,34 @@ class RedisModel(object):
     This object has a `__repr__` method which can be used with print or logging
     statements. It will give the id and a representation of the internal `_data`
     :py:class:`.RedisKeys` for debugging purposes.
+
+    The backing data and connection are kept in slots, and subclasses still
+    get an instance `__dict__` for any protected items they set.
     """
-    _data = None
-    key = None
-    conn = None
-    namespace = None
+    __slots__ = ("_data", "key", "conn", "namespace", "__dict__", "__weakref__")
+
     _protected_items = [] #: Object properties which shouldn't be stored in redis.
+    _hash_storage = False #: Store scalar parts in a single Redis hash, see :py:class:`.RedisKeys`.
+    _lazy_lists = False #: Use :py:class:`.LazyRedisList` and lazy sets and hashes for container parts.
+    _lazy = False #: Only fetch parts from redis the first time they're used.
+    _prefetch = [] #: Parts to fetch up front anyways when `_lazy` is set.
+    _deferred = False #: Only write changes to redis when :py:meth:`.save` is called.
+    _indexes = {} #: Secondary indexes, part name to `"equality"` or `"range"`, see :py:meth:`.find`.
+    _schema = {} #: Part name to :py:class:`redisORM.fields.Field`, for parts with a declared type.
+    _ttl = None #: Seconds until the model expires, refreshed by every write and :py:meth:`.touch`.
+    _field_ttls = {} #: Part name to seconds, for parts which expire on their own.
+
+    def __init_subclass__(cls, **kwargs):
+        """
+        Gives each part declared in the `_schema` of a subclass a class level
+        attribute, so reading it skips `__getattr__` altogether.
+        """
+        super(RedisModel, cls).__init_subclass__(**kwargs)
+        for part in cls.__dict__.get("_schema", ()):
+            if not hasattr(cls, part):
+                setattr(cls, part, _PartAttribute(part))
 
-    def __init__(self, namespace=None, key=None, conn=None, **kwargs):
+    def __init__(self, namespace=None, key=None, conn=None, read_conn=None, **kwargs):
         """
         TODO: Me
 
@@ -307,31 +3204,238 @@ class RedisModel(object):
         :param key: The key or id of this object.
         :param conn: The redis connection to use. This can also be set on the
             class instance, or on the module level.
+        :param read_conn: A connection to a read replica, which the model is
+            loaded from and reads its parts from. Writes always go to `conn`.
         :param kwargs: Any additional data which should be stored. This is used
             for creating a new object in redis.
         :raised RedisORMException: If no connection or key was supplied, or if there
             was a problem while creating the :py:class:`.RedisKeys` instance for
             the interal `_data`
         """
-        self.namespace = namespace or ""
+        self.namespace = intern(namespace or "")
         if not key:
             raise RedisORMException("No key supplied.")
         self.key = key
 
-        self.conn = conn or redis
-        if not self.conn:
-            raise RedisORMException("No connection supplied.")
+        self.conn, read_conn = _connections(self.namespace, conn, read_conn)
 
-        self._data = RedisKeys(conn=self.conn, namespace=self.namespace, key=self.key)
+        self._data = self._new_keys(self.namespace, self.key, self.conn, read_conn=read_conn)
 
         if kwargs:
-            for item in kwargs:
-                if item not in self._protected_items and item[0] != "_":
-                    setattr(self, item, kwargs[item])
+            with self.batch():
+                for item in kwargs:
+                    if item not in self._protected_items and item[0] != "_":
+                        setattr(self, item, kwargs[item])
 
         # Hook to run any inherited class code, if needed
         self.finish_init()
 
+    @classmethod
+    def _new_keys(cls, namespace, key, conn, load=True, prefetch=None, read_conn=None):
+        """
+        Creates the :py:class:`.RedisKeys` backing an instance of this class,
+        configured from the class level settings.
+        """
+        if prefetch is None:
+            prefetch = cls._prefetch
+        return RedisKeys(conn=conn, namespace=namespace, key=key,
+                         hash_storage=cls._hash_storage, lazy_lists=cls._lazy_lists,
+                         lazy=cls._lazy, prefetch=prefetch, deferred=cls._deferred,
+                         indexes=cls._indexes, schema=cls._schema, ttl=cls._ttl,
+                         field_ttls=cls._field_ttls, read_conn=read_conn, load=load)
+
+    @classmethod
+    def _from_keys(cls, data):
+        """
+        Builds an instance around an already loaded :py:class:`.RedisKeys`
+        without going through `__init__`. The `finish_init` hook is still
+        called.
+        """
+        model = cls.__new__(cls)
+        object.__setattr__(model, "namespace", data.namespace)
+        object.__setattr__(model, "key", data.key)
+        object.__setattr__(model, "conn", data.conn)
+        object.__setattr__(model, "_data", data)
+        model.finish_init()
+        return model
+
+    @classmethod
+    def get_many(cls, namespace, keys, conn=None, create_missing=False, prefetch=None,
+                 read_conn=None):
+        """
+        Loads many models at once, sharing the same pipelined round trips
+        between all of them rather than loading each one separately.
+
+        :param namespace: The key prefix of the models.
+        :param keys: The keys or ids of the models to load.
+        :param conn: The redis connection to use, defaults to the module level
+            connection.
+        :param create_missing: Models with no data in redis are returned as
+            `None` unless this is `True`, in which case an empty model is
+            returned for them, just like the constructor would.
+        :param prefetch: For lazy classes, the parts to fetch up front,
+            overriding the class level `_prefetch`.
+        :param read_conn: A connection to a read replica to load the models
+            from.
+        :returns: A `list` of models, in the same order as `keys`.
+        :raises RedisORMException: If no connection or an empty key was
+            supplied.
+        """
+        conn, read_conn = _connections(namespace, conn, read_conn)
+
+        keysets = [cls._new_keys(namespace or "", key, conn, load=False, prefetch=prefetch,
+                                 read_conn=read_conn)
+                   for key in keys]
+        load_many(keysets)
+
+        models = []
+        for data in keysets:
+            if data._data or data._types or create_missing:
+                models.append(cls._from_keys(data))
+            else:
+                models.append(None)
+
+        return models
+
+    @classmethod
+    def iter_namespace(cls, namespace, conn=None, batch_size=100, cursor=0, count=None,
+                       with_cursor=False, read_conn=None):
+        """
+        Generator which walks every model in a namespace, using `SCAN` over
+        the models part indexes so that the server is never blocked, and
+        loading the models found in batches with :py:meth:`.get_many`::
+
+            for user in User.iter_namespace("users", batch_size=500):
+                export(user)
+
+        At most one page of keys and one batch of models are held in memory
+        at a time, no matter how big the namespace is. Only models with a
+        part index are found; run :py:func:`.build_part_index` first over
+        data written before models kept one. Models in nested namespaces,
+        like `users:archived` when walking `users`, are skipped.
+
+        :param namespace: The key prefix of the models.
+        :param conn: The redis connection to use, defaults to the module level
+            connection.
+        :param batch_size: How many models are loaded per round of pipelined
+            fetches.
+        :param cursor: The `SCAN` cursor to start from, to resume an earlier
+            walk.
+        :param count: The `COUNT` hint for `SCAN`, defaults to `batch_size`.
+        :param with_cursor: If `True`, `(cursor, model)` tuples are yielded.
+            Passing the cursor back in resumes the walk from the page that
+            model was found in, so a few models may be seen twice but none
+            are missed.
+        :param read_conn: A connection to a read replica to scan and load
+            the models from.
+        :raises RedisORMException: If no connection was supplied.
+        """
+        conn, read_conn = _connections(namespace, conn, read_conn)
+
+        namespace = namespace or ""
+        prefix = namespace + ":"
+        suffix = ":" + INDEX_PART
+        match = prefix + "*" + suffix
+
+        while True:
+            page_cursor = cursor
+            with _track("scan", namespace):
+                cursor, index_keys = (read_conn or conn).scan(cursor=cursor, match=match,
+                                                              count=count or batch_size)
+
+            keys = []
+            seen = set()
+            for index_key in map(_text, index_keys):
+                if _is_nested(namespace, index_key):
+                    continue
+                key = _split_model_key(namespace, index_key)[0]
+                if key and not key.startswith("_") and key not in seen:
+                    seen.add(key)
+                    keys.append(key)
+
+            for start in range(0, len(keys), batch_size):
+                for model in cls.get_many(namespace, keys[start:start + batch_size], conn=conn,
+                                          read_conn=read_conn):
+                    if model is None:
+                        continue
+                    if with_cursor:
+                        yield page_cursor, model
+                    else:
+                        yield model
+
+            if not cursor:
+                return
+
+    @classmethod
+    def find(cls, namespace, conn=None, load=False, **criteria):
+        """
+        Finds the models in a namespace whose parts match all of the given
+        criteria, using the secondary indexes declared in `_indexes`::
+
+            class User(RedisModel):
+                _indexes = {"email": "equality", "age": "range"}
+
+            User.find("users", email="fred@example.com")
+            User.find("users", age=(18, None), load=True)
+
+        Equality indexed parts are matched against a value. Range indexed
+        parts are matched against a `(min, max)` tuple, inclusive, where
+        either end can be `None` to leave it open, or a single number.
+
+        :param namespace: The key prefix of the models.
+        :param conn: The redis connection to use, defaults to the module level
+            connection.
+        :param load: If `True` the matching models are loaded with
+            :py:meth:`.get_many` and returned, rather than their keys.
+        :returns: The matching keys, in score order if there is a single range
+            criteria or sorted otherwise, or the loaded models.
+        :raises RedisORMException: If no connection was supplied or a part
+            has no secondary index.
+        """
+        conn, read_conn = _connections(namespace, conn)
+
+        namespace = namespace or ""
+        pipe = (read_conn or conn).pipeline(transaction=False)
+        for part, value in criteria.items():
+            kind = cls._indexes.get(part)
+            if kind is None:
+                raise RedisORMException("Part %s has no secondary index." % part)
+
+            field = cls._schema.get(part)
+            if kind == "range":
+                if isinstance(value, tuple):
+                    low, high = value
+                else:
+                    low = high = value
+                if field is not None:
+                    low = None if low is None else field.encode(low)
+                    high = None if high is None else field.encode(high)
+                pipe.zrangebyscore(_secondary_key(namespace, part),
+                                   "-inf" if low is None else low,
+                                   "+inf" if high is None else high)
+            else:
+                if field is not None:
+                    value = field.encode(value)
+                pipe.smembers(_secondary_key(namespace, part, value))
+
+        with _track("find", namespace):
+            results = pipe.execute() if criteria else []
+        if not results:
+            return []
+
+        keys = results[0]
+        if len(results) > 1:
+            matches = set(keys).intersection(*results[1:])
+            keys = sorted(matches)
+        elif not isinstance(keys, list):
+            keys = sorted(keys)
+        keys = [_text(key) for key in keys]
+
+        if load:
+            return [model for model in cls.get_many(namespace, keys, conn=conn,
+                                                    read_conn=read_conn) if model]
+        return keys
+
     def finish_init(self):
         """
         A hook called at the end of the main `__init__` to allow for
@@ -353,42 +3457,63 @@ class RedisModel(object):
         """
         return self._data.get_default(attr, default)
 
-    def _get(self, attr):
-        pro_its = object.__getattribute__(self, "_protected_items")
-        if attr[0] == "_" or attr in pro_its:
-            return object.__getattribute__(self, attr)
+    def batch(self):
+        """
+        Returns a :py:class:`.Batch` for this model, so that all of the writes
+        made inside a `with` block are sent to redis as one transaction::
+
+            with model.batch():
+                model.name = "Fred"
+                model.things = ["one", "two"]
+
+        See :py:func:`.batch` for a batch covering several models.
+        """
+        return batch(self)
 
-        elif attr in dir(self):
+    def _get(self, attr):
+        cls = type(self)
+        reserved = _reserved_names.get(cls) or _build_reserved_names(cls)
+        if attr[0] == "_" or attr in reserved:
             return object.__getattribute__(self, attr)
 
-        else:
-            data = object.__getattribute__(self, "_data")
+        data = self._data
+        try:
             return data[attr]
+        except KeyError:
+            # Attributes set on just this instance, such as callables.
+            try:
+                return object.__getattribute__(self, attr)
+            except AttributeError:
+                raise KeyError(attr)
 
     def _set(self, attr, val):
-        pro_its = object.__getattribute__(self, "_protected_items")
-        if attr[0] == "_" or attr in pro_its:
+        cls = type(self)
+        reserved = _reserved_names.get(cls) or _build_reserved_names(cls)
+        if attr[0] == "_" or attr in reserved or callable(val):
             return object.__setattr__(self, attr, val)
 
-        elif hasattr(val, "__call__") or attr in dir(self):
-            return object.__setattr__(self, attr, val)
+        data = self._data
+        if attr not in data:
+            try:
+                object.__getattribute__(self, attr)
+                return object.__setattr__(self, attr, val)
+            except AttributeError:
+                pass
 
-        else:
-            data = object.__getattribute__(self, "_data")
-            data[attr] = val
-            return val
+        data[attr] = val
+        return val
 
     def __getattr__(self, item):
-        return object.__getattribute__(self, "_get")(item)
+        return self._get(item)
 
     def __getitem__(self, item):
-        return object.__getattribute__(self, "_get")(item)
+        return self._get(item)
 
     def __setattr__(self, item, value):
-        return object.__getattribute__(self, "_set")(item, value)
+        return self._set(item, value)
 
     def __setitem__(self, item, value):
-        return object.__getattribute__(self, "_set")(item, value)
+        return self._set(item, value)
 
     def __delitem__(self, item):
         """
@@ -422,6 +3547,29 @@ class RedisModel(object):
         """
         return cls(id=id, **kwargs)
 
+    def save(self):
+        """
+        Writes all of the unsaved changes to a model with `_deferred` set, in
+        a single transaction. See :py:meth:`.RedisKeys.save`.
+        """
+        self._data.save()
+
+    def transaction(self, func, retries=None):
+        """
+        Runs `func` with this model as an optimistic transaction, retrying it
+        if another client changes the model before its writes are made. See
+        :py:meth:`.RedisKeys.transaction`::
+
+            def pay(order):
+                if order.status == "pending":
+                    order.status = "paid"
+
+            order.transaction(pay)
+
+        :raises RedisORMConflict: If every attempt conflicted.
+        """
+        return self._data.transaction(lambda data: func(self), retries)
+
     def delete(self):
         """
         Deletes the current instance, if its in the database (or try).
@@ -429,6 +3577,24 @@ class RedisModel(object):
         self._data.delete()
         del self
 
+    def touch(self, ttl=None):
+        """
+        Pushes back the expiry of every key of the model in a single round
+        trip, with the models `_ttl` and `_field_ttls` or the given `ttl`.
+        See :py:meth:`.RedisKeys.touch`::
+
+            session = Session(namespace="sessions", key=session_id)
+            session.touch()
+        """
+        self._data.touch(ttl)
+
+    def ttl(self):
+        """
+        Returns the remaining TTL in seconds of every part of the model. See
+        :py:meth:`.RedisKeys.ttl`.
+        """
+        return self._data.ttl()
+
     def __repr__(self):
         """
         Allows for the representation of the object, for debugging purposes
@@ -452,4 +3618,6 @@ class RedisModel(object):
         else:
             assert type(value) is str
             self._protected_items.append(value)
+        # The list can be shared by several classes, so rebuild all of them.
+        _reserved_names.clear()
         return self._protected_items
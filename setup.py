@@ -1,8 +1,8 @@
 from setuptools import setup
 
-version = '0.2.0'
+version = '0.3.0'
 
-testing_extras = ['nose', 'coverage']
+testing_extras = ['nose', 'coverage', 'msgpack']
 
 docs_extras = ['Sphinx']
 
@@ -15,7 +15,10 @@ setup(
         "Development Status :: 3 - Alpha",
         "Intended Audience :: Developers",
         "License :: OSI Approved :: MIT License",
-        "Programming Language :: Python :: 2.7",
+        "Programming Language :: Python :: 3",
+        "Programming Language :: Python :: 3 :: Only",
+        "Programming Language :: Python :: 3.8",
+        "Programming Language :: Python :: 3.9",
     ],
     keywords='redis orm database',
     author='Joshua P Ashby',
@@ -24,12 +27,14 @@ setup(
     url='https://github.com/JoshAshby/pyRedisORM/',
     license='MIT',
     packages=['redisORM'],
-    install_requires=['redis'],
+    python_requires='>=3.8',
+    install_requires=['redis>=5.0.1'],
     zip_safe=True,
     test_suite='nose.collector',
     tests_require=['nose'],
     extras_require = {
         'testing':testing_extras,
         'docs':docs_extras,
+        'msgpack':['msgpack'],
         },
 )
@@ -0,0 +1,113 @@
+import asyncio
+
+import redis
+from redis import asyncio as aioredis
+from nose.tools import eq_, ok_, raises
+from redisORM import redis_model, async_model, fields
+
+r = redis.StrictRedis("localhost", db=0, decode_responses=True)
+redis_model.redis = r
+
+
+def run(coro):
+    async def with_conn():
+        async_model.redis = aioredis.StrictRedis(host="localhost", db=0, decode_responses=True)
+        try:
+            return await coro()
+        finally:
+            await async_model.redis.aclose()
+    return asyncio.run(with_conn())
+
+
+def test_load_sync_data():
+    redis_model.RedisModel(namespace="test:async", key="test1", name="Fred", things=["one", 2])
+
+    async def check():
+        a = await async_model.AsyncRedisModel.load("test:async", "test1")
+        eq_(a.name, "Fred")
+        eq_(a.things, ["one", 2])
+        eq_([item async for item in a.things], ["one", 2])
+    run(check)
+
+
+def test_save():
+    async def save():
+        a = await async_model.AsyncRedisModel.load("test:async", "test2")
+        a.name = "Fred"
+        a.things = ["one", "two"]
+        await a.save()
+        await a.things.append("three")
+    run(save)
+
+    b = redis_model.RedisModel(namespace="test:async", key="test2")
+    eq_(b.name, "Fred")
+    eq_(b.things, ["one", "two", "three"])
+
+
+def test_get_many_and_delete():
+    redis_model.RedisModel(namespace="test:async", key="test3", name="Fred")
+
+    async def check():
+        a, b = await async_model.AsyncRedisModel.get_many("test:async", ["test3", "missing"])
+        eq_(a.name, "Fred")
+        eq_(b, None)
+        await a.delete()
+    run(check)
+
+    ok_("name" not in redis_model.RedisModel(namespace="test:async", key="test3"))
+
+
+class AsyncUser(async_model.AsyncRedisModel):
+    _schema = {"age": fields.Integer(), "scores": fields.Integer()}
+    _indexes = {"email": "equality", "age": "range"}
+    _ttl = 600
+
+
+class User(redis_model.RedisModel):
+    _schema = AsyncUser._schema
+    _indexes = AsyncUser._indexes
+
+
+def test_shared_schema_indexes_and_ttl():
+    async def save():
+        a = await AsyncUser.load("test:async:users", "fred")
+        a.email = "fred@example.com"
+        a.age = 30
+        a.scores = [3, 1]
+        await a.save()
+
+        b = await AsyncUser.load("test:async:users", "fred")
+        eq_(b.age, 30)
+        eq_(b.scores, [3, 1])
+        b.email = "freddie@example.com"
+        await b.save()
+    run(save)
+
+    eq_(User.find("test:async:users", email="fred@example.com"), [])
+    eq_(User.find("test:async:users", email="freddie@example.com"), ["fred"])
+    eq_(User.find("test:async:users", age=(18, None)), ["fred"])
+    ok_(0 < r.ttl("test:async:users:fred:age") <= 600)
+    ok_(0 < r.ttl("test:async:users:fred:scores") <= 600)
+    ok_(0 < r.ttl("test:async:users:fred:_parts") <= 600)
+
+    async def delete():
+        a = await AsyncUser.load("test:async:users", "fred")
+        await a.delete()
+    run(delete)
+
+    eq_(User.find("test:async:users", email="freddie@example.com"), [])
+    eq_(User.find("test:async:users", age=(None, None)), [])
+    eq_(r.keys("test:async:users:fred:*"), [])
+
+
+@raises(redis_model.RedisORMException)
+def test_unsupported_parts():
+    async def assign():
+        a = async_model.AsyncRedisModel("test:async", "test4")
+        a.tags = set(["one"])
+    run(assign)
+
+
+def teardown_module(module):
+    for key in module.r.keys("test:async:*"):
+        module.r.delete(key)
@@ -0,0 +1,159 @@
+import time
+
+import redis
+from nose.tools import eq_, ok_
+from redisORM import redis_model, fields
+from redisORM.cache import ModelCache
+
+r = redis.StrictRedis("localhost", db=0, decode_responses=True)
+redis_model.redis = r
+
+
+def setup_module(module):
+    redis_model.cache = ModelCache(max_size=2)
+
+
+def test_cache_hit():
+    redis_model.RedisModel(namespace="test:cache", key="test1", name="Fred", things=["one"])
+    redis_model.cache.clear()
+
+    redis_model.RedisModel(namespace="test:cache", key="test1")
+    r.set("test:cache:test1:name", "George")
+    a = redis_model.RedisModel(namespace="test:cache", key="test1")
+    eq_(a.name, "Fred")
+    eq_(a.things, ["one"])
+    ok_(redis_model.cache.hits >= 1)
+
+
+def test_cache_invalidated_by_writes():
+    a = redis_model.RedisModel(namespace="test:cache", key="test2", name="Fred", things=["one"])
+    redis_model.RedisModel(namespace="test:cache", key="test2")
+
+    a.things.append("two")
+    b = redis_model.RedisModel(namespace="test:cache", key="test2")
+    eq_(b.things, ["one", "two"])
+
+    b.name = "George"
+    c = redis_model.RedisModel(namespace="test:cache", key="test2")
+    eq_(c.name, "George")
+
+
+def test_cache_eviction():
+    for key in ["test3", "test4", "test5"]:
+        redis_model.RedisModel(namespace="test:cache", key=key)
+
+    eq_(len(redis_model.cache), 2)
+    ok_(redis_model.cache.stats()["evictions"] >= 1)
+
+
+class SettingsModel(redis_model.RedisModel):
+    _schema = {"settings": fields.JSON()}
+
+
+def test_cached_values_are_copies():
+    SettingsModel(namespace="test:cache", key="test6", settings={"theme": "dark"})
+    a = SettingsModel(namespace="test:cache", key="test6")
+    a.settings["theme"] = "light"
+
+    b = SettingsModel(namespace="test:cache", key="test6")
+    eq_(b.settings, {"theme": "dark"})
+    b.settings["theme"] = "blue"
+    eq_(SettingsModel(namespace="test:cache", key="test6").settings, {"theme": "dark"})
+
+
+class TypedSettingsModel(SettingsModel):
+    _schema = {"settings": fields.JSON(), "age": fields.Integer()}
+
+
+def test_cache_shared_between_schemas():
+    TypedSettingsModel(namespace="test:cache", key="test9", age=5, settings={"theme": "dark"})
+    redis_model.cache.clear()
+
+    a = redis_model.RedisModel(namespace="test:cache", key="test9")
+    eq_(a.age, "5")
+    eq_(a.settings, '{"theme":"dark"}')
+    b = TypedSettingsModel(namespace="test:cache", key="test9")
+    eq_(b.age, 5)
+    eq_(b.settings, {"theme": "dark"})
+    eq_(redis_model.RedisModel(namespace="test:cache", key="test9").age, "5")
+    ok_(redis_model.cache.hits >= 2)
+
+
+class LoadDuringWrites(object):
+    """
+    Wraps a connection so that the model is loaded by someone else just
+    before each of its pipelines is sent.
+    """
+    def __init__(self, conn, key):
+        self.conn = conn
+        self.key = key
+
+    def pipeline(self, *args, **kwargs):
+        pipe = self.conn.pipeline(*args, **kwargs)
+        execute = pipe.execute
+
+        def load_then_execute(*args, **kwargs):
+            redis_model.RedisModel(namespace="test:cache", key=self.key)
+            return execute(*args, **kwargs)
+
+        pipe.execute = load_then_execute
+        return pipe
+
+    def __getattr__(self, name):
+        return getattr(self.conn, name)
+
+
+def test_load_during_write_isnt_cached():
+    a = redis_model.RedisModel(namespace="test:cache", key="test8", name="Fred", things=["one"])
+    a._data.conn = LoadDuringWrites(r, "test8")
+    a.things.conn = LoadDuringWrites(r, "test8")
+
+    a.name = "George"
+    eq_(redis_model.RedisModel(namespace="test:cache", key="test8").name, "George")
+    a.things.append("two")
+    eq_(redis_model.RedisModel(namespace="test:cache", key="test8").things, ["one", "two"])
+
+
+def test_listen_evicts_on_set_changes():
+    redis_model.RedisModel(namespace="test:cache", key="test7", tags=set(["one"]),
+                           scores=redis_model.Scored({"fred": 1}))
+    redis_model.RedisModel(namespace="test:cache", key="test7")
+
+    configured = {}
+    real_config_set = r.config_set
+
+    def config_set(name, value):
+        configured[name] = value
+        return real_config_set(name, value)
+
+    r.config_set = config_set
+    try:
+        redis_model.cache.listen(r, namespace="test:cache", configure=True, sleep_time=0.01)
+        events = configured["notify-keyspace-events"]
+        ok_("s" in events and "z" in events)
+        time.sleep(0.1)
+        ok_(redis_model.cache.get("test:cache:test7:_parts") is not None)
+        r.sadd("test:cache:test7:tags", "two")
+        for attempt in range(100):
+            if redis_model.cache.get("test:cache:test7:_parts") is None:
+                break
+            time.sleep(0.01)
+        eq_(redis_model.cache.get("test:cache:test7:_parts"), None)
+
+        redis_model.RedisModel(namespace="test:cache", key="test7")
+        r.zadd("test:cache:test7:scores", {"george": 2})
+        for attempt in range(100):
+            if redis_model.cache.get("test:cache:test7:_parts") is None:
+                break
+            time.sleep(0.01)
+        eq_(redis_model.cache.get("test:cache:test7:_parts"), None)
+    finally:
+        del r.config_set
+        redis_model.cache.stop_listening()
+        r.config_set("notify-keyspace-events", "")
+
+
+def teardown_module(module):
+    redis_model.cache = None
+    for key in module.r.keys("test:cache:*"):
+        module.r.delete(key)
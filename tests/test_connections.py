@@ -0,0 +1,165 @@
+import redis
+from redis.exceptions import RedisClusterException
+from nose.tools import eq_, ok_, raises
+from redisORM import redis_model
+from redisORM.connections import PooledProvider, RoutingProvider
+
+r = redis.StrictRedis("localhost", db=0, decode_responses=True)
+other = redis.StrictRedis("localhost", db=0, decode_responses=True)
+redis_model.redis = r
+
+
+class ClusterPipeline(object):
+    """
+    Stands in for the pipeline of a redis-py cluster client, which can't
+    WATCH or MULTI and only takes one key per DEL or UNLINK.
+    """
+    def __init__(self, pipe):
+        self.pipe = pipe
+
+    def keyslot(self, key):
+        return 0
+
+    def watch(self, *names):
+        raise RedisClusterException("method watch() is not supported")
+
+    def multi(self):
+        raise RedisClusterException("method multi() is not supported")
+
+    def delete(self, *names):
+        if len(names) != 1:
+            raise RedisClusterException("deleting multiple keys is not implemented")
+        return self.pipe.delete(*names)
+
+    def unlink(self, *names):
+        if len(names) != 1:
+            raise RedisClusterException("unlinking multiple keys is not implemented")
+        return self.pipe.unlink(*names)
+
+    def __getattr__(self, name):
+        return getattr(self.pipe, name)
+
+
+class Cluster(object):
+    """
+    Stands in for a redis-py cluster client.
+    """
+    def __init__(self, conn):
+        self.conn = conn
+
+    def keyslot(self, key):
+        return 0
+
+    def pipeline(self, transaction=None, shard_hint=None):
+        return ClusterPipeline(self.conn.pipeline(transaction=False))
+
+    def __getattr__(self, name):
+        return getattr(self.conn, name)
+
+
+cluster = Cluster(r)
+
+
+def teardown_module(module):
+    redis_model.connections = None
+    redis_model.hash_tags = False
+    for key in module.r.keys("test:conn*"):
+        module.r.delete(key)
+
+
+def test_routing():
+    sessions = PooledProvider("redis://localhost:6379/0", max_connections=5)
+    provider = RoutingProvider({"test:conn:sessions": sessions, "test:conn:other": other},
+                               default=r)
+
+    ok_(provider.get("test:conn:sessions") is sessions.client)
+    ok_(provider.get("test:conn:sessions:archived") is sessions.client)
+    ok_(provider.get("test:conn:other") is other)
+    ok_(provider.get("test:conn:otherwise") is r)
+    eq_(sessions.pool.max_connections, 5)
+
+
+def test_routing_readers():
+    sessions = PooledProvider("redis://localhost:6379/0", replica_url="redis://localhost:6379/1")
+    provider = RoutingProvider({"test:conn:sessions": sessions}, default=r)
+
+    ok_(provider.get_reader("test:conn:sessions") is sessions.replica)
+    eq_(sessions.replica.connection_pool.connection_kwargs["db"], 1)
+    eq_(provider.get_reader("test:conn:users"), None)
+    eq_(PooledProvider("redis://localhost:6379/0").get_reader("test:conn"), None)
+
+
+@raises(redis_model.RedisORMException)
+def test_routing_without_default():
+    RoutingProvider({"test:conn:sessions": r}).get("test:conn:users")
+
+
+def test_models_use_provider():
+    redis_model.connections = RoutingProvider({"test:conn:other": other})
+    try:
+        a = redis_model.RedisModel(namespace="test:conn:other", key="fred", name="Fred")
+        ok_(a.conn is other)
+        ok_(redis_model.RedisModel(namespace="test:conn:other", key="fred", conn=r).conn is r)
+        eq_(redis_model.RedisModel.get_many("test:conn:other", ["fred"])[0].name, "Fred")
+    finally:
+        redis_model.connections = None
+
+
+def test_load_many_mixed_connections():
+    redis_model.RedisModel(namespace="test:conn", key="george", name="George")
+    redis_model.RedisModel(namespace="test:conn", key="ron", name="Ron")
+
+    keysets = [redis_model.RedisKeys("george", namespace="test:conn", conn=r, load=False),
+               redis_model.RedisKeys("ron", namespace="test:conn", conn=other, load=False)]
+    redis_model.load_many(keysets)
+    eq_([keys["name"] for keys in keysets], ["George", "Ron"])
+
+
+def test_hash_tags():
+    redis_model.hash_tags = True
+    try:
+        a = redis_model.RedisModel(namespace="test:conn:tagged", key="percy", name="Percy",
+                                   things=["one"])
+        eq_(r.get("test:conn:tagged:{percy}:name"), "Percy")
+        eq_(r.lrange("test:conn:tagged:{percy}:things", 0, -1), ["one"])
+
+        r.delete("test:conn:tagged:{percy}:_parts")
+        eq_(redis_model.build_part_index("test:conn:tagged"), 2)
+
+        redis_model.RedisModel(namespace="test:conn:tagged:archived", key="ron", name="Ron")
+        found = list(redis_model.RedisModel.iter_namespace("test:conn:tagged"))
+        eq_([model.key for model in found], ["percy"])
+        eq_(found[0].things, ["one"])
+
+        eq_(redis_model.migrate_to_hash("test:conn:tagged"), 1)
+        eq_(r.hgetall("test:conn:tagged:{percy}:_fields"), {"name": "Percy"})
+        eq_(r.get("test:conn:tagged:archived:{ron}:name"), "Ron")
+
+        a.delete()
+        eq_(r.keys("test:conn:tagged:{*"), [])
+    finally:
+        redis_model.hash_tags = False
+
+
+def test_cluster_delete_and_purge():
+    redis_model.hash_tags = True
+    try:
+        a = redis_model.RedisModel(namespace="test:conn:cluster", key="bill", conn=cluster,
+                                   name="Bill", things=["one"])
+        eq_(redis_model.migrate_to_hash("test:conn:cluster", conn=cluster), 1)
+        a.delete()
+        eq_(r.keys("test:conn:cluster:*"), [])
+
+        for key in ["charlie", "fleur"]:
+            redis_model.RedisModel(namespace="test:conn:cluster", key=key, conn=cluster,
+                                   name=key, things=["one"])
+        eq_(redis_model.purge_namespace("test:conn:cluster", conn=cluster, batch_size=2), 6)
+        eq_(r.keys("test:conn:cluster:*"), [])
+    finally:
+        redis_model.hash_tags = False
+
+
+@raises(redis_model.RedisORMException)
+def test_cluster_transaction():
+    a = redis_model.RedisModel(namespace="test:conn:cluster", key="bill", conn=cluster)
+    a.transaction(lambda model: None)
@@ -0,0 +1,88 @@
+import redis
+from nose.tools import eq_, ok_
+from redisORM import redis_model
+from redisORM.instrumentation import Instrumentation, StatsdSink
+
+r = redis.StrictRedis("localhost", db=0, decode_responses=True)
+redis_model.redis = r
+
+
+class FakeStatsd(object):
+    def __init__(self):
+        self.counters = {}
+        self.timings = []
+
+    def incr(self, name, count=1):
+        self.counters[name] = self.counters.get(name, 0) + count
+
+    def timing(self, name, milliseconds):
+        self.timings.append(name)
+
+
+statsd = FakeStatsd()
+metrics = Instrumentation(sinks=[StatsdSink(statsd)])
+conn = None
+
+
+def setup_module(module):
+    module.conn = metrics.install(r)
+
+
+def teardown_module(module):
+    metrics.uninstall()
+    for key in module.r.keys("test:metrics*"):
+        module.r.delete(key)
+
+
+def test_operations_are_tagged():
+    metrics.reset()
+    a = redis_model.RedisModel(namespace="test:metrics", key="test1", conn=conn, name="Fred")
+    a.things = ["one"]
+    a.things.extend(["two", "three"])
+    redis_model.RedisModel(namespace="test:metrics", key="test1", conn=conn)
+    a.delete()
+
+    stats = metrics.stats()
+    # One round trip for the new, empty model and two for loading it again.
+    eq_(stats[("load", "test:metrics")]["round_trips"], 3)
+    eq_(stats[("batch", "test:metrics")]["round_trips"], 1)
+    eq_(stats[("list.extend", "test:metrics")]["commands"], 2)
+    ok_(stats[("delete", "test:metrics")]["commands"] >= 2)
+    ok_(stats[("list.extend", "test:metrics")]["bytes_sent"] > 0)
+    for totals in stats.values():
+        eq_(sum(totals["histogram"]), totals["round_trips"])
+
+
+class IndexedModel(redis_model.RedisModel):
+    _indexes = {"email": "equality"}
+    _hash_storage = True
+
+
+def test_container_assignment_is_one_transaction():
+    a = IndexedModel(namespace="test:metrics", key="test3", conn=conn, email="fred@example.com")
+    metrics.reset()
+    a.email = ["fred@example.com"]
+
+    # Unindexing the old value and writing the list happen in one MULTI.
+    eq_(sum(totals["round_trips"] for totals in metrics.stats().values()), 1)
+    eq_(IndexedModel.find("test:metrics", conn=conn, email="fred@example.com"), [])
+    eq_(r.hgetall("test:metrics:test3:_fields"), {})
+    eq_(r.lrange("test:metrics:test3:email", 0, -1), ["fred@example.com"])
+
+
+def test_statsd_sink():
+    redis_model.RedisModel(namespace="test:metrics", key="test2", conn=conn, name="Fred")
+    ok_(statsd.counters["redisorm.test_metrics.batch.commands"] >= 2)
+    ok_("redisorm.test_metrics.load.latency" in statsd.timings)
+
+
+def test_untracked_commands():
+    metrics.reset()
+    conn.get("test:metrics:nothing")
+    eq_(metrics.stats()[("other", "")]["commands"], 1)
+
+
+def test_original_connection_untouched():
+    metrics.reset()
+    r.get("test:metrics:nothing")
+    eq_(metrics.stats(), {})
@@ -1,11 +1,29 @@
+import datetime
+import functools
+from unittest import SkipTest
+
 import redis
 from nose.tools import eq_, ok_, raises
-from redisORM import redis_model
+from redisORM import redis_model, fields
 
-r = redis.StrictRedis("localhost", db=0)
+r = redis.StrictRedis("localhost", db=0, decode_responses=True)
 redis_model.redis = r
 
 
+def with_scan_fallback(test):
+    """
+    Runs a test which reads data written before models kept a part index.
+    """
+    @functools.wraps(test)
+    def wrapper():
+        redis_model.scan_fallback = True
+        try:
+            return test()
+        finally:
+            redis_model.scan_fallback = False
+    return wrapper
+
+
 def test_new_model():
     a = redis_model.RedisModel(namespace="test", key="test1", month="April")
     ok_(a.month, "Kwarg didn't make it into model data")
@@ -79,11 +97,89 @@ def test_list_of_strings_and_ints_only_model():
         ok_(entry in a.things, "Item missing from model list data: {}".format(entry))
 
 
+def test_list_assignment_replaces():
+    a = redis_model.RedisModel(namespace="test", key="test26")
+    a.things = ["one", "two"]
+    a.things = ["three"]
+    eq_(redis_model.redis.lrange("test:test26:things", 0, -1), ["three"])
+
+
+def test_list_chunked_extend():
+    a = redis_model.RedisList("test:test27:things", redis_model.redis, chunk_size=3)
+    a.extend(list(range(10)))
+    eq_(a, list(range(10)))
+    eq_(redis_model.RedisList("test:test27:things", redis_model.redis), list(range(10)))
+
+
+def test_list_index_operations():
+    a = redis_model.RedisModel(namespace="test", key="test34")
+    a.things = ["one", "two", "three"]
+
+    a.things.insert(1, "between")
+    a.things[-1] = "last"
+    eq_(a.things.pop(0), "one")
+    del a.things[1]
+
+    eq_(a.things, ["between", "last"])
+    eq_(redis_model.redis.lrange("test:test34:things", 0, -1), ["between", "last"])
+
+
+def test_list_scripts_lost_again():
+    a = redis_model.RedisModel(namespace="test", key="test48")
+    a.things = ["one", "three"]
+
+    # A server which loses its script cache again straight after reloading.
+    load_scripts = redis_model.load_scripts
+    redis_model.load_scripts = lambda conn: conn.script_flush()
+    try:
+        r.script_flush()
+        a.things.insert(1, "two")
+    finally:
+        redis_model.load_scripts = load_scripts
+
+    eq_(a.things, ["one", "two", "three"])
+    eq_(redis_model.redis.lrange("test:test48:things", 0, -1), ["one", "two", "three"])
+
+
+class LazyModel(redis_model.RedisModel):
+    _lazy_lists = True
+
+
+def test_lazy_list():
+    redis_model.redis.rpush("test:test28:things", *range(25))
+    redis_model.redis.hset("test:test28:_parts", "things", "list")
+    a = LazyModel(namespace="test", key="test28")
+    things = a.things
+    things.page_size = 10
+
+    ok_(isinstance(things, redis_model.LazyRedisList))
+    eq_(len(things), 25)
+    eq_(things[3], 3)
+    eq_(things[-1], 24)
+    eq_(things[20:], [20, 21, 22, 23, 24])
+    eq_(list(things), list(range(25)))
+    ok_(24 in things)
+
+    things.append(25)
+    eq_(things[-1], 25)
+    eq_(things.pop(), 25)
+    eq_(len(things), 25)
+
+
+def test_lazy_list_small_cache():
+    things = redis_model.LazyRedisList("test:test28:things", redis_model.redis, page_size=10,
+                                       cache_size=4)
+    eq_(things[6], 6)
+    eq_(things._window, [4, 5, 6, 7])
+    eq_(things[7], 7)
+
+
 @raises(redis_model.RedisORMException)
 def test_keys_exception():
     redis_model.RedisKeys(key=None)
 
 
+@with_scan_fallback
 def test_existing_data():
     redis_model.redis.set("test:test10:fname", "Josh")
     redis_model.redis.set("test:test10:lname", "Ashby")
@@ -97,10 +193,34 @@ def test_existing_data():
     eq_(a.hobbies, ["Programming", "Electronics", "Photography"])
 
 
-@raises(redis_model.RedisORMException)
+@with_scan_fallback
+def test_existing_data_small_scan_count():
+    for i in range(25):
+        redis_model.redis.set("test:test15:field%d" % i, i)
+    redis_model.redis.rpush("test:test15:things", "one", "two")
+
+    a = redis_model.RedisKeys(namespace="test", key="test15", conn=redis_model.redis, scan_count=2)
+    eq_(len(a._data), 26)
+    eq_(a["field7"], "7")
+    eq_(a["things"], ["one", "two"])
+
+
+@with_scan_fallback
 def test_existing_data_other_types():
     redis_model.redis.sadd("test:test11:wat", "this")
-    redis_model.RedisModel(namespace="test", key="test11")
+    redis_model.redis.zadd("test:test11:scores", {"fred": 3})
+    redis_model.redis.hset("test:test11:info", "house", "Gryffindor")
+    a = redis_model.RedisModel(namespace="test", key="test11")
+    eq_(a.wat, set(["this"]))
+    eq_(a.scores, {"fred": 3.0})
+    eq_(a.info, {"house": "Gryffindor"})
+
+
+@raises(redis_model.RedisORMException)
+@with_scan_fallback
+def test_existing_data_unsupported_type():
+    redis_model.redis.xadd("test:test39:events", {"what": "this"})
+    redis_model.RedisModel(namespace="test", key="test39")
 
 
 def test_delete_with_keys():
@@ -111,6 +231,728 @@ def test_delete_with_keys():
     a.delete()
 
 
+def test_delete_removes_keys():
+    a = redis_model.RedisModel(namespace="test", key="test16")
+    a.name = "Fred"
+    a.things = ["one", "two"]
+    a.delete()
+
+    eq_(redis_model.redis.exists("test:test16:name", "test:test16:things", "test:test16:_parts"), 0)
+
+
+def test_part_index():
+    a = redis_model.RedisModel(namespace="test", key="test17")
+    a.name = "Fred"
+    a.things = ["one", "two"]
+    eq_(redis_model.redis.hgetall("test:test17:_parts"), {"name": "string", "things": "list"})
+
+    del a["name"]
+    eq_(redis_model.redis.hgetall("test:test17:_parts"), {"things": "list"})
+
+
+def test_build_part_index():
+    redis_model.redis.set("test:test18:fname", "Josh")
+    redis_model.redis.rpush("test:test18:hobbies", "Programming")
+    ok_("fname" not in redis_model.RedisModel(namespace="test", key="test18"))
+    redis_model.build_part_index("test")
+
+    a = redis_model.RedisModel(namespace="test", key="test18")
+    eq_(a.fname, "Josh")
+    eq_(a.hobbies, ["Programming"])
+
+
+class HashModel(redis_model.RedisModel):
+    _hash_storage = True
+
+
+def test_hash_storage():
+    a = HashModel(namespace="test", key="test19", name="Fred")
+    a.things = ["one", "two"]
+    eq_(redis_model.redis.hgetall("test:test19:_fields"), {"name": "Fred"})
+    eq_(redis_model.redis.exists("test:test19:name"), 0)
+
+    b = redis_model.RedisModel(namespace="test", key="test19")
+    eq_(b.name, "Fred")
+    eq_(b.things, ["one", "two"])
+
+
+def test_migrate_to_hash():
+    redis_model.RedisModel(namespace="test:migrate", key="test20", name="Fred", age=12)
+    redis_model.RedisModel(namespace="test:migrate:archived", key="test20", name="Ron")
+    eq_(redis_model.migrate_to_hash("test:migrate"), 2)
+    eq_(redis_model.redis.get("test:migrate:archived:test20:name"), "Ron")
+    eq_(redis_model.redis.hgetall("test:migrate:test20:_fields"), {"name": "Fred", "age": "12"})
+
+    b = HashModel(namespace="test:migrate", key="test20")
+    eq_(b.name, "Fred")
+    eq_(b.age, "12")
+
+
+def test_get_many():
+    redis_model.RedisModel(namespace="test", key="test21", name="Fred")
+    redis_model.RedisModel(namespace="test", key="test22", name="George", things=["one"])
+
+    a, b, c = redis_model.RedisModel.get_many("test", ["test22", "missing", "test21"])
+    eq_(a.name, "George")
+    eq_(a.things, ["one"])
+    eq_(b, None)
+    eq_(c.name, "Fred")
+
+    d, = redis_model.RedisModel.get_many("test", ["missing"], create_missing=True)
+    eq_(d.key, "missing")
+    ok_("name" not in d)
+
+
+def test_batch():
+    a = redis_model.RedisModel(namespace="test", key="test23")
+    b = redis_model.RedisModel(namespace="test", key="test24")
+
+    with redis_model.batch(a, b):
+        a.name = "Fred"
+        b.things = ["one", "two"]
+        eq_(redis_model.redis.exists("test:test23:name", "test:test24:things"), 0)
+
+    eq_(redis_model.redis.get("test:test23:name"), "Fred")
+    eq_(redis_model.redis.lrange("test:test24:things", 0, -1), ["one", "two"])
+
+
+def test_batch_rollback():
+    a = redis_model.RedisModel(namespace="test", key="test25", name="Fred")
+
+    try:
+        with a.batch():
+            a.name = "George"
+            raise ValueError()
+    except ValueError:
+        pass
+
+    eq_(a.name, "Fred")
+    eq_(redis_model.redis.get("test:test25:name"), "Fred")
+
+
+class LazyFieldsModel(redis_model.RedisModel):
+    _lazy = True
+    _prefetch = ["name"]
+
+
+def test_lazy_fields():
+    redis_model.RedisModel(namespace="test", key="test29", name="Fred", age=12, things=["one"])
+
+    a = LazyFieldsModel(namespace="test", key="test29")
+    eq_(sorted(a._data._data), ["name"])
+    ok_("age" in a)
+    eq_(a.age, "12")
+    eq_(a.things, ["one"])
+    eq_(a.get("missing", "default"), "default")
+
+
+def test_lazy_part_gone():
+    redis_model.RedisModel(namespace="test", key="test47", name="Fred", age=12, house="Burrow")
+    a = LazyFieldsModel(namespace="test", key="test47")
+    ok_("age" in a)
+
+    redis_model.redis.delete("test:test47:age", "test:test47:house")
+    eq_(a.get("age", "unknown"), "unknown")
+    ok_("age" not in a)
+    try:
+        a.house
+    except KeyError:
+        pass
+    else:
+        raise AssertionError("house should be missing")
+    ok_("house" not in a)
+    eq_(a.name, "Fred")
+
+
+class DeferredModel(redis_model.RedisModel):
+    _deferred = True
+
+
+class DeferredLazyModel(LazyFieldsModel):
+    _deferred = True
+
+
+def test_delete_lazy_part():
+    redis_model.RedisModel(namespace="test", key="test49", name="Fred", age=12, house="Burrow")
+    a = LazyFieldsModel(namespace="test", key="test49")
+    del a["age"]
+    ok_("age" not in a)
+    eq_(redis_model.redis.exists("test:test49:age"), 0)
+
+    b = DeferredLazyModel(namespace="test", key="test49")
+    del b["house"]
+    eq_(redis_model.redis.exists("test:test49:house"), 1)
+    b.save()
+    eq_(redis_model.redis.exists("test:test49:house"), 0)
+    eq_(sorted(LazyFieldsModel(namespace="test", key="test49")._data.parts()), ["name"])
+
+
+def test_deferred_save():
+    a = DeferredModel(namespace="test", key="test30", name="Fred", things=["one"])
+    eq_(redis_model.redis.exists("test:test30:name"), 0)
+    eq_(a._data.dirty_parts(), set(["name", "things"]))
+
+    a.save()
+    eq_(redis_model.redis.get("test:test30:name"), "Fred")
+    eq_(a._data.dirty_parts(), set())
+
+    a.name = "Fred"
+    eq_(a._data.dirty_parts(), set())
+
+    a.things.append("two")
+    del a["name"]
+    eq_(a._data.dirty_parts(), set(["name", "things"]))
+    eq_(redis_model.redis.lrange("test:test30:things", 0, -1), ["one"])
+
+    a.save()
+    eq_(redis_model.redis.lrange("test:test30:things", 0, -1), ["one", "two"])
+    eq_(redis_model.redis.exists("test:test30:name"), 0)
+
+
+def test_transaction():
+    a = redis_model.RedisModel(namespace="test", key="test31", points=1, history=["start"])
+
+    def add_point(model):
+        model.points = int(model.points) + 1
+        model.history.append("point")
+
+    a.transaction(add_point)
+    eq_(redis_model.redis.get("test:test31:points"), "2")
+    eq_(redis_model.redis.lrange("test:test31:history", 0, -1), ["start", "point"])
+
+
+def test_transaction_retries_on_conflict():
+    a = redis_model.RedisModel(namespace="test", key="test32", points=1)
+    calls = []
+
+    def add_point(model):
+        calls.append(model.points)
+        if len(calls) == 1:
+            redis_model.redis.set("test:test32:points", 10)
+        model.points = int(model.points) + 1
+
+    a.transaction(add_point)
+    eq_(calls, ["1", "10"])
+    eq_(redis_model.redis.get("test:test32:points"), "11")
+
+
+@raises(redis_model.RedisORMConflict)
+def test_transaction_conflict():
+    a = redis_model.RedisModel(namespace="test", key="test33", points=1)
+
+    def always_conflict(model):
+        redis_model.redis.set("test:test33:points", 10)
+        model.points = 2
+
+    a.transaction(always_conflict, retries=2)
+
+
+class IndexedModel(redis_model.RedisModel):
+    _indexes = {"email": "equality", "age": "range"}
+
+
+def test_secondary_indexes():
+    IndexedModel(namespace="test:indexed", key="fred", email="fred@example.com", age=30)
+    IndexedModel(namespace="test:indexed", key="george", email="george@example.com", age=20)
+    ron = IndexedModel(namespace="test:indexed", key="ron", email="ron@example.com", age=12)
+
+    eq_(IndexedModel.find("test:indexed", email="fred@example.com"), ["fred"])
+    eq_(IndexedModel.find("test:indexed", age=(18, None)), ["george", "fred"])
+    eq_(IndexedModel.find("test:indexed", age=(None, 25), email="ron@example.com"), ["ron"])
+
+    ron.email = "ronald@example.com"
+    eq_(IndexedModel.find("test:indexed", email="ron@example.com"), [])
+    eq_(IndexedModel.find("test:indexed", email="ronald@example.com"), ["ron"])
+
+    ron.delete()
+    eq_(IndexedModel.find("test:indexed", age=(None, None)), ["george", "fred"])
+
+    fred, = IndexedModel.find("test:indexed", email="fred@example.com", load=True)
+    eq_(fred.age, "30")
+
+
+def test_find_after_batch_rollback():
+    hermione = IndexedModel(namespace="test:indexed", key="hermione", email="a@example.com")
+
+    try:
+        with hermione.batch():
+            hermione.email = "c@example.com"
+            raise ValueError()
+    except ValueError:
+        pass
+
+    eq_(hermione.email, "a@example.com")
+    hermione.email = "d@example.com"
+    eq_(IndexedModel.find("test:indexed", email="a@example.com"), [])
+    eq_(IndexedModel.find("test:indexed", email="c@example.com"), [])
+    eq_(IndexedModel.find("test:indexed", email="d@example.com"), ["hermione"])
+
+
+@raises(redis_model.RedisORMException)
+def test_find_without_index():
+    IndexedModel.find("test:indexed", name="Fred")
+
+
+def test_delete_stale_model():
+    percy = IndexedModel(namespace="test:indexed", key="percy", email="percy@example.com")
+    IndexedModel(namespace="test:indexed", key="percy").email = "weatherby@example.com"
+
+    percy.delete()
+    eq_(IndexedModel.find("test:indexed", email="percy@example.com"), [])
+    eq_(IndexedModel.find("test:indexed", email="weatherby@example.com"), [])
+    eq_(redis_model.redis.exists("test:indexed:percy:email", "test:indexed:percy:_parts"), 0)
+
+
+class RacingKeys(redis_model.RedisKeys):
+    raced = False
+
+    def parts(self):
+        parts = redis_model.RedisKeys.parts(self)
+        if not RacingKeys.raced:
+            RacingKeys.raced = True
+            redis_model.redis.set("test:test45:late", "here")
+            redis_model.redis.hset("test:test45:_parts", "late", "string")
+        return parts
+
+
+def test_delete_retries_on_conflict():
+    redis_model.RedisModel(namespace="test", key="test45", name="Fred")
+    RacingKeys(namespace="test", key="test45", conn=redis_model.redis).delete()
+    ok_(RacingKeys.raced)
+    eq_(redis_model.redis.exists("test:test45:name", "test:test45:late", "test:test45:_parts"), 0)
+
+
+def test_purge_namespace():
+    for i in range(30):
+        redis_model.RedisModel(namespace="test:purge", key="model%d" % i, name="Fred",
+                               things=["one"])
+    redis_model.RedisModel(namespace="test:purged", key="model", name="George")
+
+    eq_(redis_model.purge_namespace("test:purge", batch_size=7, max_rate=100000), 90)
+    eq_(redis_model.redis.keys("test:purge:*"), [])
+    eq_(redis_model.RedisModel(namespace="test:purged", key="model").name, "George")
+
+
+@raises(redis_model.RedisORMException)
+def test_purge_without_namespace():
+    redis_model.purge_namespace("")
+
+
+def test_iter_namespace():
+    for i in range(25):
+        redis_model.RedisModel(namespace="test:iter", key="model%d" % i, number=i, things=["one"])
+
+    redis_model.RedisModel(namespace="test:iter:archived", key="george", number=99)
+
+    models = list(redis_model.RedisModel.iter_namespace("test:iter", batch_size=4))
+    eq_(sorted(int(model.number) for model in models), list(range(25)))
+    eq_(models[0].things, ["one"])
+
+
+def test_iter_namespace_resume():
+    for i in range(10):
+        redis_model.RedisModel(namespace="test:resume", key="model%d" % i, number=i)
+
+    walk = redis_model.RedisModel.iter_namespace("test:resume", batch_size=2, with_cursor=True)
+    cursor, first = next(walk)
+    walk.close()
+
+    keys = set(model.key for _, model in redis_model.RedisModel.iter_namespace(
+        "test:resume", batch_size=2, cursor=cursor, with_cursor=True))
+    ok_(first.key in keys)
+
+
+class TypedModel(redis_model.RedisModel):
+    _schema = {
+        "age": fields.Integer(),
+        "height": fields.Float(),
+        "admin": fields.Boolean(),
+        "joined": fields.DateTime(),
+        "settings": fields.JSON(),
+        "scores": fields.Integer(),
+        "codes": fields.String(),
+    }
+    _indexes = {"admin": "equality", "joined": "range"}
+
+
+def test_typed_fields():
+    joined = datetime.datetime(2014, 2, 3, 4, 5, 6, 7)
+    TypedModel(namespace="test:typed", key="fred", age=30, height=1.85, admin=False,
+               joined=joined, settings={"theme": ["dark"]}, scores=[3, 1, 2],
+               codes=["007", "42"])
+    eq_(redis_model.redis.get("test:typed:fred:admin"), "0")
+    eq_(redis_model.redis.get("test:typed:fred:settings"), '{"theme":["dark"]}')
+
+    a = TypedModel(namespace="test:typed", key="fred")
+    eq_(a.age, 30)
+    eq_(a.height, 1.85)
+    eq_(a.admin, False)
+    eq_(a.joined, joined)
+    eq_(a.settings, {"theme": ["dark"]})
+    eq_(a.scores, [3, 1, 2])
+    eq_(a.codes, ["007", "42"])
+
+    a.scores.append(4)
+    eq_(TypedModel(namespace="test:typed", key="fred").scores, [3, 1, 2, 4])
+
+    a.age = None
+    eq_(TypedModel(namespace="test:typed", key="fred").age, None)
+
+
+def test_typed_indexes():
+    TypedModel(namespace="test:typed", key="george", admin=True,
+               joined=datetime.datetime(2015, 1, 1))
+    TypedModel(namespace="test:typed", key="ron", admin=False,
+               joined=datetime.datetime(2016, 1, 1))
+
+    eq_(TypedModel.find("test:typed", admin=True), ["george"])
+    eq_(TypedModel.find("test:typed", joined=(datetime.datetime(2015, 6, 1), None)), ["ron"])
+
+
+def test_datetime_before_epoch():
+    field = fields.DateTime()
+    joined = datetime.datetime(1969, 12, 31, 23, 59, 59, 500000)
+    eq_(field.encode(joined), "-0.500000")
+    eq_(field.decode("-0.500000"), joined)
+    eq_(field.decode(field.encode(datetime.datetime(1960, 1, 1))), datetime.datetime(1960, 1, 1))
+
+    TypedModel(namespace="test:typed", key="percy", joined=joined)
+    eq_(TypedModel.find("test:typed", joined=(None, datetime.datetime(1970, 1, 1))), ["percy"])
+    eq_(TypedModel.find("test:typed", joined=(None, datetime.datetime(1969, 12, 31, 23, 59, 59))),
+        [])
+
+
+@raises(redis_model.RedisORMException)
+def test_typed_field_bad_value():
+    TypedModel(namespace="test:typed", key="bad", age="thirty")
+
+
+# Binary fields need a connection which leaves replies as bytes.
+raw = redis.StrictRedis("localhost", db=0, decode_responses=False)
+
+
+class BinaryModel(redis_model.RedisModel):
+    _schema = {"avatar": fields.Bytes(), "age": fields.Integer(), "name": fields.String()}
+    _indexes = {"name": "equality"}
+
+
+def test_binary_fields():
+    BinaryModel(namespace="test:binary", key="fred", conn=raw, avatar=b"\x89PNG\xff",
+                age=30, name="Fred", nick="f")
+
+    a = BinaryModel(namespace="test:binary", key="fred", conn=raw)
+    eq_(a.avatar, b"\x89PNG\xff")
+    eq_(a.age, 30)
+    eq_(a.name, "Fred")
+    eq_(a.nick, b"f")
+
+    b, = BinaryModel.find("test:binary", conn=raw, name="Fred", load=True)
+    eq_(b.avatar, b"\x89PNG\xff")
+    eq_([model.key for model in BinaryModel.iter_namespace("test:binary", conn=raw)], ["fred"])
+
+    b.delete()
+    eq_(raw.keys("test:binary*"), [])
+
+
+def test_msgpack_field():
+    try:
+        field = fields.MsgPack()
+    except redis_model.RedisORMException:
+        raise SkipTest("msgpack isn't installed")
+
+    class PackedModel(redis_model.RedisModel):
+        _schema = {"settings": field}
+
+    PackedModel(namespace="test:binary", key="george", conn=raw,
+                settings={"theme": ["dark", 2], "key": b"\xff"})
+    eq_(PackedModel(namespace="test:binary", key="george", conn=raw).settings,
+        {"theme": ["dark", 2], "key": b"\xff"})
+
+
+def test_bad_value_keeps_old_value():
+    a = TypedModel(namespace="test:typed", key="percy", age=30)
+    try:
+        a.age = "thirty"
+    except redis_model.RedisORMException:
+        pass
+    eq_(a.age, 30)
+    eq_(TypedModel(namespace="test:typed", key="percy").age, 30)
+
+    b = IndexedModel(namespace="test:indexed", key="ginny", age=11)
+    try:
+        b.age = "abc"
+    except redis_model.RedisORMException:
+        pass
+    eq_(b.age, 11)
+    eq_(redis_model.redis.get("test:indexed:ginny:age"), "11")
+    eq_(IndexedModel.find("test:indexed", age=11), ["ginny"])
+
+
+def test_unindex_range_part():
+    a = IndexedModel(namespace="test:indexed", key="bill", age=29)
+    a.age = None
+    eq_(a.age, "")
+    eq_(IndexedModel.find("test:indexed", age=(None, None)).count("bill"), 0)
+
+
+def test_list_leading_zeros():
+    redis_model.RedisModel(namespace="test", key="test35", things=["007", "7", "-3", "x"])
+    eq_(redis_model.RedisModel(namespace="test", key="test35").things, ["007", 7, -3, "x"])
+
+
+def test_compact_representation():
+    a = redis_model.RedisModel(namespace="test", key="test36", things=["one", "two"])
+    ok_(not hasattr(a._data, "__dict__"))
+    ok_(not hasattr(a.things, "__dict__"))
+    eq_(a.things.index("two"), 1)
+    ok_(a._data.namespace is redis_model.RedisModel(namespace="te" + "st", key="test37").namespace)
+
+
+class ProtectedModel(redis_model.RedisModel):
+    _protected_items = []
+
+
+def test_attribute_access():
+    a = ProtectedModel(namespace="test", key="test38", scratch="stored")
+    eq_(a.scratch, "stored")
+
+    a.protected_items = "scratch"
+    a.scratch = "local"
+    eq_(a.scratch, "local")
+    eq_(a._data["scratch"], "stored")
+
+    a.shout = lambda: "hi"
+    eq_(a.shout(), "hi")
+    ok_("shout" not in a)
+
+
+def test_declared_part_attribute():
+    ok_(isinstance(TypedModel.__dict__["age"], redis_model._PartAttribute))
+    a = TypedModel(namespace="test:typed", key="harry", age=11)
+    a.age = 12
+    eq_(a.age, 12)
+    eq_(a["age"], 12)
+    eq_(TypedModel(namespace="test:typed", key="harry").age, 12)
+
+
+def test_set_part():
+    a = redis_model.RedisModel(namespace="test", key="test40", tags=set(["one", 2]))
+    ok_(isinstance(a.tags, redis_model.RedisSet))
+    a.tags.add("three")
+    a.tags.discard(2)
+    eq_(redis_model.redis.smembers("test:test40:tags"), set(["one", "three"]))
+    eq_(redis_model.redis.hget("test:test40:_parts", "tags"), "set")
+
+    b = redis_model.RedisModel(namespace="test", key="test40")
+    eq_(b.tags, set(["one", "three"]))
+    ok_("one" in b.tags)
+    ok_(2 not in b.tags)
+
+
+def test_sorted_set_part():
+    a = redis_model.RedisModel(namespace="test", key="test41",
+                               scores=redis_model.Scored({"fred": 10, "george": 7, "ron": 3}))
+    ok_(isinstance(a.scores, redis_model.RedisSortedSet))
+    eq_(a.scores.increment("ron", 5), 8.0)
+    eq_(list(a.scores), ["george", "ron", "fred"])
+    eq_(a.scores.range_by_score(5, 9), ["george", "ron"])
+    eq_(a.scores.range(-1), ["fred"])
+    eq_(redis_model.redis.zscore("test:test41:scores", "ron"), 8.0)
+
+    b = redis_model.RedisModel(namespace="test", key="test41")
+    eq_(b.scores.range_by_score(5, 9, withscores=True), [("george", 7.0), ("ron", 8.0)])
+    eq_(b.scores["fred"], 10.0)
+
+
+def test_hash_part():
+    a = redis_model.RedisModel(namespace="test", key="test42", info={"house": "Gryffindor"})
+    ok_(isinstance(a.info, redis_model.RedisHash))
+    a.info["year"] = 2
+    del a.info["house"]
+    eq_(redis_model.redis.hgetall("test:test42:info"), {"year": "2"})
+
+    b = redis_model.RedisModel(namespace="test", key="test42")
+    eq_(b.info, {"year": "2"})
+    eq_(b.info.get("house"), None)
+
+
+class LazyContainerModel(redis_model.RedisModel):
+    _lazy_lists = True
+
+
+def test_lazy_containers():
+    redis_model.RedisModel(namespace="test", key="test43", tags=set(["one", "two"]),
+                           scores=redis_model.Scored({"fred": 10, "george": 7}),
+                           info={"house": "Gryffindor"})
+
+    a = LazyContainerModel(namespace="test", key="test43")
+    ok_(a.tags.lazy)
+    ok_("one" in a.tags)
+    eq_(len(a.tags), 2)
+    eq_(sorted(a.tags), ["one", "two"])
+    a.tags.remove("one")
+    eq_(redis_model.redis.smembers("test:test43:tags"), set(["two"]))
+
+    eq_(a.scores.range_by_score(8, None), ["fred"])
+    eq_(a.scores.range_by_score(start=1), ["fred"])
+    eq_(a.scores.range_by_score(num=1), ["george"])
+    eq_(list(a.scores.items()), [("george", 7.0), ("fred", 10.0)])
+    eq_(a.scores.score("ron"), None)
+
+    eq_(a.info["house"], "Gryffindor")
+    ok_("year" not in a.info)
+    a.info["year"] = 2
+    eq_(dict(a.info.items()), {"house": "Gryffindor", "year": "2"})
+
+
+def test_deferred_containers():
+    a = DeferredModel(namespace="test", key="test44", tags=set(["one"]), info={"a": "b"})
+    a.save()
+    a.tags.add("two")
+    eq_(a._data.dirty_parts(), set(["tags"]))
+    eq_(redis_model.redis.smembers("test:test44:tags"), set(["one"]))
+
+    a.save()
+    eq_(redis_model.redis.smembers("test:test44:tags"), set(["one", "two"]))
+    eq_(redis_model.redis.hgetall("test:test44:info"), {"a": "b"})
+
+
+class SessionModel(redis_model.RedisModel):
+    _ttl = 600
+    _field_ttls = {"token": 30}
+
+
+def test_model_ttl():
+    a = SessionModel(namespace="test:ttl", key="session1", user="fred", token="abc",
+                     things=["one"], tags=set(["a"]))
+    ok_(0 < redis_model.redis.ttl("test:ttl:session1:user") <= 600)
+    ok_(0 < redis_model.redis.ttl("test:ttl:session1:token") <= 30)
+    ok_(0 < redis_model.redis.ttl("test:ttl:session1:things") <= 600)
+    ok_(0 < redis_model.redis.ttl("test:ttl:session1:tags") <= 600)
+    ok_(0 < redis_model.redis.ttl("test:ttl:session1:_parts") <= 600)
+
+    redis_model.redis.persist("test:ttl:session1:things")
+    a.things.append("two")
+    ok_(0 < redis_model.redis.ttl("test:ttl:session1:things") <= 600)
+    eq_(a.things.pop(), "two")
+
+    ttls = a.ttl()
+    eq_(sorted(ttls), ["tags", "things", "token", "user"])
+    ok_(ttls["token"] <= 30)
+
+
+def test_touch():
+    a = SessionModel(namespace="test:ttl", key="session2", user="fred", token="abc")
+    redis_model.redis.persist("test:ttl:session2:user")
+    eq_(a.ttl()["user"], None)
+
+    a.touch()
+    ok_(0 < redis_model.redis.ttl("test:ttl:session2:user") <= 600)
+    ok_(redis_model.redis.ttl("test:ttl:session2:token") <= 30)
+
+    a.touch(5000)
+    ok_(600 < redis_model.redis.ttl("test:ttl:session2:token") <= 5000)
+
+
+class HashSessionModel(SessionModel):
+    _hash_storage = True
+
+
+def test_field_ttl_hash_storage():
+    a = HashSessionModel(namespace="test:ttl", key="session3", user="fred", token="abc")
+    eq_(redis_model.redis.hgetall("test:ttl:session3:_fields"), {"user": "fred"})
+    ok_(0 < redis_model.redis.ttl("test:ttl:session3:_fields") <= 600)
+    ok_(0 < redis_model.redis.ttl("test:ttl:session3:token") <= 30)
+    eq_(HashSessionModel(namespace="test:ttl", key="session3").token, "abc")
+
+
+def test_container_write_renews_fields_ttl():
+    a = HashSessionModel(namespace="test:ttl", key="session4", user="fred", things=["one"])
+    redis_model.redis.persist("test:ttl:session4:_fields")
+    redis_model.redis.persist("test:ttl:session4:_parts")
+
+    a.things.append("two")
+    ok_(0 < redis_model.redis.ttl("test:ttl:session4:_fields") <= 600)
+    ok_(0 < redis_model.redis.ttl("test:ttl:session4:_parts") <= 600)
+    eq_(a.things.pop(), "two")
+
+
+@raises(redis_model.RedisORMException)
+def test_touch_without_ttl():
+    redis_model.RedisModel(namespace="test", key="test46", name="Fred").touch()
+
+
+# A second database stands in for a replica which hasn't caught up yet.
+replica = redis.StrictRedis("localhost", db=1, decode_responses=True)
+
+
+def test_read_replica():
+    redis_model.RedisModel(namespace="test:replica", key="fred", name="Fred", things=["one"])
+    replica.set("test:replica:george:name", "George")
+    replica.hset("test:replica:george:_parts", "name", "string")
+
+    a = redis_model.RedisModel(namespace="test:replica", key="fred", read_conn=replica)
+    eq_(a.get("name"), None)
+
+    b = redis_model.RedisModel(namespace="test:replica", key="george", read_conn=replica)
+    eq_(b.name, "George")
+    b.name = "Georgina"
+    eq_(r.get("test:replica:george:name"), "Georgina")
+    eq_(replica.get("test:replica:george:name"), "George")
+
+    models = redis_model.RedisModel.get_many("test:replica", ["fred", "george"],
+                                             read_conn=replica)
+    eq_(models[0], None)
+    eq_(models[1].name, "George")
+
+
+class LazyReplicaModel(redis_model.RedisModel):
+    _lazy = True
+
+
+def test_transaction_reads_primary():
+    redis_model.RedisModel(namespace="test:replica", key="bill", points=10, things=["one"])
+    replica.set("test:replica:bill:points", 1)
+    replica.hset("test:replica:bill:_parts", "points", "string")
+
+    a = LazyReplicaModel(namespace="test:replica", key="bill", read_conn=replica)
+    a.transaction(lambda model: setattr(model, "points", int(model.points) + 1))
+    eq_(r.get("test:replica:bill:points"), "11")
+    ok_(a._data.read_conn is replica)
+
+    b = redis_model.RedisModel(namespace="test:replica", key="bill", read_conn=replica)
+    b.transaction(lambda model: model.things.append("two"))
+    ok_(b._data.read_conn is replica)
+    ok_(b._data._data["things"].read_conn is replica)
+
+
+def test_module_read_replica():
+    redis_model.read_redis = replica
+    try:
+        ok_(redis_model.RedisModel(namespace="test:replica", key="ron")._data.read_conn
+            is replica)
+        ok_(redis_model.RedisModel(namespace="test:replica", key="ron", conn=r)._data.read_conn
+            is None)
+    finally:
+        redis_model.read_redis = None
+
+
+def test_read_your_writes():
+    redis_model.read_your_writes = 5
+    try:
+        a = redis_model.RedisModel(namespace="test:replica", key="percy", read_conn=replica)
+        ok_(a._data._read() is replica)
+        a.name = "Percy"
+        a.things = ["one"]
+        ok_(a._data._read() is r)
+        ok_(a.things._read() is r)
+        eq_(redis_model.RedisModel(namespace="test:replica", key="percy",
+                                   read_conn=replica).name, "Percy")
+    finally:
+        redis_model.read_your_writes = 0
+        redis_model._recent_writes.clear()
+
+
 def test_none_attribute():
     a = redis_model.RedisModel(namespace="test", key="test13")
     a.ship = None
@@ -132,3 +974,5 @@ def test_no_key():
 def teardown_module(module):
     for key in module.r.keys("test:*"):
         module.r.delete(key)
+    for key in module.replica.keys("test:*"):
+        module.replica.delete(key)